@@ -0,0 +1,410 @@
+import contextlib
+import functools
+import hashlib
+import os
+import pickle
+import sys
+import threading
+import types
+import weakref
+from collections import OrderedDict
+
+from instrumentation import stage
+from mod_data import row_counts, value_counts
+
+# Approximate bytes of aggregates and row subsets kept in memory per process
+AGGREGATE_CACHE_BYTES = 256 * 2**20
+
+# Bytes of pickled aggregates kept in a spill directory; the least recently used files go first
+SPILL_DIR_BYTES = 256 * 2**20
+
+# Functions defined in this directory are hashed into the cache keys, so a changed aggregation
+# does not read results of its previous version
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Set to a directory to also keep computed aggregates on disk, so other scripts and later runs
+# on the same data reuse them
+CACHE_ENV_VAR = 'MOD_AGGREGATE_CACHE'
+
+# The cache used by cached_aggregate(), created on first use
+_default_cache = None
+
+# Returned by LRUCache.get for missing keys where None is a valid value
+MISSING = object()
+
+
+def approximate_size(value):
+    """
+    Returns an estimate of the bytes held by an aggregate: arrays and pandas objects by their
+    buffers (with the strings of object columns), containers by their items.
+    """
+    memory_usage = getattr(value, 'memory_usage', None)
+    if memory_usage is not None:
+        size = memory_usage(deep=True)
+        return int(size.sum()) if hasattr(size, 'sum') else int(size)
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(approximate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    A thread-safe mapping that keeps only the most recently used entries: at most maxsize of
+    them and, if max_bytes is given, at most max_bytes of approximate_size() in total.
+    """
+
+    def __init__(self, maxsize=None, max_bytes=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        # key -> (value, size)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = approximate_size(value) if self.max_bytes is not None else 0
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            # A value larger than max_bytes evicts everything, itself included
+            while self.entries and ((self.maxsize is not None and len(self.entries) > self.maxsize)
+                                    or (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+
+def code_hash(func):
+    """
+    Returns a hash of the code of a compute function and of every project function or class it
+    refers to by name, directly or through the functions it calls, e.g. the top_value_counts
+    called by a lambda. Closure values are not hashed; they belong in the params of the key.
+    """
+    while isinstance(func, functools.partial):
+        func = func.func
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return getattr(func, '__qualname__', type(func).__qualname__)
+    # Functions captured in a closure are part of the hash, so only closures without them share
+    # the digest of their code
+    memoize = not any(is_project_function(cell_value(cell)) for cell in func.__closure__ or ())
+    digest = _code_hashes.get(code) if memoize else None
+    if digest is None:
+        hasher = hashlib.blake2b(digest_size=8)
+        seen = set()
+        pending = [func]
+        while pending:
+            current = pending.pop()
+            # Static and class methods hash the function they wrap
+            current = getattr(current, '__func__', current)
+            if id(current) in seen:
+                continue
+            seen.add(id(current))
+            if isinstance(current, type):
+                pending.extend(member for member in vars(current).values() if is_project_function(member))
+                continue
+            hash_code(hasher, current.__code__)
+            namespace = current.__globals__
+            for name in sorted(code_names(current.__code__)):
+                value = namespace.get(name)
+                if is_project_function(value) or is_project_class(value):
+                    pending.append(value)
+            for cell in current.__closure__ or ():
+                value = cell_value(cell)
+                if is_project_function(value):
+                    pending.append(value)
+        digest = hasher.hexdigest()
+        if memoize:
+            _code_hashes[code] = digest
+    return digest
+
+
+# code object -> code_hash(), as the same lambda is created again on every call
+_code_hashes = {}
+
+
+def cell_value(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        # An empty cell, e.g. of a function that refers to itself before it is defined
+        return None
+
+
+def is_project_function(value):
+    value = getattr(value, '__func__', value)
+    return isinstance(value, types.FunctionType) and value.__code__.co_filename.startswith(SOURCE_DIR)
+
+
+def is_project_class(value):
+    module = sys.modules.get(getattr(value, '__module__', None))
+    return (isinstance(value, type) and module is not None
+            and (getattr(module, '__file__', None) or '').startswith(SOURCE_DIR))
+
+
+def code_names(code):
+    """
+    Returns the global names used by a code object and the functions nested in it.
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= code_names(const)
+    return names
+
+
+def hash_code(hasher, code):
+    hasher.update(code.co_code)
+    hasher.update(repr(code.co_names).encode('utf-8'))
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            hash_code(hasher, const)
+        else:
+            hasher.update(repr(const).encode('utf-8'))
+
+
+def filter_key(filters):
+    """
+    Returns a hashable, order-independent key for {column: value or list of values} filters.
+    """
+    if not filters:
+        return ()
+    return tuple(sorted((col, tuple(value) if isinstance(value, (list, tuple, set)) else value)
+                        for col, value in filters.items()))
+
+
+class AggregateCache:
+    """
+    Memoizes aggregates of DataFrames, keyed by the data's fingerprint, a row filter, the
+    aggregate's name and its parameters (e.g. grouping columns and top N).
+
+    A DataFrame is hashed once, the first time it is aggregated, and treated as unchanged from
+    then on, as the cleaned frames of this project are. The rows matching each filter are also
+    kept, so aggregates of the same subset do not rescan the data. Results and subsets stay in
+    an LRU of about max_bytes and, with spill_dir, are also pickled there, up to max_spill_bytes. Keys
+    include the code_hash of the compute function, so results of a changed dataset or of a
+    changed aggregation are not read; their files are evicted over time like any unused ones.
+    Cached values are shared and must not be modified.
+    """
+
+    def __init__(self, max_bytes=AGGREGATE_CACHE_BYTES, spill_dir=None, max_spill_bytes=SPILL_DIR_BYTES):
+        self.memory = LRUCache(max_bytes=max_bytes)
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.disk_evictions = 0
+        # id(DataFrame) -> (weak reference, fingerprint); entries go away with their frame
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def fingerprint(self, data_frame):
+        """
+        Returns a content hash of a DataFrame's columns, index and values, computed once per frame.
+        """
+        frame_id = id(data_frame)
+        with self.lock:
+            entry = self.fingerprints.get(frame_id)
+            if entry is not None and entry[0]() is data_frame:
+                return entry[1]
+
+        import pandas as pd
+
+        with stage('aggregate', 'dataset fingerprint'):
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(repr(list(data_frame.columns)).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(data_frame, index=True).to_numpy().tobytes())
+            fingerprint = digest.hexdigest()
+
+        def forget(_, frame_id=frame_id):
+            with self.lock:
+                self.fingerprints.pop(frame_id, None)
+
+        with self.lock:
+            self.fingerprints[frame_id] = (weakref.ref(data_frame, forget), fingerprint)
+        return fingerprint
+
+    def subset(self, data_frame, filters):
+        """
+        Returns the rows of data_frame matching every {column: value or list of values} filter.
+        """
+        if not filters:
+            return data_frame
+        key = (self.fingerprint(data_frame), 'rows', filter_key(filters))
+        positions = self.memory.get(key, MISSING)
+        if positions is MISSING:
+            import numpy as np
+
+            mask = np.ones(len(data_frame), dtype=bool)
+            for col, value in filters.items():
+                if isinstance(value, (list, tuple, set)):
+                    mask &= data_frame[col].isin(list(value)).to_numpy()
+                else:
+                    mask &= (data_frame[col] == value).to_numpy()
+            positions = np.flatnonzero(mask)
+            self.memory.put(key, positions)
+        return data_frame.iloc[positions]
+
+    def spill_path(self, key):
+        name = hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.pkl")
+
+    def prune_spill_dir(self):
+        """
+        Deletes the least recently used pickles until the spill directory fits in max_spill_bytes.
+        """
+        files = []
+        with os.scandir(self.spill_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.pkl'):
+                    try:
+                        info = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    files.append((info.st_mtime, info.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_spill_bytes:
+                break
+            try:
+                os.remove(path)
+                self.disk_evictions += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def aggregate(self, data_frame, name, compute, filters=None, params=()):
+        """
+        Returns compute(rows of data_frame matching filters), computing it only if no equal
+        request (same data, filters, name, params and compute code) was answered before.
+
+        Args:
+            data_frame (pd.DataFrame): The full dataset.
+            name (str): Identifies the aggregation, e.g. 'top_value_counts'.
+            compute (callable): Takes the filtered DataFrame and returns the aggregate.
+            filters (dict): Optional {column: value or list of values} row filter.
+            params (tuple): Everything else the result depends on, e.g. (column, top_n).
+        """
+        key = (self.fingerprint(data_frame), name, filter_key(filters), tuple(params), code_hash(compute))
+        value = self.memory.get(key, MISSING)
+        if value is not MISSING:
+            return value
+
+        if self.spill_dir:
+            path = self.spill_path(key)
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+            except FileNotFoundError:
+                pass
+            except (EOFError, pickle.UnpicklingError, AttributeError, ImportError, ValueError, TypeError):
+                # Truncated, or pickled from classes that have changed since: computed again
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            if value is not MISSING:
+                self.disk_hits += 1
+                self.memory.put(key, value)
+                # Marks the file as recently used for prune_spill_dir
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    pass
+                return value
+
+        with stage('aggregate', name):
+            value = compute(self.subset(data_frame, filters))
+        self.memory.put(key, value)
+
+        if self.spill_dir:
+            # Written to a temporary file first, so a concurrent reader never sees half a pickle
+            temporary = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temporary, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, path)
+            self.disk_writes += 1
+            self.prune_spill_dir()
+        return value
+
+    def stats(self):
+        """
+        Returns the hit and miss counts of the memory and disk tiers.
+        Row subsets count as memory lookups too.
+        """
+        return {
+            'hits': self.memory.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.memory.misses - self.disk_hits,
+            'entries': len(self.memory),
+            'bytes': self.memory.total_bytes,
+            'disk_writes': self.disk_writes,
+            'disk_evictions': self.disk_evictions,
+        }
+
+
+def default_cache():
+    """
+    Returns the process-wide cache, spilling to the directory in MOD_AGGREGATE_CACHE if it is set.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AggregateCache(spill_dir=os.environ.get(CACHE_ENV_VAR, '').strip() or None)
+    return _default_cache
+
+
+def configure(max_bytes=AGGREGATE_CACHE_BYTES, spill_dir=None, max_spill_bytes=SPILL_DIR_BYTES):
+    """
+    Replaces the process-wide cache, e.g. to spill to a directory given on the command line.
+    """
+    global _default_cache
+    _default_cache = AggregateCache(max_bytes, spill_dir, max_spill_bytes)
+    return _default_cache
+
+
+def cached_aggregate(data_frame, name, compute, filters=None, params=()):
+    """
+    Memoizes one aggregate in the process-wide cache; see AggregateCache.aggregate.
+    """
+    return default_cache().aggregate(data_frame, name, compute, filters, params)
+
+
+def cached_value_counts(data_frame, column, filters=None):
+    """
+    Memoizes the value counts of a column, 'unspecified' included, of the rows matching filters.
+    Histograms, 'unspecified' shares and the murder distribution are all derived from these,
+    so each column of a dataset is only counted once per run.
+    """
+    return cached_aggregate(data_frame, 'value_counts', lambda df: value_counts(df[column], row_counts(df)),
+                            filters, (column,))
+
+
+def print_stats(file=sys.stderr):
+    stats = default_cache().stats()
+    lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+    hit_rate = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+    print(f"\nAggregate cache: {stats['hits']} memory hits, {stats['disk_hits']} disk hits, "
+          f"{stats['misses']} misses ({hit_rate:.0%} hit rate), "
+          f"{stats['entries']} entries ({stats['bytes'] / 2**20:.1f} MB) in memory, "
+          f"{stats['disk_writes']} written to and {stats['disk_evictions']} evicted from disk", file=file)
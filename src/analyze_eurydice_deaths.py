@@ -1,31 +1,87 @@
-import pandas as pd
+import csv
+import os
+from collections import Counter
 
-try:
-    df = pd.read_csv('../MoD_Triples.csv')
+from instrumentation import timed_stage
+from mod_data import TRIPLES_CSV
 
-    # Filter for Orpheus as victim (case-insensitive and partial match for robustness)
+TRIPLE_KEY = ['Victim', 'Mode of Demise', 'Perpetrator']
+
+@timed_stage('load')
+def read_triples(path=TRIPLES_CSV):
+    """
+    Reads the MoD_Triples CSV as a list of row dictionaries with stripped column names.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader)]
+        return [dict(zip(header, row)) for row in reader]
+
+@timed_stage('aggregate')
+def victim_triple_counts(rows, victim):
+    """
+    Counts the unique (Victim, Mode of Demise, Perpetrator) triples whose victim matches the given name.
+    Returns a list of (victim, mode of demise, perpetrator, count) tuples sorted by triple.
+    """
+    # Filter for the victim (case-insensitive and partial match for robustness)
     # The original CSV has 'Orpheus' with different casing or leading/trailing spaces sometimes.
     # Also, some entries might have additional text. Let's make it robust.
-    eurydice_df = df[df['Victim'].astype(str).str.strip().str.contains('Orpheus', case=False, na=False)]
+    needle = victim.lower()
+    counts = Counter()
+    for row in rows:
+        if needle not in row.get('Victim', '').strip().lower():
+            continue
+        triple = tuple(row.get(col, '') for col in TRIPLE_KEY)
+        # Rows with an empty field in the triple are not counted, as with a pandas groupby
+        if all(triple):
+            counts[triple] += 1
+
+    return [triple + (count,) for triple, count in sorted(counts.items())]
+
+def format_markdown_table(headers, rows):
+    """
+    Formats rows as a Markdown pipe table, right-aligning numeric columns.
+    """
+    columns = list(zip(headers, *rows))
+    numeric = [all(isinstance(value, (int, float)) for value in column[1:]) for column in columns]
+    widths = [max(len(str(value)) for value in column) for column in columns]
+
+    def format_row(values):
+        cells = [str(value).rjust(width) if is_numeric else str(value).ljust(width)
+                 for value, width, is_numeric in zip(values, widths, numeric)]
+        return '| ' + ' | '.join(cells) + ' |'
+
+    separator = '|' + '|'.join(('-' * (width + 1) + ':') if is_numeric else (':' + '-' * (width + 1))
+                               for width, is_numeric in zip(widths, numeric)) + '|'
+    return '\n'.join([format_row(headers), separator] + [format_row(row) for row in rows])
+
+def main(victim='Orpheus', store=None):
+    """
+    Prints the death events in which the given character is the victim.
+    With store, counts them in that annotation database instead of the CSV.
+    """
+    try:
+        if store:
+            from annotation_store import load_store_victim_triple_counts
+            result_table = load_store_victim_triple_counts(store, victim)
+        else:
+            result_table = victim_triple_counts(read_triples(), victim)
 
-    death_events_df = eurydice_df
+        # Display the total count and the table
+        total_count = sum(row[-1] for row in result_table)
 
-    # Count occurrences of unique triples
-    # Ensure all columns are treated as strings before grouping
-    result_table = death_events_df.groupby(['Victim', 'Mode of Demise', 'Perpetrator']).size().reset_index(name='Count')
+        print(f"{victim} is the victim in {total_count} death event(s).")
+        print(f"\nCounts for each unique triple ({victim}, Mode of Demise, Perpetrator):")
+        if result_table:
+            print(format_markdown_table(TRIPLE_KEY + ['Count'], result_table))
+        else:
+            print(f"No death events found for {victim} meeting the criteria.")
 
-    # Display the total count and the table
-    total_count = result_table['Count'].sum()
+    except FileNotFoundError as e:
+        print(f"Error: {os.path.basename(e.filename or TRIPLES_CSV)} not found.")
 
-    print(f"Orpheus is the victim in {total_count} death event(s).")
-    print("\nCounts for each unique triple (Orpheus, Mode of Demise, Perpetrator):")
-    if not result_table.empty:
-        print(result_table.to_markdown(index=False))
-    else:
-        print("No death events found for Orpheus meeting the criteria.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
 
-except FileNotFoundError:
-    print("Error: MoD_Triples.csv not found.")
-    
-except Exception as e:
-    print(f"An error occurred: {e}")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+import argparse
+import os
+import sqlite3
+import time
+
+from instrumentation import timed_stage
+from mod_data import ANNOTATIONS_DB, COUNT_COLUMN, load_triples, clean_triples, load_gbv, clean_gbv
+
+# Triples reference characters and modes by their raw spelling, so the victim query can show
+# names as annotated; canonical holds the cleaned value the charts group by (lowercase,
+# 'unspecified' for missing values, character aliases merged).
+# triple_counts and gbv_counts are kept up to date on every append, so reading them back
+# costs one row per distinct combination instead of one row per annotation.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    added_at TEXT NOT NULL,
+    n_rows INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS characters (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    canonical TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS modes (
+    id INTEGER PRIMARY KEY,
+    label TEXT NOT NULL UNIQUE,
+    canonical TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS triples (
+    id INTEGER PRIMARY KEY,
+    batch_id INTEGER NOT NULL REFERENCES batches(id),
+    mode_id INTEGER NOT NULL REFERENCES modes(id),
+    murder TEXT NOT NULL,
+    victim_id INTEGER NOT NULL REFERENCES characters(id),
+    perpetrator_id INTEGER NOT NULL REFERENCES characters(id)
+);
+CREATE TABLE IF NOT EXISTS triple_counts (
+    mode_id INTEGER NOT NULL REFERENCES modes(id),
+    murder TEXT NOT NULL,
+    victim_id INTEGER NOT NULL REFERENCES characters(id),
+    perpetrator_id INTEGER NOT NULL REFERENCES characters(id),
+    count INTEGER NOT NULL,
+    PRIMARY KEY (victim_id, mode_id, perpetrator_id, murder)
+);
+CREATE TABLE IF NOT EXISTS gbv_instances (
+    id INTEGER PRIMARY KEY,
+    batch_id INTEGER NOT NULL REFERENCES batches(id),
+    focalization TEXT,
+    explicitness TEXT,
+    tag TEXT
+);
+CREATE TABLE IF NOT EXISTS gbv_counts (
+    focalization TEXT,
+    explicitness TEXT,
+    tag TEXT,
+    count INTEGER NOT NULL,
+    UNIQUE (focalization, explicitness, tag)
+);
+CREATE VIEW IF NOT EXISTS triple_summary AS
+    SELECT m.canonical AS mode_of_demise, t.murder AS murder,
+           v.canonical AS victim, p.canonical AS perpetrator, SUM(t.count) AS count
+    FROM triple_counts t
+    JOIN modes m ON m.id = t.mode_id
+    JOIN characters v ON v.id = t.victim_id
+    JOIN characters p ON p.id = t.perpetrator_id
+    GROUP BY m.canonical, t.murder, v.canonical, p.canonical;
+"""
+
+# Indexes that are dropped and rebuilt around bulk loads
+SECONDARY_INDEXES = {
+    'triples_victim': 'CREATE INDEX IF NOT EXISTS triples_victim ON triples(victim_id)',
+    'triples_perpetrator': 'CREATE INDEX IF NOT EXISTS triples_perpetrator ON triples(perpetrator_id)',
+    'triples_mode': 'CREATE INDEX IF NOT EXISTS triples_mode ON triples(mode_id)',
+    'triple_counts_perpetrator': 'CREATE INDEX IF NOT EXISTS triple_counts_perpetrator ON triple_counts(perpetrator_id)',
+    'triple_counts_mode': 'CREATE INDEX IF NOT EXISTS triple_counts_mode ON triple_counts(mode_id)',
+}
+
+# Values per lookup query, below SQLite's default limit of 999 parameters
+LOOKUP_CHUNK = 500
+
+# GBV columns and the store columns they are kept in
+GBV_FIELDS = {'Focalization': 'focalization', 'Level of Explicity': 'explicitness', 'Rape/Non-Con Tag': 'tag'}
+
+
+def open_store(path=ANNOTATIONS_DB):
+    """
+    Opens (and creates, if needed) the annotation database.
+    """
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA foreign_keys = ON')
+    connection.executescript(SCHEMA)
+    for statement in SECONDARY_INDEXES.values():
+        connection.execute(statement)
+    return connection
+
+
+def add_batch(connection, kind, source, n_rows):
+    cursor = connection.execute('INSERT INTO batches (kind, source, added_at, n_rows) VALUES (?, ?, ?, ?)',
+                                (kind, source, time.strftime('%Y-%m-%dT%H:%M:%S'), n_rows))
+    return cursor.lastrowid
+
+
+def intern_values(connection, table, value_column, raw_values, canonical_values):
+    """
+    Adds the values not yet in a lookup table and returns their ids, aligned with raw_values.
+    """
+    import pandas as pd
+
+    codes, uniques = pd.factorize(raw_values)
+    canonical = pd.Series(canonical_values).groupby(codes).first()
+    connection.executemany(f'INSERT OR IGNORE INTO {table} ({value_column}, canonical) VALUES (?, ?)',
+                           zip(uniques, canonical.loc[range(len(uniques))]))
+    # Only the batch's values are looked up, through the UNIQUE index, so appends do not slow
+    # down as the table grows
+    ids = {}
+    for start in range(0, len(uniques), LOOKUP_CHUNK):
+        chunk = list(uniques[start:start + LOOKUP_CHUNK])
+        placeholders = ', '.join('?' * len(chunk))
+        ids.update(connection.execute(f'SELECT {value_column}, id FROM {table} WHERE {value_column} IN ({placeholders})',
+                                      chunk))
+    return pd.Series([ids[value] for value in uniques]).to_numpy()[codes]
+
+
+@timed_stage('write')
+def append_triples(connection, data_frame, source=''):
+    """
+    Adds raw MoD_Triples rows (as read by load_triples) in one transaction and updates the counts.
+    Returns the number of rows added.
+    """
+    import pandas as pd
+
+    raw = data_frame.copy()
+    raw.columns = raw.columns.str.strip()
+    clean = clean_triples(raw)
+    raw_text = {col: raw[col].fillna('').astype(str).to_numpy() for col in ['Mode of Demise', 'Victim', 'Perpetrator']}
+
+    with connection:
+        batch_id = add_batch(connection, 'triples', source, len(raw))
+        mode_ids = intern_values(connection, 'modes', 'label', raw_text['Mode of Demise'], clean['Mode of Demise'].to_numpy())
+        # Victims and perpetrators share one character table
+        character_ids = intern_values(connection, 'characters', 'name',
+                                      pd.concat([pd.Series(raw_text['Victim']), pd.Series(raw_text['Perpetrator'])]).to_numpy(),
+                                      pd.concat([clean['Victim'], clean['Perpetrator']]).to_numpy())
+        # Columns in the order of the triple_counts primary key
+        rows = pd.DataFrame({
+            'victim_id': character_ids[:len(raw)],
+            'mode_id': mode_ids,
+            'perpetrator_id': character_ids[len(raw):],
+            'murder': clean['Murder'].to_numpy(),
+        })
+
+        # A batch larger than the stored triples is loaded faster without the indexes, which are then
+        # built with one sort each instead of one random B-tree update per row and index
+        rebuild_indexes = len(raw) > connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+        if rebuild_indexes:
+            for name in SECONDARY_INDEXES:
+                connection.execute(f'DROP INDEX IF EXISTS {name}')
+        connection.executemany(
+            'INSERT INTO triples (batch_id, victim_id, mode_id, perpetrator_id, murder) VALUES (?, ?, ?, ?, ?)',
+            zip([batch_id] * len(rows), *(rows[col].tolist() for col in rows.columns)))
+
+        # Sorted by the primary key, so the upserts walk the counts B-tree in order
+        counts = rows.groupby(list(rows.columns)).size().reset_index()
+        connection.executemany(
+            'INSERT INTO triple_counts (victim_id, mode_id, perpetrator_id, murder, count) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (victim_id, mode_id, perpetrator_id, murder) DO UPDATE SET count = count + excluded.count',
+            zip(*(counts[col].tolist() for col in counts.columns)))
+
+        if rebuild_indexes:
+            for statement in SECONDARY_INDEXES.values():
+                connection.execute(statement)
+    return len(raw)
+
+
+@timed_stage('write')
+def append_gbv(connection, data_frame, source=''):
+    """
+    Adds raw GBV instance rows in one transaction and updates the counts.
+    Returns the number of rows added.
+    """
+    df = clean_gbv(data_frame)
+    # Missing cells are stored as NULL, so they stay missing when read back
+    df = df[list(GBV_FIELDS)].astype(object).where(df[list(GBV_FIELDS)].notna(), None)
+
+    with connection:
+        batch_id = add_batch(connection, 'gbv', source, len(df))
+        connection.executemany(
+            'INSERT INTO gbv_instances (batch_id, focalization, explicitness, tag) VALUES (?, ?, ?, ?)',
+            ((batch_id,) + row for row in df.itertuples(index=False, name=None)))
+
+        counts = df.groupby(list(GBV_FIELDS), dropna=False).size()
+        connection.executemany(
+            'INSERT INTO gbv_counts (focalization, explicitness, tag, count) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (focalization, explicitness, tag) DO UPDATE SET count = count + excluded.count',
+            (tuple(None if value != value else value for value in key) + (int(n),) for key, n in counts.items()))
+    return len(df)
+
+
+def expand_counts(counts):
+    """
+    Turns a pre-aggregated table into one row per counted annotation, for the few uses that
+    need individual rows, such as sampling.
+    """
+    counts = counts.copy()
+    rows = counts.loc[counts.index.repeat(counts.pop(COUNT_COLUMN))]
+    return rows.reset_index(drop=True)
+
+
+@timed_stage('load')
+def read_triples(connection):
+    """
+    Returns the stored triples as one row per distinct cleaned combination of values, with the
+    number of annotations it stands for in COUNT_COLUMN. The chart aggregations add up these
+    counts, so they give the same results as on clean_triples(load_triples()).
+    """
+    import pandas as pd
+
+    counts = pd.read_sql_query('SELECT mode_of_demise, murder, victim, perpetrator, count FROM triple_summary', connection)
+    counts.columns = ['Mode of Demise', 'Murder', 'Victim', 'Perpetrator', COUNT_COLUMN]
+    return counts
+
+
+@timed_stage('load')
+def read_gbv(connection):
+    """
+    Returns the stored GBV instances as one row per distinct combination of values, with the
+    number of instances it stands for in COUNT_COLUMN, like read_triples.
+    """
+    import pandas as pd
+
+    # UNIQUE does not merge NULLs, so combinations with missing cells can span several rows
+    columns = ', '.join(GBV_FIELDS.values())
+    counts = pd.read_sql_query(f"SELECT {columns}, SUM(count) FROM gbv_counts GROUP BY {columns}", connection)
+    counts.columns = list(GBV_FIELDS) + [COUNT_COLUMN]
+    return counts
+
+
+@timed_stage('aggregate')
+def victim_triple_counts(connection, victim):
+    """
+    Counts the (Victim, Mode of Demise, Perpetrator) triples of every victim whose name contains
+    the given one, with the same matching and ordering as analyze_eurydice_deaths.victim_triple_counts.
+    """
+    needle = victim.lower()
+    victim_ids = [character_id for character_id, name in connection.execute('SELECT id, name FROM characters')
+                  if name and needle in name.strip().lower()]
+    if not victim_ids:
+        return []
+
+    placeholders = ', '.join('?' * len(victim_ids))
+    rows = connection.execute(f"""
+        SELECT v.name, m.label, p.name, SUM(t.count)
+        FROM triple_counts t
+        JOIN characters v ON v.id = t.victim_id
+        JOIN modes m ON m.id = t.mode_id
+        JOIN characters p ON p.id = t.perpetrator_id
+        WHERE t.victim_id IN ({placeholders}) AND m.label != '' AND p.name != ''
+        GROUP BY t.victim_id, t.mode_id, t.perpetrator_id
+    """, victim_ids).fetchall()
+    return sorted(rows)
+
+
+def load_store_triples(path=ANNOTATIONS_DB):
+    """
+    Opens the database at path and returns its triple counts (see read_triples).
+    Raises FileNotFoundError if it is missing.
+    """
+    return read_from_store(path, read_triples)
+
+
+def load_store_gbv(path=ANNOTATIONS_DB):
+    """
+    Opens the database at path and returns its GBV instance counts (see read_gbv).
+    Raises FileNotFoundError if it is missing.
+    """
+    return read_from_store(path, read_gbv)
+
+
+def load_store_victim_triple_counts(path, victim):
+    """
+    Opens the database at path and returns victim_triple_counts(connection, victim).
+    """
+    return read_from_store(path, lambda connection: victim_triple_counts(connection, victim))
+
+
+def read_from_store(path, read):
+    # sqlite3 would silently create an empty database instead
+    if not os.path.exists(path):
+        raise FileNotFoundError(2, 'No such file', path)
+    connection = open_store(path)
+    try:
+        return read(connection)
+    finally:
+        connection.close()
+
+
+def main(kind, csv_path, db_path=ANNOTATIONS_DB):
+    """
+    Appends a CSV batch of triples or GBV instances to the annotation database.
+    """
+    try:
+        data_frame = load_triples(csv_path) if kind == 'triples' else load_gbv(csv_path)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    connection = open_store(db_path)
+    try:
+        append = append_triples if kind == 'triples' else append_gbv
+        n_rows = append(connection, data_frame, os.path.basename(csv_path))
+    finally:
+        connection.close()
+    print(f"Added {n_rows} {kind} rows to {db_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Append a batch of annotations to the SQLite annotation store.")
+    parser.add_argument("kind", choices=["triples", "gbv"], help="What the CSV holds.")
+    parser.add_argument("csv_path", help="A CSV in the layout of MoD_Triples.csv or Instances_of_GBV_anonym.csv.")
+    parser.add_argument("--db", default=ANNOTATIONS_DB, help="The database file (created if missing).")
+    args = parser.parse_args()
+
+    main(args.kind, args.csv_path, args.db)
@@ -0,0 +1,279 @@
+import argparse
+import itertools
+import os
+
+import numpy as np
+import pandas as pd
+
+from analyze_eurydice_deaths import format_markdown_table
+from instrumentation import timed_stage
+from mod_data import load_vocabulary, load_triples, clean_triples, load_gbv, clean_gbv
+
+# Columns compared for each kind of annotation file
+AGREEMENT_COLUMNS = {
+    'gbv': ['Focalization', 'Level of Explicity', 'Rape/Non-Con Tag'],
+    'triples': ['Mode of Demise', 'Murder', 'Victim', 'Perpetrator'],
+}
+
+# Triples columns whose agreement is also weighted by distance in the vocabulary hierarchy
+HIERARCHY_COLUMNS = ['Mode of Demise']
+
+
+# --- Alignment ---
+
+def read_annotations(path, kind):
+    """
+    Reads one annotator's file with the cleaning of the charts; missing values become NaN.
+    """
+    if kind == 'triples':
+        df = clean_triples(load_triples(path))
+        return df.replace('unspecified', np.nan)
+    df = clean_gbv(load_gbv(path))
+    for col in AGREEMENT_COLUMNS['gbv']:
+        if col in df.columns:
+            df[col] = df[col].str.strip().str.lower()
+    return df
+
+
+@timed_stage('aggregate')
+def align_annotations(frames, columns, key=None):
+    """
+    Aligns several annotators' DataFrames item by item and encodes every column.
+
+    Items are matched on the key column if one is given, otherwise by row position; an item
+    missing from a file, or a missing value, is coded -1. All annotators share one set of
+    category codes per column.
+
+    Returns:
+        dict: {column: (codes, categories)} with codes an (items, annotators) integer matrix.
+    """
+    if key is not None:
+        frames = [df.drop_duplicates(key).set_index(key) for df in frames]
+        items = frames[0].index
+        for df in frames[1:]:
+            items = items.union(df.index, sort=False)
+        frames = [df.reindex(items) for df in frames]
+    else:
+        n_items = max(len(df) for df in frames)
+        frames = [df.reset_index(drop=True).reindex(range(n_items)) for df in frames]
+
+    encoded = {}
+    for col in columns:
+        values = pd.concat([df[col] if col in df.columns else pd.Series(np.nan, index=df.index) for df in frames],
+                           ignore_index=True)
+        codes, categories = pd.factorize(values)
+        encoded[col] = (codes.reshape(len(frames), -1).T, categories)
+    return encoded
+
+
+def category_counts_per_item(codes, n_categories):
+    """
+    Returns an (items, categories) matrix of how many annotators chose each category for each item.
+    """
+    n_items = codes.shape[0]
+    rated = codes >= 0
+    item_offsets = np.broadcast_to(np.arange(n_items)[:, None] * n_categories, codes.shape)
+    counts = np.bincount((item_offsets + codes)[rated], minlength=n_items * n_categories)
+    return counts.reshape(n_items, n_categories)
+
+
+# --- Agreement coefficients ---
+
+def cohen_kappa(first, second, n_categories, similarity=None):
+    """
+    Computes Cohen's kappa of two annotators from their confusion matrix.
+
+    With a similarity matrix (1 on the diagonal), disagreements between similar categories
+    count partially, which gives weighted kappa. Items either annotator left out are skipped.
+    """
+    both = (first >= 0) & (second >= 0)
+    if not both.any():
+        return np.nan
+    confusion = np.bincount(first[both] * n_categories + second[both],
+                            minlength=n_categories * n_categories).reshape(n_categories, n_categories)
+    observed = confusion / confusion.sum()
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0))
+
+    disagreement = 1.0 - (np.eye(n_categories) if similarity is None else similarity)
+    expected_disagreement = (disagreement * expected).sum()
+    if expected_disagreement == 0:
+        return np.nan
+    return 1.0 - (disagreement * observed).sum() / expected_disagreement
+
+
+def pairwise_cohen_kappa(codes, n_categories, similarity=None):
+    """
+    Returns the mean Cohen's kappa over all pairs of annotators.
+    """
+    kappas = [cohen_kappa(codes[:, a], codes[:, b], n_categories, similarity)
+              for a, b in itertools.combinations(range(codes.shape[1]), 2)]
+    kappas = [kappa for kappa in kappas if not np.isnan(kappa)]
+    return float(np.mean(kappas)) if kappas else np.nan
+
+
+def fleiss_kappa(codes, n_categories):
+    """
+    Computes Fleiss' kappa over the items that every annotator labelled.
+    """
+    n_annotators = codes.shape[1]
+    complete = (codes >= 0).all(axis=1)
+    if n_annotators < 2 or not complete.any():
+        return np.nan
+    counts = category_counts_per_item(codes[complete], n_categories)
+
+    item_agreement = (counts * (counts - 1)).sum(axis=1) / (n_annotators * (n_annotators - 1))
+    shares = counts.sum(axis=0) / counts.sum()
+    expected = (shares ** 2).sum()
+    if expected == 1:
+        return np.nan
+    return (item_agreement.mean() - expected) / (1 - expected)
+
+
+def krippendorff_alpha(codes, n_categories, similarity=None):
+    """
+    Computes Krippendorff's alpha from the coincidence matrix of all items with two or more values.
+
+    Without a similarity matrix the nominal distance is used; with one, the distance between
+    two categories is 1 - similarity. Missing values (-1) are allowed.
+    """
+    counts = category_counts_per_item(codes, n_categories).astype(float)
+    values_per_item = counts.sum(axis=1)
+    pairable = values_per_item >= 2
+    counts = counts[pairable]
+    if not len(counts):
+        return np.nan
+
+    # o[c, k] = sum over items of n_uc * (n_uk - [c == k]) / (m_u - 1)
+    scaled = counts / (values_per_item[pairable] - 1)[:, None]
+    coincidences = scaled.T @ counts - np.diag(scaled.sum(axis=0))
+    marginals = coincidences.sum(axis=0)
+    n = marginals.sum()
+
+    distance = 1.0 - (np.eye(n_categories) if similarity is None else similarity)
+    observed = (coincidences * distance).sum() / n
+    expected = (np.outer(marginals, marginals) * distance).sum() / (n * (n - 1))
+    if expected == 0:
+        return np.nan
+    return 1.0 - observed / expected
+
+
+# --- Hierarchy ---
+
+def concept_depths(vocabulary):
+    """
+    Returns the number of skos:broader steps from every concept to its nearest root.
+    """
+    depths = np.full(len(vocabulary), -1, dtype=np.int64)
+    order = vocabulary.roots()
+    depths[order] = 0
+    head = 0
+    while head < len(order):
+        current = order[head]
+        head += 1
+        for child in vocabulary.children(current):
+            if depths[child] < 0:
+                depths[child] = depths[current] + 1
+                order.append(child)
+    return depths
+
+
+def hierarchy_similarity(categories, vocabulary):
+    """
+    Returns the Wu-Palmer similarity of every pair of mode of demise labels.
+
+    Two concepts score 2 * depth(deepest common ancestor) / (depth(a) + depth(b)), with the roots
+    at depth 0, so modes under different upper categories score 0 and siblings score high.
+    Labels that are not in the vocabulary only match themselves.
+    """
+    n = len(categories)
+    index_of_label = {}
+    for i in range(len(vocabulary)):
+        index_of_label.setdefault(vocabulary.label_of(i).strip().lower(), i)
+    concepts = [index_of_label.get(str(label).strip().lower()) for label in categories]
+    known = np.array([concept is not None for concept in concepts], dtype=bool)
+
+    depths = concept_depths(vocabulary)
+    ancestor_lists = [vocabulary.ancestors(concept) if concept is not None else [] for concept in concepts]
+    # Ancestor depths per category, over the concepts that are an ancestor of any category;
+    # -1 where a concept is not an ancestor
+    columns = {concept: k for k, concept in enumerate(sorted(set(itertools.chain.from_iterable(ancestor_lists))))}
+    ancestor_depths = np.full((n, len(columns)), -1, dtype=np.int64)
+    for row, ancestors in enumerate(ancestor_lists):
+        ancestor_depths[row, [columns[concept] for concept in ancestors]] = depths[ancestors]
+
+    similarity = np.eye(n)
+    category_depths = np.array([depths[concept] if concept is not None else 0 for concept in concepts], dtype=float)
+    for row in np.flatnonzero(known):
+        common = np.where((ancestor_depths[row] >= 0) & (ancestor_depths >= 0), ancestor_depths[row], -1).max(axis=1)
+        total = category_depths[row] + category_depths
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(total > 0, 2.0 * common / total, 0.0)
+        scores[~known | (common < 0)] = 0.0
+        similarity[row] = np.maximum(scores, similarity[row])
+    np.fill_diagonal(similarity, 1.0)
+    return similarity
+
+
+# --- Report ---
+
+@timed_stage('aggregate')
+def agreement_table(encoded, vocabulary=None):
+    """
+    Returns one row of agreement coefficients per column: items rated by two or more annotators,
+    pairwise Cohen's kappa, Fleiss' kappa and Krippendorff's alpha, and for the columns in
+    HIERARCHY_COLUMNS also their hierarchy-weighted kappa and alpha.
+    """
+    rows = []
+    for col, (codes, categories) in encoded.items():
+        n_categories = len(categories)
+        similarity = None
+        if vocabulary is not None and col in HIERARCHY_COLUMNS:
+            similarity = hierarchy_similarity(categories, vocabulary)
+        rows.append({
+            'column': col,
+            'items': int(((codes >= 0).sum(axis=1) >= 2).sum()),
+            'cohen_kappa': pairwise_cohen_kappa(codes, n_categories),
+            'fleiss_kappa': fleiss_kappa(codes, n_categories),
+            'krippendorff_alpha': krippendorff_alpha(codes, n_categories),
+            'weighted_kappa': pairwise_cohen_kappa(codes, n_categories, similarity) if similarity is not None else np.nan,
+            'weighted_alpha': krippendorff_alpha(codes, n_categories, similarity) if similarity is not None else np.nan,
+        })
+    return pd.DataFrame(rows).set_index('column')
+
+
+def main(paths, kind='gbv', key=None):
+    """
+    Prints the agreement between the annotators of several files in the layout of
+    Instances_of_GBV_anonym.csv (kind 'gbv') or MoD_Triples.csv (kind 'triples').
+    """
+    if len(paths) < 2:
+        print("Error: at least two annotation files are needed.")
+        return
+    try:
+        frames = [read_annotations(path, kind) for path in paths]
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    columns = [col for col in AGREEMENT_COLUMNS[kind] if any(col in df.columns for df in frames)]
+    encoded = align_annotations(frames, columns, key)
+    vocabulary = load_vocabulary() if kind == 'triples' else None
+    table = agreement_table(encoded, vocabulary)
+    if vocabulary is None:
+        table = table.drop(columns=['weighted_kappa', 'weighted_alpha'])
+
+    print(f"Agreement between {len(paths)} annotators ({', '.join(os.path.basename(path) for path in paths)}):")
+    headers = ['Column', 'Items'] + [name.replace('_', ' ').capitalize() for name in table.columns[1:]]
+    rows = [[col, int(row['items'])] + ['n/a' if np.isnan(value) else f"{value:.3f}" for value in row.iloc[1:]]
+            for col, row in table.iterrows()]
+    print(format_markdown_table(headers, rows))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute inter-annotator agreement between annotation files.")
+    parser.add_argument("paths", nargs="+", help="One annotation file per annotator.")
+    parser.add_argument("--kind", choices=sorted(AGREEMENT_COLUMNS), default="gbv", help="The layout of the files.")
+    parser.add_argument("--key", help="Column that identifies an item in every file (default: row position).")
+    args = parser.parse_args()
+
+    main(args.paths, args.kind, args.key)
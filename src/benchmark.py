@@ -0,0 +1,203 @@
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from synthetic_data import generate_triples_csv, generate_vocabulary_ttl, generate_gbv_csv
+
+# Dataset sizes per preset: triples rows, vocabulary concepts and GBV rows
+PRESETS = {
+    'small': {'triples': [10**3, 10**4], 'vocabulary': [10**2, 10**3], 'gbv': [10**3]},
+    'medium': {'triples': [10**5, 10**6], 'vocabulary': [10**4, 10**5], 'gbv': [10**5]},
+    'large': {'triples': [10**7], 'vocabulary': [10**6], 'gbv': [10**6]},
+}
+
+# pyvis keeps every node and edge in Python lists and serializes them into one page,
+# so larger vocabularies are skipped for that benchmark
+PYVIS_MAX_CONCEPTS = 10**4
+
+# A benchmark is reported as a regression when it is this much slower than the baseline
+REGRESSION_THRESHOLD = 1.2
+
+
+def time_call(func, repeat):
+    """
+    Calls func repeat times and returns the list of wall times in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def dataset_path(data_dir, kind, size, shape=None):
+    name = f"{kind}_{shape}_{size}" if shape else f"{kind}_{size}"
+    extension = 'ttl' if kind == 'vocabulary' else 'csv'
+    return os.path.join(data_dir, f"{name}.{extension}")
+
+
+def ensure_dataset(data_dir, kind, size, shape=None):
+    """
+    Generates a synthetic dataset unless a cached copy already exists in data_dir.
+    """
+    path = dataset_path(data_dir, kind, size, shape)
+    if not os.path.exists(path):
+        print(f"Generating {os.path.basename(path)}...", file=sys.stderr)
+        if kind == 'triples':
+            generate_triples_csv(path, size)
+        elif kind == 'vocabulary':
+            generate_vocabulary_ttl(path, size, shape=shape)
+        else:
+            generate_gbv_csv(path, size)
+    return path
+
+
+def vocabulary_benchmarks(path, size):
+    """
+    Yields (benchmark name, callable) pairs for the vocabulary stages.
+    """
+    from skos_vocabulary import Vocabulary
+    from count_modes_of_demise import count_descendants
+    from generate_interactive_hierarchy import generate_hierarchy_page
+
+    with open(path, 'r', encoding='utf-8') as f:
+        ttl_content = f.read()
+    vocabulary = Vocabulary.from_ttl(ttl_content)
+
+    yield 'ttl_parse', lambda: Vocabulary.from_ttl(ttl_content)
+    yield 'descendant_count', lambda: count_descendants(vocabulary, 'modeOfDemise')
+    yield 'hierarchy_html', lambda: generate_hierarchy_page(vocabulary)
+    if size <= PYVIS_MAX_CONCEPTS:
+        from generate_pyvis_graph import create_pyvis_visualization
+        yield 'pyvis_export', lambda: create_pyvis_visualization(vocabulary).generate_html()
+
+
+def triples_benchmarks(path, size):
+    """
+    Yields (benchmark name, callable) pairs for the triples loading, aggregation and rendering stages.
+    """
+    from mod_data import load_triples, clean_triples
+    from visualize_data import COLUMNS_TO_ANALYZE, top_value_counts, histogram_names, plot_histogram
+
+    df = clean_triples(load_triples(path))
+    counts = top_value_counts(df, 'Victim', top_n=10)
+    title, _ = histogram_names('Victim', top_n=10)
+
+    def render():
+        fig = plot_histogram(counts, 'Victim', title)
+        fig.savefig(io.BytesIO(), format='png')
+
+    yield 'triples_load_clean', lambda: clean_triples(load_triples(path))
+    yield 'histogram_aggregation', lambda: [top_value_counts(df, col, top_n=10) for col in COLUMNS_TO_ANALYZE]
+    yield 'chart_rendering', render
+
+
+def gbv_benchmarks(path, size):
+    """
+    Yields (benchmark name, callable) pairs for the GBV aggregation stages.
+    """
+    from mod_data import load_gbv, clean_gbv
+    from visualize_gbv_data import category_counts, stacked_counts
+
+    df = clean_gbv(load_gbv(path))
+
+    yield 'gbv_load_clean', lambda: clean_gbv(load_gbv(path))
+    yield 'gbv_aggregation', lambda: (category_counts(df, 'Focalization'),
+                                      stacked_counts(df, 'Level of Explicity', 'Rape/Non-Con Tag'))
+
+
+def run_benchmarks(preset, data_dir, repeat, only=None):
+    """
+    Runs every benchmark of a preset and returns the list of result records.
+    """
+    sizes = PRESETS[preset]
+    suites = []
+    for size in sizes['vocabulary']:
+        for shape in ['wide', 'deep']:
+            suites.append((f'vocabulary/{shape}', size, vocabulary_benchmarks, ensure_dataset(data_dir, 'vocabulary', size, shape)))
+    for size in sizes['triples']:
+        suites.append(('triples', size, triples_benchmarks, ensure_dataset(data_dir, 'triples', size)))
+    for size in sizes['gbv']:
+        suites.append(('gbv', size, gbv_benchmarks, ensure_dataset(data_dir, 'gbv', size)))
+
+    results = []
+    for dataset, size, benchmarks, path in suites:
+        for name, func in benchmarks(path, size):
+            if only and name not in only:
+                continue
+            times = time_call(func, repeat)
+            record = {
+                'benchmark': name,
+                'dataset': dataset,
+                'size': size,
+                'repeat': repeat,
+                'min_s': min(times),
+                'median_s': statistics.median(times),
+            }
+            results.append(record)
+            print(f"{name:<24} {dataset:<18} {size:>10,} {record['min_s'] * 1000:12.2f} ms")
+    return results
+
+
+def compare_to_baseline(results, baseline_path):
+    """
+    Prints the ratio of each result to the matching baseline result and returns the regressions.
+    """
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {(r['benchmark'], r['dataset'], r['size']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nCompared to {baseline_path}:")
+    for record in results:
+        key = (record['benchmark'], record['dataset'], record['size'])
+        if key not in baseline:
+            continue
+        ratio = record['min_s'] / baseline[key]['min_s'] if baseline[key]['min_s'] else float('inf')
+        flag = '  REGRESSION' if ratio > REGRESSION_THRESHOLD else ''
+        print(f"{key[0]:<24} {key[1]:<18} {key[2]:>10,} {ratio:8.2f}x{flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark parsing, aggregation and rendering on synthetic data.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="small", help="Dataset sizes to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed repetitions per benchmark.")
+    parser.add_argument("--only", nargs="+", help="Run only these benchmarks.")
+    parser.add_argument("--data-dir", help="Directory to cache the generated datasets in (default: a temporary directory).")
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--baseline", help="A previous JSON result file to compare against.")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='mod_benchmark_')
+    os.makedirs(data_dir, exist_ok=True)
+
+    try:
+        results = run_benchmarks(args.preset, data_dir, args.repeat, args.only)
+    finally:
+        # Generated datasets are only kept when a --data-dir was given to reuse them
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({
+                'preset': args.preset,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2)
+        print(f"Saved {args.output}")
+
+    if args.baseline and compare_to_baseline(results, args.baseline):
+        sys.exit(1)
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Number of resamples and confidence level of the intervals drawn on the charts
+BOOTSTRAP_REPLICATES = 2000
+CONFIDENCE_LEVEL = 0.95
+
+# Resamples are drawn in batches whose index matrix has at most this many cells,
+# so memory stays bounded for large tables while small ones take a single batch
+MAX_BATCH_CELLS = 4 * 10**6
+
+
+def bootstrap_proportions(codes, n_categories, replicates=BOOTSTRAP_REPLICATES, seed=0):
+    """
+    Returns the category proportions of bootstrap resamples of codes.
+
+    Each batch draws one (replicates, len(codes)) index matrix and counts the categories of all
+    its rows with a single bincount over row-offset codes.
+
+    Args:
+        codes (numpy.ndarray): Category code (0 to n_categories - 1) of every observation.
+        n_categories (int): Number of categories.
+        replicates (int): Number of resamples.
+        seed (int): Random seed.
+
+    Returns:
+        numpy.ndarray: A (replicates, n_categories) array of proportions.
+    """
+    codes = np.asarray(codes, dtype=np.int64)
+    n = len(codes)
+    proportions = np.zeros((replicates, n_categories))
+    if n == 0:
+        return proportions
+
+    rng = np.random.default_rng(seed)
+    batch_size = max(1, MAX_BATCH_CELLS // n)
+    for start in range(0, replicates, batch_size):
+        size = min(batch_size, replicates - start)
+        samples = codes[rng.integers(0, n, size=(size, n))]
+        samples += (np.arange(size) * n_categories)[:, None]
+        counts = np.bincount(samples.ravel(), minlength=size * n_categories)
+        proportions[start:start + size] = counts.reshape(size, n_categories) / n
+    return proportions
+
+
+def multinomial_proportions(totals, replicates=BOOTSTRAP_REPLICATES, seed=0):
+    """
+    Returns the category proportions of bootstrap resamples of observations with the given
+    category totals.
+
+    Resampling n observations with replacement gives multinomial(n, totals / n) category
+    counts, so these are drawn directly, without one index per observation.
+
+    Returns:
+        numpy.ndarray: A (replicates, len(totals)) array of proportions.
+    """
+    totals = np.asarray(totals, dtype=np.int64)
+    n = int(totals.sum())
+    if n == 0:
+        return np.zeros((replicates, len(totals)))
+    rng = np.random.default_rng(seed)
+    return rng.multinomial(n, totals / n, size=replicates) / n
+
+
+def category_proportion_intervals(values, replicates=BOOTSTRAP_REPLICATES, confidence=CONFIDENCE_LEVEL, seed=0,
+                                  counts=None):
+    """
+    Returns the proportion of every category of a Series with its percentile bootstrap interval.
+
+    Missing values are left out, as in value_counts(). With counts, every value stands for that
+    many observations, as in the pre-aggregated tables of the annotation store. The result is
+    indexed by category and has the columns 'proportion', 'lower' and 'upper'.
+    """
+    import pandas as pd
+
+    codes, categories = pd.factorize(values)
+    n_categories = len(categories)
+
+    if counts is None:
+        codes = codes[codes >= 0]
+        totals = np.bincount(codes, minlength=n_categories)
+        resampled = bootstrap_proportions(codes, n_categories, replicates, seed)
+    else:
+        present = codes >= 0
+        totals = np.bincount(codes[present], weights=np.asarray(counts)[present], minlength=n_categories)
+        totals = totals.astype(np.int64)
+        resampled = multinomial_proportions(totals, replicates, seed)
+
+    point = totals / max(totals.sum(), 1)
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(resampled, [alpha, 1 - alpha], axis=0)
+    return pd.DataFrame({'proportion': point, 'lower': lower, 'upper': upper}, index=categories)
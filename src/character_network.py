@@ -0,0 +1,228 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.sparse.csgraph import connected_components
+
+from instrumentation import stage, timed_stage
+from mod_data import PROJECT_ROOT, load_triples, clean_triples
+
+# pyvis keeps every node in Python lists and the browser lays them all out,
+# so only this many characters (the highest ranked) are drawn
+MAX_DRAWN_CHARACTERS = 300
+
+
+class CharacterNetwork:
+    """
+    The directed perpetrator -> victim graph of the triples as sparse matrices.
+
+    Characters are numbered by first appearance. adjacency[p, v] is the number of
+    triples in which p is the perpetrator and v the victim, murders[p, v] the number of
+    those flagged as murder; both share one sparsity pattern, so the edges are the
+    stored entries of adjacency in CSR order and edge_modes[k] is the most frequent
+    mode of demise of edge k (a specified mode wins over 'unspecified').
+    """
+    __slots__ = ('names', 'adjacency', 'murders', 'edge_modes')
+
+    def __init__(self, names, adjacency, murders, edge_modes):
+        self.names = names
+        self.adjacency = adjacency
+        self.murders = murders
+        self.edge_modes = edge_modes
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def from_triples(cls, data_frame):
+        """
+        Builds the network from cleaned triples, skipping rows without a victim or perpetrator.
+        """
+        known = (data_frame['Victim'] != 'unspecified') & (data_frame['Perpetrator'] != 'unspecified')
+        df = data_frame[known]
+        n_rows = len(df)
+
+        codes, names = pd.factorize(np.concatenate([df['Perpetrator'].to_numpy(), df['Victim'].to_numpy()]))
+        n = len(names)
+        perpetrators = codes[:n_rows].astype(np.int64)
+        victims = codes[n_rows:].astype(np.int64)
+
+        # One key per (perpetrator, victim) pair; sorted unique keys are in CSR order
+        keys = perpetrators * n + victims
+        edge_keys, edge_of_row, weights = np.unique(keys, return_inverse=True, return_counts=True)
+        rows = edge_keys // n
+        indices = (edge_keys % n).astype(np.int32)
+        indptr = np.searchsorted(rows, np.arange(n + 1))
+
+        is_murder = (df['Murder'] == 'yes').to_numpy()
+        murder_counts = np.bincount(edge_of_row[is_murder], minlength=len(edge_keys))
+
+        adjacency = sp.csr_matrix((weights.astype(float), indices, indptr), shape=(n, n))
+        murders = sp.csr_matrix((murder_counts.astype(float), indices.copy(), indptr.copy()), shape=(n, n))
+
+        # Dominant mode per edge: count (edge, mode) pairs, then take the best pair of each edge
+        mode_codes, modes = pd.factorize(df['Mode of Demise'])
+        pair_keys, pair_counts = np.unique(edge_of_row * len(modes) + mode_codes, return_counts=True)
+        pair_edges = pair_keys // len(modes)
+        pair_modes = pair_keys % len(modes)
+        unspecified = np.asarray(modes == 'unspecified')[pair_modes]
+        order = np.lexsort((-pair_counts, unspecified, pair_edges))
+        first = np.r_[True, pair_edges[order][1:] != pair_edges[order][:-1]]
+        edge_modes = np.asarray(modes, dtype=object)[pair_modes[order][first]]
+
+        return cls(np.asarray(names, dtype=object), adjacency, murders, edge_modes)
+
+    def edges(self):
+        """
+        Returns the (perpetrator, victim) index arrays of all edges in CSR order.
+        """
+        perpetrators = np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.adjacency.indptr))
+        return perpetrators, self.adjacency.indices
+
+
+def degrees(adjacency):
+    """
+    Returns the in- and out-degree of every node, by distinct neighbours and by edge weight.
+    """
+    csc = adjacency.tocsc()
+    return {
+        'out_degree': np.diff(adjacency.indptr),
+        'in_degree': np.diff(csc.indptr),
+        'out_weight': np.asarray(adjacency.sum(axis=1)).ravel(),
+        'in_weight': np.asarray(adjacency.sum(axis=0)).ravel(),
+    }
+
+
+@timed_stage('aggregate')
+def pagerank(adjacency, damping=0.85, tol=1e-10, max_iter=100):
+    """
+    Computes weighted PageRank by power iteration on the sparse transition matrix.
+
+    Args:
+        adjacency (scipy.sparse matrix): Edge weights, adjacency[i, j] for an edge i -> j.
+        damping (float): Probability of following an edge instead of jumping to a random node.
+        tol (float): Stop when the L1 change of the ranks falls below this.
+        max_iter (int): Maximum number of iterations.
+
+    Returns:
+        numpy.ndarray: Ranks summing to 1. Nodes without out-edges spread their rank evenly.
+    """
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.divide(1.0, out_weight, out=np.zeros(n), where=~dangling)
+    transition = (sp.diags(inverse) @ adjacency).T.tocsr()
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        new_rank = damping * (transition @ rank + rank[dangling].sum() / n) + (1.0 - damping) / n
+        change = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if change < tol:
+            break
+    return rank
+
+
+@timed_stage('aggregate')
+def strongly_connected_components(adjacency):
+    """
+    Returns (number of components, component label of every node).
+    """
+    return connected_components(adjacency, directed=True, connection='strong')
+
+
+def component_sizes(labels):
+    """
+    Returns the size of the component of every node.
+    """
+    return np.bincount(labels)[labels]
+
+
+def build_network_page(network, ranks, labels, max_nodes=MAX_DRAWN_CHARACTERS):
+    """
+    Creates a pyvis network of the highest ranked characters, styled like the vocabulary graph.
+
+    Node size follows PageRank; characters in a strongly connected component with others
+    share a color group. Edge width follows the number of triples.
+    """
+    from generate_pyvis_graph import new_network, apply_network_style
+
+    n = len(network)
+    if n > max_nodes:
+        drawn = np.argpartition(-ranks, max_nodes - 1)[:max_nodes]
+    else:
+        drawn = np.arange(n)
+    drawn = drawn[np.argsort(-ranks[drawn], kind='stable')]
+
+    degree = degrees(network.adjacency)
+    sizes = component_sizes(labels)
+    top_rank = ranks[drawn].max() if len(drawn) else 1.0
+
+    net = new_network()
+    for i in drawn:
+        title = (f"{network.names[i]}\nPageRank: {ranks[i]:.4f}"
+                 f"\nVictims: {degree['out_degree'][i]} ({degree['out_weight'][i]:.0f} triples)"
+                 f"\nPerpetrators: {degree['in_degree'][i]} ({degree['in_weight'][i]:.0f} triples)")
+        options = {'title': title, 'shape': 'dot', 'size': 10 + 30 * float(ranks[i] / top_rank)}
+        if sizes[i] > 1:
+            options['group'] = int(labels[i])
+        net.add_node(int(i), label=network.names[i], **options)
+
+    is_drawn = np.zeros(n, dtype=bool)
+    is_drawn[drawn] = True
+    perpetrators, victims = network.edges()
+    for k in np.flatnonzero(is_drawn[perpetrators] & is_drawn[victims]):
+        events = network.adjacency.data[k]
+        murders = network.murders.data[k]
+        net.add_edge(int(perpetrators[k]), int(victims[k]), value=float(events),
+                     title=f"{network.edge_modes[k]} ({events:.0f} events, {murders:.0f} murders)")
+
+    apply_network_style(net)
+    return net
+
+
+def main(max_nodes=MAX_DRAWN_CHARACTERS, top_n=10):
+    """
+    Builds the character network, prints its most central characters and writes character_network.html.
+    """
+    try:
+        df = clean_triples(load_triples())
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    with stage('aggregate', 'CharacterNetwork.from_triples'):
+        network = CharacterNetwork.from_triples(df)
+    ranks = pagerank(network.adjacency)
+    n_components, labels = strongly_connected_components(network.adjacency)
+    sizes = np.bincount(labels)
+
+    print(f"{len(network)} characters, {network.adjacency.nnz} perpetrator-victim pairs")
+    print(f"{n_components} strongly connected components, {np.sum(sizes > 1)} with more than one character "
+          f"(largest: {sizes.max() if len(sizes) else 0})")
+    print(f"\nTop {top_n} characters by PageRank:")
+    degree = degrees(network.adjacency)
+    for i in np.argsort(-ranks, kind='stable')[:top_n]:
+        print(f"  {network.names[i]:<24} {ranks[i]:.4f}  "
+              f"victims: {degree['out_degree'][i]:>4}  perpetrators: {degree['in_degree'][i]:>4}")
+
+    with stage('render', 'character network'):
+        html = build_network_page(network, ranks, labels, max_nodes).generate_html()
+
+    output_path = os.path.join(PROJECT_ROOT, 'character_network.html')
+    with stage('write', 'character_network.html'):
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+    print(f"Saved {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the perpetrator -> victim network of the triples.")
+    parser.add_argument("--max-nodes", type=int, default=MAX_DRAWN_CHARACTERS, help="Most characters to draw.")
+    parser.add_argument("--top", type=int, default=10, help="Number of top characters to print.")
+    args = parser.parse_args()
+    main(args.max_nodes, args.top)
@@ -0,0 +1,93 @@
+import math
+import threading
+
+from matplotlib.figure import Figure
+
+# Templates already built in this process, by chart type
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+class BarChartTemplate:
+    """
+    A bar chart whose figure, axes and bars are built once and updated in place.
+
+    update() only changes bar heights, tick labels and texts, so rendering many charts of
+    the same type costs little more than rasterizing them. The tight_layout result is
+    cached by number of bars and rough label extents, and reused for similar data.
+    Hold the template's lock while updating and saving if it is shared between threads.
+    """
+
+    def __init__(self, figsize, color, ylabel, width=0.5, rotation=45, capacity=10):
+        self.figure = Figure(figsize=figsize)
+        self.ax = self.figure.add_subplot()
+        self.color = color
+        self.width = width
+        self.rotation = rotation
+        self.bars = []
+        self.layouts = {}
+        self.lock = threading.Lock()
+
+        self.ax.set_ylabel(ylabel)
+        self.ax.grid(axis='y', linestyle='--', alpha=0.7)
+        self.ensure_capacity(capacity)
+
+    def ensure_capacity(self, n):
+        """
+        Adds bars until the template can show n of them.
+        """
+        if n <= len(self.bars):
+            return
+        new_positions = range(len(self.bars), n)
+        container = self.ax.bar(new_positions, [0] * len(new_positions), self.width, color=self.color)
+        self.bars.extend(container.patches)
+
+    def layout_key(self, labels, ymax):
+        # Labels within 4 characters of each other and y limits with the same number of digits share a layout
+        longest = max((len(label) for label in labels), default=0)
+        return len(labels), math.ceil(longest / 4), len(str(int(ymax)))
+
+    def update(self, labels, values, title, xlabel=''):
+        """
+        Shows one dataset: bar heights, tick labels, title and x label.
+        """
+        labels = [str(label) for label in labels]
+        values = [float(value) for value in values]
+        n = len(values)
+        self.ensure_capacity(n)
+
+        for i, bar in enumerate(self.bars):
+            if i < n:
+                bar.set_height(values[i])
+                bar.set_visible(True)
+            else:
+                bar.set_visible(False)
+
+        ax = self.ax
+        ax.set_xticks(range(n), labels, rotation=self.rotation, ha='right' if self.rotation else 'center')
+        # A unit span when there are no bars, since equal limits make matplotlib warn
+        ax.set_xlim(-0.5, max(n, 1) - 0.5)
+        ymax = max(values, default=0)
+        ax.set_ylim(0, ymax * 1.05 if ymax > 0 else 1)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+
+        key = self.layout_key(labels, ymax)
+        layout = self.layouts.get(key)
+        if layout is None:
+            self.figure.tight_layout()
+            params = self.figure.subplotpars
+            self.layouts[key] = dict(left=params.left, right=params.right, bottom=params.bottom, top=params.top)
+        else:
+            self.figure.subplots_adjust(**layout)
+
+
+def get_template(chart_type, factory):
+    """
+    Returns the template for a chart type, building it with factory() on first use.
+    """
+    with _templates_lock:
+        template = _templates.get(chart_type)
+        if template is None:
+            template = _templates[chart_type] = factory()
+        return template
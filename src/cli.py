@@ -0,0 +1,256 @@
+import argparse
+import importlib
+import sys
+import time
+
+# Every import made through lazy_import, as (module name, seconds), for --profile-startup
+IMPORT_TIMES = []
+
+
+def lazy_import(module_name):
+    """
+    Imports a module on first use and records how long the import took.
+    """
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMES.append((module_name, time.perf_counter() - start))
+    return module
+
+
+def sample_size(text):
+    """
+    Checks the N of --sample N; sampling (and with it NumPy) is only imported when one is given.
+    """
+    return lazy_import('sampling').sample_size(text)
+
+
+# Each subcommand lists the third-party libraries it needs, so they are imported (and timed)
+# before the project modules that use them and never by the subcommands that do not.
+
+def run_counts(args):
+    lazy_import('count_modes_of_demise').main()
+
+
+def run_query(args):
+    lazy_import('analyze_eurydice_deaths').main(args.victim, args.store)
+
+
+def run_charts(args):
+    for library in ['pandas', 'matplotlib.figure']:
+        lazy_import(library)
+    visualize_data = lazy_import('visualize_data')
+    min_count = args.min_count if args.min_count is not None else visualize_data.FACET_MIN_COUNT
+    strata_column = None if args.reservoir else visualize_data.SAMPLE_STRATA
+    visualize_data.main(facets=args.facets, min_count=min_count, store=args.store, confidence_intervals=args.ci,
+                        sample=args.sample, strata_column=strata_column)
+    if args.sample:
+        # The other charts are not drawn from the sample, so a preview stops here
+        return
+    lazy_import('visualize_murder_distribution').main(args.store)
+    for module_name in ['create_demise_histogram', 'create_demise_pie_chart', 'create_styled_histogram']:
+        lazy_import(module_name).main()
+
+
+def run_gbv(args):
+    for library in ['pandas', 'matplotlib.figure']:
+        lazy_import(library)
+    visualize_gbv_data = lazy_import('visualize_gbv_data')
+    strata_column = None if args.reservoir else visualize_gbv_data.SAMPLE_STRATA
+    visualize_gbv_data.main(args.store, args.ci, args.sample, strata_column)
+
+
+def run_store(args):
+    lazy_import('pandas')
+    lazy_import('annotation_store').main(args.kind, args.csv_path, args.store or lazy_import('mod_data').ANNOTATIONS_DB)
+
+
+def run_delta(args):
+    lazy_import('numpy')
+    mod_data = lazy_import('mod_data')
+    lazy_import('delta_aggregates').main(args.csv or mod_data.TRIPLES_CSV, args.state or mod_data.TRIPLES_AGGREGATES)
+
+
+def run_agreement(args):
+    lazy_import('pandas')
+    lazy_import('annotator_agreement').main(args.paths, args.kind, args.key)
+
+
+def run_crosstab(args):
+    lazy_import('pandas')
+    lazy_import('contingency').main(args.kind, args.columns, args.associations, args.max_categories)
+
+
+def run_serve(args):
+    for library in ['pandas', 'matplotlib.figure']:
+        lazy_import(library)
+    lazy_import('dashboard_server').main(args.host, args.port, args.cache_size)
+
+
+def run_vocab_diff(args):
+    lazy_import('pandas')
+    mod_data = lazy_import('mod_data')
+    lazy_import('vocabulary_diff').main(args.old_ttl, args.new_ttl or mod_data.VOCABULARY_TTL,
+                                        args.csv or mod_data.TRIPLES_CSV, args.output, args.merge_removed, args.rows)
+
+
+def run_rdf(args):
+    lazy_import('pandas')
+    mod_data = lazy_import('mod_data')
+    lazy_import('rdf_export').main(args.output, args.format, args.csv or mod_data.TRIPLES_CSV)
+
+
+def run_features(args):
+    for library in ['pandas', 'scipy.sparse']:
+        lazy_import(library)
+    mod_data = lazy_import('mod_data')
+    lazy_import('feature_matrix').main(args.csv or mod_data.TRIPLES_CSV, args.output or mod_data.TRIPLES_FEATURES)
+
+
+def run_hierarchy(args):
+    lazy_import('generate_interactive_hierarchy').main()
+
+
+def run_pyvis(args):
+    lazy_import('pyvis.network')
+    lazy_import('generate_pyvis_graph').main()
+
+
+def run_network(args):
+    for library in ['pandas', 'scipy.sparse', 'pyvis.network']:
+        lazy_import(library)
+    lazy_import('character_network').main(args.max_nodes)
+
+
+def run_skos(args):
+    lazy_import('graphviz')
+    lazy_import('visualize_skos').main(args.root_concept, args.output_filename)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Analyses and visualizations of the mode of demise annotations.")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print how long each lazily imported module took to import.")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Record stage timings and memory and write them as JSON to PATH (a file or directory). "
+                             "Setting MOD_TRACE=1 does the same for any script.")
+    parser.add_argument("--store", metavar="PATH",
+                        help="Read the triples and GBV instances from this annotation database instead of the CSVs "
+                             "(query, charts, gbv), or the database to append to (store).")
+    parser.add_argument("--cache-dir", metavar="PATH",
+                        help="Also keep computed aggregates in this directory, so later runs on the same data reuse them. "
+                             "Setting MOD_AGGREGATE_CACHE=PATH does the same for any script.")
+    parser.add_argument("--cache-stats", action="store_true", help="Print the hits and misses of the aggregate cache.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("counts", help="Print the number of modes of demise per upper category.").set_defaults(func=run_counts)
+
+    query_parser = subparsers.add_parser("query", help="Print the death events of one victim.")
+    query_parser.add_argument("victim", nargs="?", default="Orpheus", help="The victim to look up (case-insensitive, partial match).")
+    query_parser.set_defaults(func=run_query)
+
+    charts_parser = subparsers.add_parser("charts", help="Generate the charts of the triples and of the vocabulary categories.")
+    charts_parser.add_argument("--facets", action="store_true", help="Also generate per-victim and per-perpetrator drilldown charts.")
+    charts_parser.add_argument("--min-count", type=int, help="Minimum rows for an entity to get drilldown charts.")
+    charts_parser.add_argument("--ci", action="store_true", help="Draw bootstrap confidence intervals of the 'unspecified' shares.")
+    charts_parser.add_argument("--sample", type=sample_size, metavar="N",
+                               help="Render previews of the triples charts into images/previews from a sample of N rows, "
+                                    "stratified on Perpetrator; every perpetrator keeps a row, even beyond N.")
+    charts_parser.add_argument("--reservoir", action="store_true", help="With --sample, draw a plain random sample instead.")
+    charts_parser.set_defaults(func=run_charts)
+    gbv_parser = subparsers.add_parser("gbv", help="Generate the charts of the GBV instances.")
+    gbv_parser.add_argument("--ci", action="store_true", help="Draw bootstrap confidence intervals of the category shares.")
+    gbv_parser.add_argument("--sample", type=sample_size, metavar="N",
+                            help="Render previews into images/previews from a sample of N rows, stratified on Focalization; "
+                                 "every focalization keeps a row, even beyond N.")
+    gbv_parser.add_argument("--reservoir", action="store_true", help="With --sample, draw a plain random sample instead.")
+    gbv_parser.set_defaults(func=run_gbv)
+    store_parser = subparsers.add_parser("store", help="Append a CSV batch of annotations to the annotation database.")
+    store_parser.add_argument("kind", choices=["triples", "gbv"], help="What the CSV holds.")
+    store_parser.add_argument("csv_path", help="A CSV in the layout of MoD_Triples.csv or Instances_of_GBV_anonym.csv.")
+    store_parser.set_defaults(func=run_store)
+    delta_parser = subparsers.add_parser("delta", help="Update the stored triples aggregates with the changes since the last run.")
+    delta_parser.add_argument("--csv", help="The triples CSV (default: MoD_Triples.csv).")
+    delta_parser.add_argument("--state", help="Where the fingerprints and aggregates are kept (default: MoD_Triples.aggregates.json).")
+    delta_parser.set_defaults(func=run_delta)
+    agreement_parser = subparsers.add_parser("agreement", help="Compute inter-annotator agreement between annotation files.")
+    agreement_parser.add_argument("paths", nargs="+", help="One annotation file per annotator.")
+    agreement_parser.add_argument("--kind", choices=["gbv", "triples"], default="gbv", help="The layout of the files.")
+    agreement_parser.add_argument("--key", help="Column that identifies an item in every file (default: row position).")
+    agreement_parser.set_defaults(func=run_agreement)
+    crosstab_parser = subparsers.add_parser("crosstab", help="Print contingency tables and column associations.")
+    crosstab_parser.add_argument("kind", choices=["triples", "gbv"], help="The dataset to tabulate.")
+    crosstab_parser.add_argument("columns", nargs="*",
+                                 help="Two or three columns, the first one giving the rows. May be left out with --associations.")
+    crosstab_parser.add_argument("--associations", action="store_true",
+                                 help="Also print chi-square and Cramér's V for all column pairs.")
+    crosstab_parser.add_argument("--max-categories", type=int, default=1000,
+                                 help="Leave columns with more categories out of --associations.")
+    crosstab_parser.set_defaults(func=run_crosstab)
+    serve_parser = subparsers.add_parser("serve", help="Serve aggregates, charts and the vocabulary pages locally.")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+    serve_parser.add_argument("--port", type=int, default=8000, help="The port to listen on.")
+    serve_parser.add_argument("--cache-size", type=int, default=256, help="Number of responses kept in memory.")
+    serve_parser.set_defaults(func=run_serve)
+    vocab_diff_parser = subparsers.add_parser("vocab-diff", help="Compare two vocabulary versions and migrate the triples they affect.")
+    vocab_diff_parser.add_argument("old_ttl", help="The previous version of the vocabulary.")
+    vocab_diff_parser.add_argument("new_ttl", nargs="?", help="The revised vocabulary (default: catalogue_MOD.ttl).")
+    vocab_diff_parser.add_argument("--csv", help="The triples to check (default: MoD_Triples.csv).")
+    vocab_diff_parser.add_argument("--rows", action="store_true", help="List the CSV line numbers of the affected triples.")
+    vocab_diff_parser.add_argument("--output", help="Write the triples with renamed and relabelled modes of demise to this CSV.")
+    vocab_diff_parser.add_argument("--merge-removed", action="store_true",
+                                   help="With --output, also move the triples of removed modes to their nearest kept ancestor.")
+    vocab_diff_parser.set_defaults(func=run_vocab_diff)
+    rdf_parser = subparsers.add_parser("rdf", help="Export the triples as RDF linked to the vocabulary concepts.")
+    rdf_parser.add_argument("--format", choices=["nt", "ttl"], default="nt", help="N-Triples or Turtle.")
+    rdf_parser.add_argument("--output", help="The output file (default: MoD_Triples.nt or MoD_Triples.ttl).")
+    rdf_parser.add_argument("--csv", help="The triples CSV to export (default: MoD_Triples.csv).")
+    rdf_parser.set_defaults(func=run_rdf)
+    features_parser = subparsers.add_parser("features", help="Export the triples as a sparse, ancestor-expanded feature matrix.")
+    features_parser.add_argument("--csv", help="The triples CSV (default: MoD_Triples.csv).")
+    features_parser.add_argument("--output", help="The .npz file to write (default: MoD_Triples.features.npz).")
+    features_parser.set_defaults(func=run_features)
+    subparsers.add_parser("hierarchy", help="Generate the interactive hierarchy.html.").set_defaults(func=run_hierarchy)
+    subparsers.add_parser("pyvis", help="Generate the pyvis network of the vocabulary.").set_defaults(func=run_pyvis)
+
+    network_parser = subparsers.add_parser("network", help="Generate the perpetrator -> victim network of the triples.")
+    network_parser.add_argument("--max-nodes", type=int, default=300, help="Most characters to draw.")
+    network_parser.set_defaults(func=run_network)
+
+    skos_parser = subparsers.add_parser("skos", help="Render part of the vocabulary with Graphviz.")
+    skos_parser.add_argument("root_concept", help="The root concept ID to start the visualization from.")
+    skos_parser.add_argument("output_filename", help="The name of the output file (without extension).")
+    skos_parser.set_defaults(func=run_skos)
+
+    return parser
+
+
+def print_import_profile():
+    print("\nImport times:", file=sys.stderr)
+    for module_name, seconds in IMPORT_TIMES:
+        print(f"  {module_name:<32} {seconds * 1000:8.1f} ms", file=sys.stderr)
+    total = sum(seconds for _, seconds in IMPORT_TIMES)
+    print(f"  {'total':<32} {total * 1000:8.1f} ms", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    instrumentation = lazy_import('instrumentation')
+    if args.trace is not None:
+        instrumentation.enable(args.trace)
+    if args.cache_dir is not None:
+        lazy_import('aggregate_cache').configure(spill_dir=args.cache_dir)
+    try:
+        with instrumentation.stage('run', args.command):
+            args.func(args)
+    finally:
+        if args.profile_startup:
+            print_import_profile()
+        if args.cache_stats:
+            lazy_import('aggregate_cache').print_stats()
+
+
+if __name__ == "__main__":
+    main()
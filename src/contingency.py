@@ -0,0 +1,269 @@
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from analyze_eurydice_deaths import format_markdown_table
+from instrumentation import timed_stage
+from mod_data import COUNT_COLUMN, TRIPLE_COLUMNS, row_counts, load_vocabulary, load_triples, clean_triples, load_gbv, clean_gbv
+
+# Name of the derived column holding the upper vocabulary category of each mode of demise
+DEMISE_CATEGORY = 'Demise Category'
+
+# Number of columns a printed contingency table can have, the first one giving its rows
+MIN_CROSSTAB_COLUMNS = 2
+MAX_CROSSTAB_COLUMNS = 3
+
+# Columns with more categories than this are left out of the association tests by default
+ASSOCIATION_MAX_CATEGORIES = 1000
+
+
+class EncodedTable:
+    """
+    The categorical columns of a table, each encoded once as integer codes.
+
+    Categories are sorted, so tables list 'no' before 'yes'; missing values have code -1
+    and are left out of every table that uses their column. The rows of a pre-aggregated
+    table carry weights, the number of annotations each stands for, which the tables add up.
+    """
+    __slots__ = ('codes', 'categories', 'weights')
+
+    def __init__(self):
+        self.codes = {}
+        self.categories = {}
+        self.weights = None
+
+    @classmethod
+    @timed_stage('parse')
+    def from_frame(cls, data_frame, columns=None):
+        """
+        Encodes the given columns (default: all) after stripping and lowercasing their values.
+        The COUNT_COLUMN of a pre-aggregated table becomes the row weights instead.
+        """
+        table = cls()
+        table.weights = row_counts(data_frame)
+        if columns is None:
+            columns = [col for col in data_frame.columns if col != COUNT_COLUMN]
+        for col in columns:
+            values = data_frame[col].astype('string').str.strip().str.lower()
+            table.add_column(col, *pd.factorize(values, sort=True))
+        return table
+
+    def add_column(self, name, codes, categories):
+        self.codes[name] = np.asarray(codes, dtype=np.int64)
+        self.categories[name] = pd.Index(categories)
+
+    def add_mapped_column(self, name, source, mapping):
+        """
+        Adds a column derived from another one by mapping its categories, e.g. modes to their
+        upper category. Categories missing from mapping become missing values.
+        """
+        mapped = [mapping.get(category) for category in self.categories[source]]
+        codes, categories = pd.factorize(pd.Series(mapped, dtype=object), sort=True)
+        # Appending -1 makes index -1 (a missing source value) map to missing as well
+        self.add_column(name, np.append(codes, -1)[self.codes[source]], categories)
+
+    def __len__(self):
+        return len(next(iter(self.codes.values()), ()))
+
+    def combined_codes(self, columns):
+        """
+        Returns one code per row for the combination of the columns' values (-1 where any is missing)
+        and the shape of the table they index.
+        """
+        shape = tuple(len(self.categories[col]) for col in columns)
+        combined = np.zeros(len(self), dtype=np.int64)
+        missing = np.zeros(len(self), dtype=bool)
+        for col, size in zip(columns, shape):
+            combined = combined * size + self.codes[col]
+            missing |= self.codes[col] < 0
+        combined[missing] = -1
+        return combined, shape
+
+    @timed_stage('aggregate')
+    def crosstab(self, *columns):
+        """
+        Returns the N-way contingency table of the columns as an array, from one bincount.
+        """
+        combined, shape = self.combined_codes(columns)
+        present = combined >= 0
+        weights = self.weights[present] if self.weights is not None else None
+        counts = np.bincount(combined[present], weights, minlength=int(np.prod(shape)))
+        return counts.astype(np.int64).reshape(shape)
+
+    def crosstab_frame(self, index_col, *stack_cols):
+        """
+        Returns the contingency table as a DataFrame with one row per index_col value and one
+        column per combination of the stack_cols values (a MultiIndex for several columns).
+        Rows and columns without any occurrence are dropped.
+        """
+        counts = self.crosstab(index_col, *stack_cols)
+        index = self.categories[index_col]
+        if len(stack_cols) == 1:
+            columns = self.categories[stack_cols[0]]
+        else:
+            columns = pd.MultiIndex.from_product([self.categories[col] for col in stack_cols], names=stack_cols)
+        table = pd.DataFrame(counts.reshape(len(index), -1), index=index, columns=columns)
+        table.index.name = index_col
+        if len(stack_cols) == 1:
+            table.columns.name = stack_cols[0]
+        return table.loc[table.sum(axis=1) > 0, table.sum(axis=0) > 0]
+
+
+@timed_stage('aggregate')
+def pairwise_associations(table, columns=None, max_categories=ASSOCIATION_MAX_CATEGORIES):
+    """
+    Computes the chi-square test and Cramér's V of every pair of columns.
+
+    The non-zero cells of all pairs' 2-way tables come from a single np.unique over pair-offset
+    codes, and the statistics are computed from those cells only, so the cost follows the number
+    of rows rather than the size of the tables. Columns with more than max_categories categories
+    (None for no limit) are skipped, as a chi-square over tables that sparse says little.
+    Returns a DataFrame indexed by (column, column) with chi2, dof, p_value and cramers_v.
+    """
+    from scipy.stats import chi2 as chi2_distribution
+
+    columns = list(columns if columns is not None else table.codes)
+    if max_categories is not None:
+        columns = [col for col in columns if len(table.categories[col]) <= max_categories]
+    pairs = list(itertools.combinations(columns, 2))
+    if not pairs:
+        return pd.DataFrame(columns=['chi2', 'dof', 'p_value', 'cramers_v'])
+
+    keys = []
+    weights = []
+    offsets = [0]
+    for first, second in pairs:
+        combined, shape = table.combined_codes([first, second])
+        present = combined >= 0
+        keys.append(combined[present] + offsets[-1])
+        weights.append(table.weights[present] if table.weights is not None else np.ones(present.sum(), dtype=np.int64))
+        offsets.append(offsets[-1] + shape[0] * shape[1])
+    cells, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+    cell_counts = np.bincount(inverse, np.concatenate(weights), minlength=len(cells))
+
+    rows = []
+    bounds = np.searchsorted(cells, offsets)
+    for (first, second), start, low, high in zip(pairs, offsets[:-1], bounds[:-1], bounds[1:]):
+        observed = cell_counts[low:high]
+        # Categories that never co-occur with a value of the other column are left out
+        row_codes, row_of_cell = np.unique((cells[low:high] - start) // len(table.categories[second]), return_inverse=True)
+        column_codes, column_of_cell = np.unique((cells[low:high] - start) % len(table.categories[second]),
+                                                 return_inverse=True)
+        n = observed.sum()
+        n_rows, n_columns = len(row_codes), len(column_codes)
+        if n == 0 or min(n_rows, n_columns) < 2:
+            rows.append((first, second, np.nan, 0, np.nan, np.nan))
+            continue
+        row_totals = np.bincount(row_of_cell, observed)
+        column_totals = np.bincount(column_of_cell, observed)
+        # The sum of (observed - expected)^2 / expected over all cells, of which only the non-zero
+        # ones contribute more than their expected count, which adds up to n
+        chi2 = n * (observed ** 2 / (row_totals[row_of_cell] * column_totals[column_of_cell])).sum() - n
+        dof = (n_rows - 1) * (n_columns - 1)
+        cramers_v = np.sqrt(chi2 / (n * (min(n_rows, n_columns) - 1)))
+        rows.append((first, second, chi2, dof, chi2_distribution.sf(chi2, dof), cramers_v))
+
+    return pd.DataFrame(rows, columns=['first', 'second', 'chi2', 'dof', 'p_value', 'cramers_v']).set_index(['first', 'second'])
+
+
+def demise_category_mapping(vocabulary, mode_labels):
+    """
+    Maps lowercased mode of demise labels to the short name of their upper category.
+    Labels that are not in the vocabulary, or not below an upper category, are left out.
+    """
+    from count_modes_of_demise import UPPER_CATEGORIES
+
+    upper = {vocabulary.index_of(category_id): name
+             for category_id, name in UPPER_CATEGORIES.items() if category_id in vocabulary}
+    index_of_label = {}
+    for i in range(len(vocabulary)):
+        index_of_label.setdefault(vocabulary.label_of(i).strip().lower(), i)
+
+    mapping = {}
+    for label in mode_labels:
+        concept = index_of_label.get(label)
+        if concept is None:
+            continue
+        for ancestor in vocabulary.ancestors(concept):
+            if ancestor in upper:
+                mapping[label] = upper[ancestor]
+                break
+    return mapping
+
+
+def encode_triples(data_frame, vocabulary=None):
+    """
+    Encodes cleaned triples, treating 'unspecified' as missing, and adds the upper vocabulary
+    category of each mode of demise as DEMISE_CATEGORY if a vocabulary is given.
+    """
+    columns = [col for col in TRIPLE_COLUMNS + [COUNT_COLUMN] if col in data_frame.columns]
+    table = EncodedTable.from_frame(data_frame[columns].replace('unspecified', pd.NA))
+    if vocabulary is not None and 'Mode of Demise' in table.codes:
+        mapping = demise_category_mapping(vocabulary, table.categories['Mode of Demise'])
+        table.add_mapped_column(DEMISE_CATEGORY, 'Mode of Demise', mapping)
+    return table
+
+
+def format_crosstab(table):
+    """
+    Formats a crosstab_frame result as a Markdown table.
+    """
+    headers = [table.index.name or ''] + [' / '.join(col) if isinstance(col, tuple) else str(col) for col in table.columns]
+    rows = [[index] + [int(value) for value in values] for index, values in zip(table.index, table.to_numpy())]
+    return format_markdown_table(headers, rows)
+
+
+def main(kind, columns, associations=False, max_categories=ASSOCIATION_MAX_CATEGORIES):
+    """
+    Prints the contingency table of the given columns of the triples or of the GBV instances,
+    and optionally the chi-square association of every pair of columns with at most
+    max_categories categories.
+    """
+    if not MIN_CROSSTAB_COLUMNS <= len(columns) <= MAX_CROSSTAB_COLUMNS and not (associations and not columns):
+        print(f"Error: give {MIN_CROSSTAB_COLUMNS} to {MAX_CROSSTAB_COLUMNS} columns to tabulate, "
+              f"or only --associations, not {len(columns)} column(s).")
+        return
+
+    try:
+        if kind == 'triples':
+            table = encode_triples(clean_triples(load_triples()), load_vocabulary())
+        else:
+            table = EncodedTable.from_frame(clean_gbv(load_gbv()))
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    unknown = [col for col in columns if col not in table.codes]
+    if unknown:
+        print(f"Error: unknown column(s) {', '.join(unknown)}. Available: {', '.join(table.codes)}.")
+        return
+
+    if columns:
+        print(format_crosstab(table.crosstab_frame(*columns)))
+
+    if associations:
+        result = pairwise_associations(table, max_categories=max_categories)
+        rows = [[first, second, round(row.chi2, 2), int(row.dof), float(f"{row.p_value:.3g}"), round(row.cramers_v, 3)]
+                for (first, second), row in result.iterrows() if not np.isnan(row.chi2)]
+        print(f"\nAssociation between all {kind} columns:")
+        print(format_markdown_table(['Column', 'Column', 'Chi2', 'Dof', 'p', "Cramér's V"], rows))
+        skipped = [col for col in table.codes if len(table.categories[col]) > max_categories]
+        if skipped:
+            print(f"\nSkipped columns with more than {max_categories} categories: {', '.join(skipped)}. "
+                  "Raise --max-categories to include them.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print contingency tables and column associations.")
+    parser.add_argument("kind", choices=["triples", "gbv"], help="The dataset to tabulate.")
+    parser.add_argument("columns", nargs="*",
+                        help=f"Two or three columns, the first one giving the rows (triples also have '{DEMISE_CATEGORY}'). "
+                             "May be left out with --associations.")
+    parser.add_argument("--associations", action="store_true", help="Also print chi-square and Cramér's V for all column pairs.")
+    parser.add_argument("--max-categories", type=int, default=ASSOCIATION_MAX_CATEGORIES,
+                        help="Leave columns with more categories out of --associations.")
+    args = parser.parse_args()
+
+    main(args.kind, args.columns, args.associations, args.max_categories)
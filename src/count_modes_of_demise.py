@@ -1,99 +1,46 @@
-import re
-
-def parse_ttl_to_dict(ttl_content):
+from instrumentation import timed_stage
+from mod_data import load_vocabulary
+
+# The upper categories of the vocabulary, with the short names used in the charts
+UPPER_CATEGORIES = {
+    "naturalSupernaturalCauses": 'Natural & Supernatural',
+    "physicalViolence": 'Physical Violence',
+    "indirectOrPsychologicalModes": 'Indirect/Psychological',
+}
+
+@timed_stage('aggregate')
+def count_descendants(vocabulary, root_id):
     """
-    Parses TTL content into a flat dictionary of concepts, extracting broader and narrower relationships.
+    Counts all direct and indirect narrower concepts for a given root_id.
     """
-    concepts = {}
-    # Split by empty lines, which separate the blocks for each concept
-    for block in re.split(r'\n\s*\n', ttl_content):
-        block = block.strip()
-        if not block:
-            continue
-
-        # Get the concept ID
-        id_match = re.match(r':(\w+)', block)
-        if not id_match:
-            continue
-        concept_id = id_match.group(1)
-        
-        concepts[concept_id] = {
-            'id': concept_id,
-            'label': '',
-            'definition': '',
-            'example': '',
-            'broader': [],
-            'narrower': [] # Added for easier traversal
-        }
-
-        # Extract properties
-        label_match = re.search(r'skos:prefLabel\s+"([^"]+)"', block)
-        if label_match:
-            concepts[concept_id]['label'] = label_match.group(1)
-
-        def_match = re.search(r'skos:definition\s+"([^"]+)"', block, re.DOTALL)
-        if def_match:
-            concepts[concept_id]['definition'] = def_match.group(1)
+    return vocabulary.count_descendants(vocabulary.index_of(root_id))
 
-        ex_match = re.search(r'skos:example\s+"([^"]+)"', block, re.DOTALL)
-        if ex_match:
-            concepts[concept_id]['example'] = ex_match.group(1)
-
-        broader_matches = re.findall(r'skos:broader\s+:(\w+)', block)
-        if broader_matches:
-            concepts[concept_id]['broader'].extend(broader_matches)
-            
-        narrower_matches = re.findall(r'skos:narrower\s+:(\w+)', block)
-        if narrower_matches:
-            concepts[concept_id]['narrower'].extend(narrower_matches)
-
-    return concepts
-
-def count_descendants(concepts, root_id):
+def upper_category_counts(vocabulary):
     """
-    Counts all direct and indirect narrower concepts for a given root_id.
+    Returns the short names of the upper categories present in the vocabulary and their number of modes.
     """
-    # Build a true 'children' map as 'narrower' is not always explicit for all concepts
-    children_map = {cid: [] for cid in concepts}
-    for cid, data in concepts.items():
-        for broader_id in data.get('broader', []):
-            if broader_id in children_map:
-                children_map[broader_id].append(cid)
-    
-    descendants = set()
-    to_visit = [root_id]
-    
-    while to_visit:
-        current_id = to_visit.pop(0)
-        
-        # Add to descendants if not the root itself and not already counted
-        if current_id != root_id and current_id not in descendants:
-            descendants.add(current_id)
-        
-        # Add children to the list to visit
-        for child_id in children_map.get(current_id, []):
-            if child_id not in descendants: # Prevent cycles and redundant visits
-                to_visit.append(child_id)
-                
-    return len(descendants)
-
-if __name__ == "__main__":
-    with open('../catalogue_MOD.ttl', 'r', encoding='utf-8') as f:
-        ttl_content = f.read()
-
-    all_concepts = parse_ttl_to_dict(ttl_content)
-
-    categories = [
-        "naturalSupernaturalCauses",
-        "physicalViolence",
-        "indirectOrPsychologicalModes"
-    ]
+    names = []
+    counts = []
+    for category_id, name in UPPER_CATEGORIES.items():
+        if category_id in vocabulary:
+            names.append(name)
+            counts.append(count_descendants(vocabulary, category_id))
+    return names, counts
+
+def main():
+    """
+    Prints the number of modes of demise in each upper category.
+    """
+    vocabulary = load_vocabulary()
 
     print("Number of modes of demise for each upper category:")
-    for category_id in categories:
-        if category_id in all_concepts:
-            count = count_descendants(all_concepts, category_id)
-            label = all_concepts[category_id].get('label', category_id)
+    for category_id in UPPER_CATEGORIES:
+        if category_id in vocabulary:
+            count = count_descendants(vocabulary, category_id)
+            label = vocabulary.label_of(vocabulary.index_of(category_id))
             print(f"- {label}: {count} modes")
         else:
             print(f"- Category '{category_id}' not found.")
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,49 @@
-import matplotlib.pyplot as plt
-
-# Data from the previous analysis
-categories = [
-    'Natural & Supernatural',
-    'Physical Violence',
-    'Indirect/Psychological'
-]
-counts = [22, 24, 6]
-# Using shades of blue as requested
-colors = ['#4682B4', '#191970', '#A0C4FF']
-
-# Create the pie chart
-plt.figure(figsize=(10, 8))
-wedges, texts, autotexts = plt.pie(counts, labels=categories, colors=colors, autopct='%1.1f%%', startangle=140, pctdistance=0.85)
-
-# Make the percentages bigger and bold
-for autotext in autotexts:
-    autotext.set_fontsize(12)
-    autotext.set_fontweight('bold')
-    autotext.set_color('white')
-
-# Add a title
-plt.title('Distribution of Modes of Demise per Upper Category', fontsize=16)
-
-# Equal aspect ratio ensures that pie is drawn as a circle.
-plt.axis('equal')  
-
-# Save the figure
-plt.savefig('../images/demise_category_pie_chart.png')
-
-print("Successfully generated demise_category_pie_chart.png")
+import os
+
+from matplotlib.figure import Figure
+
+from count_modes_of_demise import upper_category_counts
+from instrumentation import stage
+from mod_data import IMAGES_DIR, load_vocabulary, save_figure
+
+def plot_demise_pie_chart(categories, counts):
+    """
+    Plots the distribution of modes of demise over the upper categories as a pie chart.
+    """
+    # Using shades of blue as requested
+    colors = ['#4682B4', '#191970', '#A0C4FF']
+
+    fig = Figure(figsize=(10, 8))
+    ax = fig.add_subplot()
+    wedges, texts, autotexts = ax.pie(counts, labels=categories, colors=colors, autopct='%1.1f%%', startangle=140, pctdistance=0.85)
+
+    # Make the percentages bigger and bold
+    for autotext in autotexts:
+        autotext.set_fontsize(12)
+        autotext.set_fontweight('bold')
+        autotext.set_color('white')
+
+    # Add a title
+    ax.set_title('Distribution of Modes of Demise per Upper Category', fontsize=16)
+
+    # Equal aspect ratio ensures that pie is drawn as a circle.
+    ax.axis('equal')
+    return fig
+
+def main():
+    """
+    Generates the chart from the current vocabulary.
+    """
+    # Counts are taken from the vocabulary, as in count_modes_of_demise.py
+    vocabulary = load_vocabulary()
+    with stage('aggregate', 'upper_category_counts'):
+        categories, counts = upper_category_counts(vocabulary)
+
+    with stage('render', 'plot_demise_pie_chart'):
+        fig = plot_demise_pie_chart(categories, counts)
+    save_figure(fig, os.path.join(IMAGES_DIR, 'demise_category_pie_chart.png'))
+
+    print("Successfully generated demise_category_pie_chart.png")
+
+if __name__ == '__main__':
+    main()
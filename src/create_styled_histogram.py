@@ -1,33 +1,51 @@
-import matplotlib.pyplot as plt
-
-# Data from the previous analysis
-categories = [
-    'Natural & Supernatural',
-    'Physical Violence',
-    'Indirect/Psychological'
-]
-counts = [22, 24, 6]
-
-# Create the bar chart in the style of visualize_data.py
-plt.figure(figsize=(12, 8))
-bars = plt.bar(categories, counts, color='#008080') # Teal color
-
-# Add titles and labels
-plt.title('Number of Modes of Demise per Upper Category', fontsize=16)
-plt.ylabel('Number of Occurrences', fontsize=12)
-plt.xlabel('Categories', fontsize=12)
-plt.xticks(rotation=45, ha='right')
-plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-# Add the count labels on top of each bar
-for bar in bars:
-    yval = bar.get_height()
-    plt.text(bar.get_x() + bar.get_width()/2.0, yval, int(yval), va='bottom', ha='center', fontsize=12)
-
-# Ensure everything fits
-plt.tight_layout()
-
-# Save the figure
-plt.savefig('../images/demise_category_histogram_styled.png')
-
-print("Successfully generated demise_category_histogram_styled.png")
+import os
+
+from matplotlib.figure import Figure
+
+from count_modes_of_demise import upper_category_counts
+from instrumentation import stage
+from mod_data import IMAGES_DIR, load_vocabulary, save_figure
+
+def plot_styled_histogram(categories, counts):
+    """
+    Plots the number of modes of demise per upper category in the style of visualize_data.py.
+    """
+    fig = Figure(figsize=(12, 8))
+    ax = fig.add_subplot()
+    bars = ax.bar(categories, counts, color='#008080') # Teal color
+
+    # Add titles and labels
+    ax.set_title('Number of Modes of Demise per Upper Category', fontsize=16)
+    ax.set_ylabel('Number of Occurrences', fontsize=12)
+    ax.set_xlabel('Categories', fontsize=12)
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Add the count labels on top of each bar
+    for bar in bars:
+        yval = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2.0, yval, int(yval), va='bottom', ha='center', fontsize=12)
+
+    # Ensure everything fits
+    fig.tight_layout()
+    return fig
+
+def main():
+    """
+    Generates the chart from the current vocabulary.
+    """
+    # Counts are taken from the vocabulary, as in count_modes_of_demise.py
+    vocabulary = load_vocabulary()
+    with stage('aggregate', 'upper_category_counts'):
+        categories, counts = upper_category_counts(vocabulary)
+
+    with stage('render', 'plot_styled_histogram'):
+        fig = plot_styled_histogram(categories, counts)
+    save_figure(fig, os.path.join(IMAGES_DIR, 'demise_category_histogram_styled.png'))
+
+    print("Successfully generated demise_category_histogram_styled.png")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import io
+import json
+import threading
+import traceback
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from aggregate_cache import LRUCache, cached_aggregate, cached_value_counts, default_cache
+from instrumentation import stage
+from mod_data import TRIPLE_COLUMNS, load_triples, clean_triples, load_gbv, clean_gbv, load_vocabulary
+
+# Responses kept in memory, most recently used last
+CACHE_SIZE = 256
+
+# Query parameters that filter the triples, and the column each one applies to
+TRIPLE_FILTERS = {'mode': 'Mode of Demise', 'murder': 'Murder', 'victim': 'Victim', 'perpetrator': 'Perpetrator'}
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head><meta charset="UTF-8"><title>Mode of Demise Dashboard</title></head>
+<body>
+<h1>Mode of Demise Dashboard</h1>
+<ul>
+<li><a href="/hierarchy.html">Interactive hierarchy</a></li>
+<li><a href="/pyvis.html">Vocabulary network</a></li>
+<li><a href="/chart/histogram.png?column=Victim&amp;top=10">Top 10 victims</a> (filters: mode, murder, victim, perpetrator)</li>
+<li><a href="/chart/gbv.png?column=Focalization">GBV focalization</a></li>
+<li><a href="/api/counts?column=Mode%20of%20Demise&amp;perpetrator=zeus">Modes of demise by Zeus (JSON)</a></li>
+<li><a href="/api/unspecified">Unspecified shares (JSON)</a></li>
+<li><a href="/api/victim?name=Orpheus">Death events of Orpheus (JSON)</a></li>
+<li><a href="/api/crosstab?kind=gbv&amp;columns=Level%20of%20Explicity,Rape/Non-Con%20Tag">Explicity by tag (JSON)</a></li>
+</ul>
+</body>
+</html>
+"""
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class Dashboard:
+    """
+    The datasets, loaded once, and the views the server answers from them.
+
+    Every view takes the query parameters as a dict of strings and returns
+    (content type, body bytes); it raises BadRequest for invalid parameters.
+    """
+
+    def __init__(self):
+        from analyze_eurydice_deaths import read_triples
+
+        self.triples = clean_triples(load_triples())
+        self.raw_triples = read_triples()
+        self.gbv = clean_gbv(load_gbv())
+        self.vocabulary = load_vocabulary()
+        # Figures are built with the OO API, but rendering is serialized to keep memory predictable
+        self.render_lock = threading.Lock()
+        self.views = {
+            '/': self.index,
+            '/hierarchy.html': self.hierarchy_page,
+            '/pyvis.html': self.pyvis_page,
+            '/api/counts': self.counts,
+            '/api/unspecified': self.unspecified,
+            '/api/gbv': self.gbv_counts,
+            '/api/crosstab': self.crosstab,
+            '/api/victim': self.victim,
+            '/chart/histogram.png': self.histogram_chart,
+            '/chart/gbv.png': self.gbv_chart,
+        }
+
+    # --- Parameters ---
+
+    def triple_filters(self, params):
+        return {col: params[name].strip().lower() for name, col in TRIPLE_FILTERS.items() if name in params}
+
+    def filtered_triples(self, params):
+        return default_cache().subset(self.triples, self.triple_filters(params))
+
+    def column_param(self, params, columns, default=None):
+        column = params.get('column', default)
+        if column not in columns:
+            raise BadRequest(f"column must be one of: {', '.join(columns)}")
+        return column
+
+    def top_param(self, params, default=None):
+        if 'top' not in params:
+            return default
+        try:
+            top = int(params['top'])
+        except ValueError:
+            raise BadRequest("top must be an integer")
+        if top < 1:
+            raise BadRequest("top must be at least 1")
+        return top
+
+    # --- Views ---
+
+    def index(self, params):
+        return 'text/html; charset=utf-8', INDEX_PAGE.encode('utf-8')
+
+    def hierarchy_page(self, params):
+        from generate_interactive_hierarchy import generate_hierarchy_page
+
+        return 'text/html; charset=utf-8', generate_hierarchy_page(self.vocabulary).encode('utf-8')
+
+    def pyvis_page(self, params):
+        from generate_pyvis_graph import create_pyvis_visualization
+
+        return 'text/html; charset=utf-8', create_pyvis_visualization(self.vocabulary).generate_html().encode('utf-8')
+
+    def counts(self, params):
+        from visualize_data import top_counts
+
+        column = self.column_param(params, TRIPLE_COLUMNS, 'Mode of Demise')
+        top_n = self.top_param(params)
+        counts = top_counts(cached_value_counts(self.triples, column, self.triple_filters(params)), top_n)
+        return json_body({'column': column, 'labels': list(counts.index), 'counts': [int(n) for n in counts]})
+
+    def unspecified(self, params):
+        from visualize_data import COLUMNS_TO_ANALYZE, unspecified_shares
+
+        filters = self.triple_filters(params)
+        percentages = unspecified_shares({col: cached_value_counts(self.triples, col, filters)
+                                          for col in COLUMNS_TO_ANALYZE})
+        return json_body({col: {'unspecified': row.Unspecified, 'other': row.Other}
+                          for col, row in percentages.iterrows()})
+
+    def gbv_counts(self, params):
+        from visualize_gbv_data import category_counts
+
+        column = self.column_param(params, list(self.gbv.columns), 'Focalization')
+        counts = cached_aggregate(self.gbv, 'category_counts', lambda df: category_counts(df, column), params=(column,))
+        return json_body({'column': column, 'labels': list(counts.index), 'counts': [int(n) for n in counts]})
+
+    def crosstab(self, params):
+        from contingency import EncodedTable, encode_triples
+
+        kind = params.get('kind', 'triples')
+        if kind not in ('triples', 'gbv'):
+            raise BadRequest("kind must be 'triples' or 'gbv'")
+        columns = [col for col in params.get('columns', '').split(',') if col]
+        if not 2 <= len(columns) <= 3:
+            raise BadRequest("columns must list two or three comma-separated columns")
+        if kind == 'triples':
+            table = encode_triples(self.filtered_triples(params), self.vocabulary)
+        else:
+            table = EncodedTable.from_frame(self.gbv)
+        unknown = [col for col in columns if col not in table.codes]
+        if unknown:
+            raise BadRequest(f"unknown column(s): {', '.join(unknown)}")
+        frame = table.crosstab_frame(*columns)
+        return json_body({
+            'columns': columns,
+            'index': list(frame.index),
+            'stacks': [list(col) if isinstance(col, tuple) else col for col in frame.columns],
+            'counts': frame.to_numpy().tolist(),
+        })
+
+    def victim(self, params):
+        from analyze_eurydice_deaths import TRIPLE_KEY, victim_triple_counts
+
+        name = params.get('name')
+        if not name:
+            raise BadRequest("name is required")
+        rows = victim_triple_counts(self.raw_triples, name)
+        return json_body({'victim': name, 'total': sum(row[-1] for row in rows),
+                          'triples': [dict(zip(TRIPLE_KEY + ['Count'], row)) for row in rows]})
+
+    def histogram_chart(self, params):
+        from visualize_data import top_counts, plot_histogram
+
+        column = self.column_param(params, TRIPLE_COLUMNS, 'Mode of Demise')
+        top_n = self.top_param(params, 10)
+        counts = top_counts(cached_value_counts(self.triples, column, self.triple_filters(params)), top_n)
+        filters = ', '.join(f"{name} = {params[name]}" for name in TRIPLE_FILTERS if name in params)
+        title = f"Top {top_n} {column}" + (f" ({filters})" if filters else "")
+        with self.render_lock:
+            return 'image/png', png_bytes(plot_histogram(counts, column, title))
+
+    def gbv_chart(self, params):
+        from visualize_gbv_data import category_counts, plot_histogram
+
+        column = self.column_param(params, list(self.gbv.columns), 'Focalization')
+        counts = cached_aggregate(self.gbv, 'category_counts', lambda df: category_counts(df, column), params=(column,))
+        with self.render_lock:
+            return 'image/png', png_bytes(plot_histogram(counts, column))
+
+
+def json_body(data):
+    return 'application/json', json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+def png_bytes(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def make_etag(body):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def cache_key(path, params):
+    return path, tuple(sorted(params.items()))
+
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    """
+    Serves the dashboard views, answering repeated requests from the server's LRU cache.
+    """
+    server_version = 'ModDashboard/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        dashboard = self.server.dashboard
+        view = dashboard.views.get(url.path)
+        if view is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        key = cache_key(url.path, params)
+        entry = self.server.cache.get(key)
+        if entry is None:
+            try:
+                with stage('render', url.path):
+                    content_type, body = view(params)
+            except BadRequest as e:
+                self.send_body(HTTPStatus.BAD_REQUEST, *json_body({'error': str(e)}))
+                return
+            except Exception as e:
+                # Answered here, as socketserver would only print the error and close the connection
+                self.log_error("%s failed: %r", self.path, e)
+                traceback.print_exc()
+                self.send_body(HTTPStatus.INTERNAL_SERVER_ERROR, *json_body({'error': f"{type(e).__name__}: {e}"}))
+                return
+            entry = (content_type, body, make_etag(body))
+            self.server.cache.put(key, entry)
+
+        content_type, body, etag = entry
+        if_none_match = [tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')]
+        if etag in if_none_match or '*' in if_none_match:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_body(HTTPStatus.OK, content_type, body, etag)
+
+    def send_body(self, status, content_type, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(host='127.0.0.1', port=8000, cache_size=CACHE_SIZE, dashboard=None):
+    """
+    Creates the dashboard HTTP server; the data are loaded here, before the first request.
+    """
+    server = ThreadingHTTPServer((host, port), DashboardHandler)
+    server.dashboard = dashboard or Dashboard()
+    server.cache = LRUCache(cache_size)
+    return server
+
+
+def main(host='127.0.0.1', port=8000, cache_size=CACHE_SIZE):
+    """
+    Loads the data and serves the dashboard until interrupted.
+    """
+    try:
+        server = make_server(host, port, cache_size)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    print(f"Serving the dashboard on http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve aggregates, charts and the vocabulary pages locally.")
+    parser.add_argument("--host", default="127.0.0.1", help="The address to listen on.")
+    parser.add_argument("--port", type=int, default=8000, help="The port to listen on.")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE, help="Number of responses kept in memory.")
+    args = parser.parse_args()
+
+    main(args.host, args.port, args.cache_size)
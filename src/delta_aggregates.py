@@ -0,0 +1,481 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+
+import numpy as np
+
+from contingency import demise_category_mapping
+from instrumentation import stage, timed_stage
+from mod_data import TRIPLES_CSV, TRIPLES_AGGREGATES, VOCABULARY_TTL, TRIPLE_COLUMNS, clean_triples, load_vocabulary
+
+# Bumped whenever the layout of the state file or the meaning of its counters changes
+STATE_VERSION = 2
+
+# Joins the fields of a row before hashing, so ('a,b', 'c') and ('a', 'b,c') differ
+FIELD_SEPARATOR = '\x1f'
+
+# How many changed values of each counter the report lists
+REPORT_TOP_N = 10
+
+# The stored combos are compacted once more than this share of them is no longer used by any row
+COMPACT_DEAD_FRACTION = 0.5
+
+# One record per CSV row in the .rows.npy sidecar: its fingerprint and the index of its combo
+ROW_DTYPE = np.dtype([('hash', '<u8'), ('combo', '<i8')])
+
+
+def file_digest(path, size=None):
+    """
+    Returns the blake2b digest of the first size bytes of a file (default: all of it).
+    """
+    return file_digests(path, size)[0]
+
+
+def file_digests(path, prefix_size=None):
+    """
+    Returns the blake2b digests of the first prefix_size bytes of a file (default: all of it) and
+    of the whole file, from one read: the digest of the prefix is extended with the remaining bytes.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    remaining = os.path.getsize(path) if prefix_size is None else prefix_size
+    with open(path, 'rb') as f:
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+        prefix = digest.hexdigest()
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return prefix, digest.hexdigest()
+
+
+def hash_rows(rows):
+    """
+    Returns a 64-bit fingerprint of every row (a list of fields) as a uint64 array.
+    """
+    digests = b''.join(hashlib.blake2b(FIELD_SEPARATOR.join(row).encode('utf-8'), digest_size=8).digest()
+                       for row in rows)
+    return np.frombuffer(digests, dtype='<u8').copy()
+
+
+@timed_stage('load')
+def read_rows(path, offset=0, header=None):
+    """
+    Reads the CSV rows from byte offset on (after the header when offset is 0).
+    Returns (header, rows); blank lines are skipped.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        text = f.read().decode('utf-8')
+    reader = csv.reader(io.StringIO(text, newline=''))
+    if offset == 0:
+        header = [name.strip() for name in next(reader, [])]
+    return header, [row for row in reader if row]
+
+
+def sidecar_paths(state_path):
+    """
+    Returns the paths of the files kept next to a state file: the row records (.rows.npy)
+    and the cleaned combos (.combos.jsonl), both of which only grow when rows are appended.
+    """
+    base = os.path.splitext(state_path)[0]
+    return f"{base}.rows.npy", f"{base}.combos.jsonl"
+
+
+def empty_state():
+    return {
+        'version': STATE_VERSION,
+        'file_size': 0,
+        'file_digest': file_digest(os.devnull),
+        'ends_with_newline': True,
+        'header': None,
+        'vocabulary_digest': None,
+        'row_count': 0,
+        'combo_count': 0,
+        'combo_bytes': 0,
+        'counts': {col: {} for col in TRIPLE_COLUMNS},
+        'pairs': {},
+        'rollups': {},
+    }
+
+
+def load_state(path):
+    """
+    Reads the stored aggregates, or returns an empty state if there are none (or they were
+    written by an incompatible version, or the sidecars do not match them).
+    The row records and combos are read separately, only when needed.
+    """
+    if not os.path.exists(path):
+        return empty_state()
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION:
+        return empty_state()
+    rows_path, combos_path = sidecar_paths(path)
+    try:
+        row_count = len(np.load(rows_path, mmap_mode='r')) if state['row_count'] else 0
+        combo_bytes = os.path.getsize(combos_path) if state['combo_count'] else 0
+    except (FileNotFoundError, ValueError):
+        return empty_state()
+    # An interrupted save leaves sidecars that are longer than the state says
+    if row_count != state['row_count'] or combo_bytes != state['combo_bytes']:
+        return empty_state()
+    return state
+
+
+def load_rows(state_path, state):
+    """
+    Returns the stored row records as a ROW_DTYPE array.
+    """
+    if not state['row_count']:
+        return np.zeros(0, dtype=ROW_DTYPE)
+    return np.load(sidecar_paths(state_path)[0])
+
+
+def load_combos(state_path, state):
+    """
+    Returns the stored combos, indexed by the combo field of the row records.
+    """
+    if not state['combo_count']:
+        return []
+    with open(sidecar_paths(state_path)[1], 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def row_records(hashes, combo_ids):
+    records = np.empty(len(hashes), dtype=ROW_DTYPE)
+    records['hash'] = hashes
+    records['combo'] = combo_ids
+    return records
+
+
+@timed_stage('write')
+def append_rows(state_path, state, records):
+    """
+    Adds row records to the .rows.npy sidecar in place, rewriting only its header.
+    """
+    path = sidecar_paths(state_path)[0]
+    if not state['row_count']:
+        np.save(path, records)
+        return
+    from numpy.lib import format as npy
+
+    with open(path, 'r+b') as f:
+        version = npy.read_magic(f)
+        read_header = npy.read_array_header_1_0 if version == (1, 0) else npy.read_array_header_2_0
+        shape, _, dtype = read_header(f)
+        data_offset = f.tell()
+        header = io.BytesIO()
+        # np.save leaves room in the header for the row count to grow, so the data does not move
+        npy.write_array_header_1_0(header, {'descr': npy.dtype_to_descr(dtype), 'fortran_order': False,
+                                            'shape': (shape[0] + len(records),)})
+        if len(header.getvalue()) == data_offset:
+            f.seek(data_offset + shape[0] * dtype.itemsize)
+            f.write(records.tobytes())
+            f.truncate()
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+    np.save(path, np.concatenate([load_rows(state_path, state), records]))
+
+
+@timed_stage('write')
+def write_combos(state_path, state, combos, append=True):
+    """
+    Adds combos to the .combos.jsonl sidecar, or replaces its content with them if not append.
+    """
+    lines = ''.join(json.dumps(list(combo), ensure_ascii=False) + '\n' for combo in combos).encode('utf-8')
+    mode = 'ab' if append and state['combo_count'] else 'wb'
+    with open(sidecar_paths(state_path)[1], mode) as f:
+        f.write(lines)
+    state['combo_count'] = (state['combo_count'] if mode == 'ab' else 0) + len(combos)
+    state['combo_bytes'] = (state['combo_bytes'] if mode == 'ab' else 0) + len(lines)
+
+
+@timed_stage('write')
+def save_state(state, path):
+    # Written last and replaced atomically, so the sidecars are never behind the state
+    temporary = f"{path}.tmp"
+    # json.dumps encodes in C in one go; json.dump would go through the pure Python encoder
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(state, ensure_ascii=False))
+    os.replace(temporary, path)
+
+
+def compact_combos(combos, row_combos):
+    """
+    Returns the combos still referenced by a row, each distinct one once, and row_combos
+    renumbered to them, so combos of removed or edited rows do not pile up in the state.
+    """
+    import pandas as pd
+
+    used, inverse = np.unique(row_combos, return_inverse=True)
+    frame = pd.DataFrame([combos[combo_id] for combo_id in used], columns=TRIPLE_COLUMNS, dtype=object)
+    if frame.empty:
+        return [], np.zeros(0, dtype=np.int64)
+    # Groups are numbered in order of first appearance, so each group's first row is its combo
+    ids = frame.groupby(TRIPLE_COLUMNS, sort=False).ngroup().to_numpy()
+    _, first = np.unique(ids, return_index=True)
+    return frame.iloc[first].values.tolist(), ids[inverse].astype(np.int64)
+
+
+def clean_combos(header, rows):
+    """
+    Returns the cleaned (Mode of Demise, Murder, Victim, Perpetrator) values of raw rows,
+    cleaned exactly like clean_triples does for the whole file.
+    """
+    import pandas as pd
+
+    if not rows:
+        return []
+    width = len(header)
+    df = pd.DataFrame([row[:width] + [''] * (width - len(row)) for row in rows], columns=header, dtype=object)
+    df = clean_triples(df)
+    return list(zip(*(df[col] if col in df.columns else ['unspecified'] * len(df) for col in TRIPLE_COLUMNS)))
+
+
+def diff_rows(old_hashes, new_hashes):
+    """
+    Compares two versions' row fingerprints as multisets.
+
+    Returns (indices of removed old rows, indices of added new rows, number of changed rows).
+    The rows in both versions pair up in file order, and a removed and an added row between the
+    same two of them count as one changed row, so inserting or deleting rows does not make the
+    rows after them look changed.
+    """
+    values, inverse = np.unique(np.concatenate([old_hashes, new_hashes]), return_inverse=True)
+    old_codes, new_codes = inverse[:len(old_hashes)], inverse[len(old_hashes):]
+    surplus = np.bincount(old_codes, minlength=len(values)) - np.bincount(new_codes, minlength=len(values))
+
+    def pick(codes, wanted):
+        # The first wanted[c] rows with code c; rows with one hash have one content, so any will do
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.searchsorted(sorted_codes, sorted_codes)
+        rank = np.arange(len(codes)) - starts
+        return np.sort(order[rank < wanted[sorted_codes]])
+
+    removed = pick(old_codes, np.maximum(surplus, 0))
+    added = pick(new_codes, np.maximum(-surplus, 0))
+    kept_old = np.setdiff1d(np.arange(len(old_hashes)), removed, assume_unique=True)
+    kept_new = np.setdiff1d(np.arange(len(new_hashes)), added, assume_unique=True)
+    removed_per_gap = np.bincount(np.searchsorted(kept_old, removed), minlength=len(kept_old) + 1)
+    added_per_gap = np.bincount(np.searchsorted(kept_new, added), minlength=len(kept_new) + 1)
+    changed = int(np.minimum(removed_per_gap, added_per_gap).sum())
+    return removed, added, changed
+
+
+def apply_delta(state, combos, sign, mapping):
+    """
+    Adds (sign=1) or subtracts (sign=-1) the given cleaned rows from the stored counters.
+    """
+    counts, pairs, rollups = state['counts'], state['pairs'], state['rollups']
+
+    def bump(counter, key):
+        value = counter.get(key, 0) + sign
+        if value:
+            counter[key] = value
+        else:
+            counter.pop(key, None)
+
+    for combo in combos:
+        for col, value in zip(TRIPLE_COLUMNS, combo):
+            bump(counts[col], value)
+        mode, _, victim, perpetrator = combo
+        victims = pairs.setdefault(perpetrator, {})
+        bump(victims, victim)
+        if not victims:
+            del pairs[perpetrator]
+        if mode in mapping:
+            bump(rollups, mapping[mode])
+
+
+def rollup_mapping(state, vocabulary_path):
+    """
+    Returns the vocabulary and the mode -> upper category mapping, recomputing the stored roll-ups
+    from the mode counts when the vocabulary changed since they were built.
+    """
+    vocabulary = load_vocabulary(vocabulary_path)
+    digest = file_digest(vocabulary_path)
+    mapping = demise_category_mapping(vocabulary, state['counts']['Mode of Demise'])
+    if digest != state['vocabulary_digest']:
+        rollups = {}
+        for mode, count in state['counts']['Mode of Demise'].items():
+            if mode in mapping:
+                rollups[mapping[mode]] = rollups.get(mapping[mode], 0) + count
+        state['rollups'] = rollups
+        state['vocabulary_digest'] = digest
+    return vocabulary, mapping
+
+
+def sorted_changes(changes):
+    """
+    Drops the zero entries of {key: difference} and orders the rest by largest change first.
+    """
+    changes = {key: change for key, change in changes.items() if change}
+    return dict(sorted(changes.items(), key=lambda item: (-abs(item[1]), item[0])))
+
+
+def delta_changes(removed_combos, added_combos):
+    """
+    Returns the change of every value count caused by the removed and added rows.
+    """
+    changes = {col: {} for col in TRIPLE_COLUMNS}
+    for sign, combos in [(-1, removed_combos), (1, added_combos)]:
+        for combo in combos:
+            for col, value in zip(TRIPLE_COLUMNS, combo):
+                changes[col][value] = changes[col].get(value, 0) + sign
+    return {col: sorted_changes(counter) for col, counter in changes.items()}
+
+
+@timed_stage('aggregate')
+def refresh(csv_path=TRIPLES_CSV, state_path=TRIPLES_AGGREGATES, vocabulary_path=VOCABULARY_TTL):
+    """
+    Brings the stored aggregates of a triples CSV up to date and saves them.
+
+    If the file only grew and its old content is unchanged, just the appended bytes are parsed,
+    and their fingerprints and combos are appended to the sidecars without reading the stored ones.
+    Otherwise every row is fingerprinted and the multiset difference gives the added and removed
+    rows. Either way only those rows are cleaned and applied to the counters.
+
+    Returns a report dict: rows, added, removed, changed, full_scan, and the per-counter changes.
+    """
+    state = load_state(state_path)
+    rollups_before = dict(state['rollups'])
+
+    size = os.path.getsize(csv_path)
+    grew = state['header'] is not None and state['ends_with_newline'] and size >= state['file_size']
+    prefix_digest, digest = file_digests(csv_path, state['file_size'] if grew else 0)
+    appended = grew and prefix_digest == state['file_digest']
+
+    combos = None
+    if appended:
+        header, added_rows = read_rows(csv_path, state['file_size'], state['header'])
+        added_hashes = hash_rows(added_rows)
+        removed_combos = []
+        row_count = state['row_count'] + len(added_rows)
+        removed_count, added_count, changed = 0, len(added_rows), 0
+    else:
+        header, rows = read_rows(csv_path)
+        if header != state['header']:
+            state = empty_state()
+        old_rows = load_rows(state_path, state)
+        new_hashes = hash_rows(rows)
+        removed, added, changed = diff_rows(old_rows['hash'], new_hashes)
+        added_rows = [rows[i] for i in added]
+        # Only the combos of removed rows are needed, and the stored combos are only read if there are any
+        combos = load_combos(state_path, state) if len(removed) else []
+        removed_combos = [tuple(combos[c]) for c in old_rows['combo'][removed]]
+        row_count = len(new_hashes)
+        removed_count, added_count = len(removed), len(added)
+
+    vocabulary, mapping = rollup_mapping(state, vocabulary_path)
+    added_combos = clean_combos(header, added_rows)
+    mapping.update(demise_category_mapping(vocabulary, {combo[0] for combo in added_combos} - set(mapping)))
+
+    with stage('aggregate', 'apply delta'):
+        counts = state['counts']
+        candidates = {name for combo in added_combos for name in combo[2:]}
+        known_before = {name for name in candidates if name in counts['Victim'] or name in counts['Perpetrator']}
+        apply_delta(state, removed_combos, -1, mapping)
+        apply_delta(state, added_combos, 1, mapping)
+
+    # Added rows get their own combo entries, even if an equal one exists, so that saving them
+    # stays proportional to the change; compact_combos merges them once enough are unused
+    added_ids = np.arange(state['combo_count'], state['combo_count'] + len(added_combos), dtype=np.int64)
+    if appended:
+        append_rows(state_path, state, row_records(added_hashes, added_ids))
+        write_combos(state_path, state, added_combos)
+    else:
+        # Rows that were not added have an old row with the same fingerprint, and so the same combo
+        row_combos = np.empty(len(new_hashes), dtype=np.int64)
+        is_added = np.zeros(len(new_hashes), dtype=bool)
+        is_added[added] = True
+        order = np.argsort(old_rows['hash'], kind='stable')
+        matches = np.searchsorted(old_rows['hash'][order], new_hashes[~is_added])
+        row_combos[~is_added] = old_rows['combo'][order[matches]]
+        row_combos[is_added] = added_ids
+
+        combo_count = state['combo_count'] + len(added_combos)
+        unused = combo_count - len(np.unique(row_combos))
+        if unused > COMPACT_DEAD_FRACTION * combo_count:
+            with stage('aggregate', 'compact combos'):
+                if not combos and state['combo_count']:
+                    combos = load_combos(state_path, state)
+                compacted, row_combos = compact_combos(combos + [list(combo) for combo in added_combos], row_combos)
+            write_combos(state_path, state, compacted, append=False)
+        else:
+            write_combos(state_path, state, added_combos)
+        with stage('write', 'row records'):
+            np.save(sidecar_paths(state_path)[0], row_records(new_hashes, row_combos))
+
+    with open(csv_path, 'rb') as f:
+        f.seek(max(size - 1, 0))
+        ends_with_newline = size == 0 or f.read(1) == b'\n'
+    state.update({
+        'file_size': size,
+        'file_digest': digest,
+        'ends_with_newline': ends_with_newline,
+        'header': header,
+        'row_count': row_count,
+    })
+    save_state(state, state_path)
+
+    return {
+        'rows': row_count,
+        'added': added_count - changed,
+        'removed': removed_count - changed,
+        'changed': changed,
+        'full_scan': not appended,
+        'counts': delta_changes(removed_combos, added_combos),
+        'rollups': sorted_changes({key: state['rollups'].get(key, 0) - rollups_before.get(key, 0)
+                                   for key in set(rollups_before) | set(state['rollups'])}),
+        'new_characters': sorted(candidates - known_before - {'unspecified'}),
+        'state': state,
+    }
+
+
+def format_changes(changes, top_n=REPORT_TOP_N):
+    items = list(changes.items())
+    text = ', '.join(f"{key} {change:+d}" for key, change in items[:top_n])
+    if len(items) > top_n:
+        text += f", ... ({len(items) - top_n} more)"
+    return text
+
+
+def main(csv_path=TRIPLES_CSV, state_path=TRIPLES_AGGREGATES):
+    """
+    Refreshes the stored aggregates of the triples and prints what changed.
+    """
+    try:
+        report = refresh(csv_path, state_path)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    scan = "full scan" if report['full_scan'] else "appended rows only"
+    print(f"{os.path.basename(csv_path)}: {report['rows']} rows, {report['added']} added, "
+          f"{report['removed']} removed, {report['changed']} changed ({scan})")
+    for col in TRIPLE_COLUMNS:
+        if report['counts'][col]:
+            print(f"- {col}: {format_changes(report['counts'][col])}")
+    if report['rollups']:
+        print(f"- Demise categories: {format_changes(report['rollups'])}")
+    if report['new_characters']:
+        print(f"- New characters: {', '.join(report['new_characters'][:REPORT_TOP_N])}"
+              + (f", ... ({len(report['new_characters']) - REPORT_TOP_N} more)" if len(report['new_characters']) > REPORT_TOP_N else ""))
+    print(f"Saved {state_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Update the stored aggregates of the triples with the changes since the last run.")
+    parser.add_argument("--csv", default=TRIPLES_CSV, help="The triples CSV.")
+    parser.add_argument("--state", default=TRIPLES_AGGREGATES, help="Where the fingerprints and aggregates are kept.")
+    args = parser.parse_args()
+
+    main(args.csv, args.state)
@@ -0,0 +1,145 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from generate_interactive_hierarchy import build_hierarchy
+from instrumentation import stage, timed_stage
+from mod_data import TRIPLES_CSV, TRIPLES_FEATURES, load_triples, clean_triples, load_vocabulary
+
+# Columns that get a one-hot block after the concept block, and the prefix of their feature names
+ONE_HOT_COLUMNS = {'Victim': 'victim', 'Perpetrator': 'perpetrator', 'Murder': 'murder'}
+
+
+def concept_columns(vocabulary):
+    """
+    Returns the concept indices that get a feature column: every concept below the roots of
+    build_hierarchy (modeOfDemise if it exists), in breadth-first order.
+    """
+    columns = []
+    seen = bytearray(len(vocabulary))
+    for root in build_hierarchy(vocabulary):
+        for i in vocabulary.descendants(root):
+            if not seen[i]:
+                seen[i] = 1
+                columns.append(i)
+    return columns
+
+
+def mode_concept_matrix(labels, vocabulary, columns):
+    """
+    Returns a CSR matrix with one row per mode of demise label and a 1 in the column of its
+    concept and of every ancestor of it. Labels without a concept get an empty row.
+    """
+    column_of = {concept: k for k, concept in enumerate(columns)}
+    concept_of_label = {}
+    for i in range(len(vocabulary)):
+        concept_of_label.setdefault(vocabulary.label_of(i).strip().lower(), i)
+
+    indptr = [0]
+    indices = []
+    for label in labels:
+        concept = concept_of_label.get(label)
+        if concept is not None:
+            indices.extend(sorted(column_of[a] for a in vocabulary.ancestors(concept) if a in column_of))
+        indptr.append(len(indices))
+    return sp.csr_matrix((np.ones(len(indices), dtype=np.uint8), np.array(indices, dtype=np.int32),
+                          np.array(indptr, dtype=np.int64)), shape=(len(labels), len(columns)))
+
+
+def one_hot(values, exclude='unspecified'):
+    """
+    Returns the one-hot CSR block of a column and its categories; rows with the excluded value
+    stay empty.
+    """
+    codes, categories = pd.factorize(values, sort=True)
+    if exclude in categories:
+        excluded = categories.get_loc(exclude)
+        codes = np.where(codes == excluded, -1, codes - (codes > excluded))
+        categories = categories.delete(excluded)
+    rows = np.flatnonzero(codes >= 0)
+    matrix = sp.csr_matrix((np.ones(len(rows), dtype=np.uint8), (rows, codes[rows])),
+                           shape=(len(values), len(categories)))
+    return matrix, categories
+
+
+@timed_stage('aggregate')
+def build_feature_matrix(data_frame, vocabulary):
+    """
+    Builds the events x features matrix of cleaned triples.
+
+    The first block has one column per concept of the hierarchy: an event activates the concept
+    of its mode of demise and all of its ancestors, so 'stabbing' also activates 'Physical
+    Violence' and 'Mode of Demise'. The ancestor rows are computed once per distinct mode and
+    gathered for all events with one CSR row selection. One-hot blocks of the victim,
+    perpetrator and murder flag follow; 'unspecified' values activate nothing.
+
+    Returns:
+        tuple: (scipy.sparse.csr_matrix of uint8, list of feature names such as
+        'concept:stabbing', 'victim:orpheus' or 'murder:yes').
+    """
+    columns = concept_columns(vocabulary)
+    codes, labels = pd.factorize(data_frame['Mode of Demise'])
+    modes = mode_concept_matrix(labels, vocabulary, columns)
+    # An empty last row for events with a missing mode
+    modes = sp.vstack([modes, sp.csr_matrix((1, len(columns)), dtype=np.uint8)], format='csr')
+    blocks = [modes[np.where(codes >= 0, codes, len(labels))]]
+    names = [f"concept:{vocabulary.ids[i]}" for i in columns]
+
+    for col, prefix in ONE_HOT_COLUMNS.items():
+        block, categories = one_hot(data_frame[col])
+        blocks.append(block)
+        names.extend(f"{prefix}:{category}" for category in categories)
+
+    matrix = sp.hstack(blocks, format='csr', dtype=np.uint8)
+    matrix.indices = matrix.indices.astype(np.int32, copy=False)
+    return matrix, names
+
+
+def save_feature_matrix(path, matrix, names):
+    """
+    Writes the matrix and its feature names to one compressed .npz file.
+    """
+    with stage('write', os.path.basename(path)):
+        np.savez_compressed(path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                            shape=np.array(matrix.shape), names=np.array(names, dtype=str))
+
+
+def load_feature_matrix(path):
+    """
+    Reads a file written by save_feature_matrix and returns (matrix, feature names).
+    """
+    with np.load(path) as arrays:
+        matrix = sp.csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']), shape=tuple(arrays['shape']))
+        return matrix, arrays['names'].tolist()
+
+
+def main(csv_path=TRIPLES_CSV, output=TRIPLES_FEATURES):
+    """
+    Exports the feature matrix of the triples and reports its size.
+    """
+    try:
+        df = clean_triples(load_triples(csv_path))
+        vocabulary = load_vocabulary()
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    matrix, names = build_feature_matrix(df, vocabulary)
+    n_concepts = sum(name.startswith('concept:') for name in names)
+    unmapped = int((matrix[:, :n_concepts].getnnz(axis=1) == 0).sum())
+    save_feature_matrix(output, matrix, names)
+    print(f"{matrix.shape[0]} events x {matrix.shape[1]} features ({n_concepts} concepts), {matrix.nnz} non-zeros; "
+          f"{unmapped} events have no mode of demise in the vocabulary.")
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the triples as a sparse, ancestor-expanded feature matrix.")
+    parser.add_argument("--csv", default=TRIPLES_CSV, help="The triples CSV.")
+    parser.add_argument("--output", default=TRIPLES_FEATURES, help="The .npz file to write.")
+    args = parser.parse_args()
+
+    main(args.csv, args.output)
@@ -1,8 +1,12 @@
 
 from bs4 import BeautifulSoup
 from graphviz import Digraph
+import os
 import uuid
 
+from instrumentation import stage
+from mod_data import PROJECT_ROOT, IMAGES_DIR
+
 def add_nodes_and_edges(dot, parent_node, parent_id):
     """
     Recursively adds nodes and edges to the Digraph from the parsed HTML list.
@@ -35,7 +39,8 @@ def create_graph_from_html(html_content):
     """
     Creates a graph from the HTML hierarchy.
     """
-    soup = BeautifulSoup(html_content, 'html.parser')
+    with stage('parse', 'hierarchy.html'):
+        soup = BeautifulSoup(html_content, 'html.parser')
     dot = Digraph(comment='Concept Graph')
     dot.attr('node', shape='box', style='rounded')
 
@@ -48,25 +53,38 @@ def create_graph_from_html(html_content):
     if root_li:
         root_span = root_li.find('span', class_='concept')
         if root_span:
-            root_id = str(uuid.uuid4())
-            label = root_span.get_text(strip=True)
-            example = root_span.get('data-example', 'No example available.')
-            
-            dot.node(root_id, label, tooltip=example)
-            
-            # Start the recursive process
-            add_nodes_and_edges(dot, root_li, root_id)
+            with stage('aggregate', 'concept graph'):
+                root_id = str(uuid.uuid4())
+                label = root_span.get_text(strip=True)
+                example = root_span.get('data-example', 'No example available.')
+
+                dot.node(root_id, label, tooltip=example)
+
+                # Start the recursive process
+                add_nodes_and_edges(dot, root_li, root_id)
 
     return dot
 
-if __name__ == "__main__":
-    with open('hierarchy.html', 'r', encoding='utf-8') as f:
-        html_content = f.read()
+def main():
+    """
+    Renders the hierarchy of hierarchy.html to images/concept_graph.png.
+    """
+    with stage('load', 'hierarchy.html'):
+        with open(os.path.join(PROJECT_ROOT, 'hierarchy.html'), 'r', encoding='utf-8') as f:
+            html_content = f.read()
 
     graph = create_graph_from_html(html_content)
-    
+
     if graph:
-        graph.render('concept_graph', format='png', view=False, cleanup=True)
+        # Runs the Graphviz subprocess, which lays out and rasterizes the graph
+        with stage('render', 'dot graph'):
+            png = graph.pipe(format='png')
+        with stage('write', 'concept_graph.png'):
+            with open(os.path.join(IMAGES_DIR, 'concept_graph.png'), 'wb') as f:
+                f.write(png)
         print("Successfully generated concept_graph.png")
     else:
         print("Error: Could not generate the graph. Check the HTML structure.")
+
+if __name__ == "__main__":
+    main()
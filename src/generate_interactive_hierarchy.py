@@ -1,113 +1,127 @@
-import re
 import html
+import json
+import os
+import re
 
-def parse_ttl_to_dict(ttl_content):
-    """
-    Parses TTL content into a flat dictionary of concepts.
-    """
-    concepts = {}
-    # Split by empty lines, which separate the blocks for each concept
-    for block in re.split(r'\n\s*\n', ttl_content):
-        block = block.strip()
-        if not block:
-            continue
+from instrumentation import stage
+from mod_data import PROJECT_ROOT, load_vocabulary
 
-        # Get the concept ID
-        id_match = re.match(r':(\w+)', block)
-        if not id_match:
-            continue
-        concept_id = id_match.group(1)
-        
-        concepts[concept_id] = {
-            'id': concept_id,
-            'label': '',
-            'definition': '',
-            'example': '',
-            'broader': []
-        }
-
-        # Extract properties
-        label_match = re.search(r'skos:prefLabel\s+"([^"]+)"', block)
-        if label_match:
-            concepts[concept_id]['label'] = label_match.group(1)
-
-        def_match = re.search(r'skos:definition\s+"([^"]+)"', block, re.DOTALL)
-        if def_match:
-            concepts[concept_id]['definition'] = def_match.group(1)
-
-        ex_match = re.search(r'skos:example\s+"([^"]+)"', block, re.DOTALL)
-        if ex_match:
-            concepts[concept_id]['example'] = ex_match.group(1)
-
-        broader_matches = re.findall(r'skos:broader\s+:(\w+)', block)
-        if broader_matches:
-            concepts[concept_id]['broader'] = broader_matches
-
-    return concepts
-
-def build_hierarchy(concepts):
+# Word characters, the same class as /[\p{L}\p{N}_]+/u in the page script
+TOKEN_PATTERN = re.compile(r'\w+')
+
+def build_hierarchy(vocabulary):
     """
-    Builds a hierarchical structure from a flat dictionary of concepts.
+    Returns the indices of the root concepts of the hierarchy.
     """
-    nested_concepts = {}
-    for cid, data in concepts.items():
-        nested_concepts[cid] = data
-        nested_concepts[cid]['children'] = []
-
-    root_nodes = []
-    for cid, data in concepts.items():
-        if data['broader']:
-            for parent_id in data['broader']:
-                if parent_id in nested_concepts:
-                    nested_concepts[parent_id]['children'].append(data)
-        else:
-            root_nodes.append(data)
-    
+    root_nodes = vocabulary.roots()
+
     # If there's a single root 'modeOfDemise', use that as the entry point
     for node in root_nodes:
-        if node['id'] == 'modeOfDemise':
+        if vocabulary.ids[node] == 'modeOfDemise':
             return [node]
 
     return root_nodes
 
 
-def generate_html_recursive(nodes):
+def generate_html_tree(vocabulary, nodes, open_depth=1):
     """
-    Recursively generates the HTML list for the hierarchy.
+    Generates the nested HTML list for the hierarchy below the given concept indices.
+    Uses an explicit stack so that deep vocabularies do not hit the recursion limit.
+    Lists nested deeper than open_depth start collapsed.
     """
     if not nodes:
         return ""
-    
-    # Sort nodes alphabetically by label
-    sorted_nodes = sorted(nodes, key=lambda x: x.get('label', x['id']))
-    
-    html_str = '<ul>'
-    for node in sorted_nodes:
-        label = html.escape(node.get('label') or node['id'])
-        definition = html.escape(node.get('definition', 'No definition available.'))
-        example = html.escape(node.get('example', 'No example available.'))
-
-        html_str += '<li>'
-        html_str += f'<span class="concept" data-definition="{definition}" data-example="{example}">{label}</span>'
-        
-        if node.get('children'):
-            html_str += generate_html_recursive(node['children'])
-        
-        html_str += '</li>'
-    html_str += '</ul>'
-    return html_str
 
+    labels = vocabulary.labels
 
-def main():
+    def sorted_by_label(indices):
+        # Sort nodes alphabetically by label
+        return sorted(indices, key=lambda i: labels[i])
+
+    parts = ['<ul>']
+    # Each frame is (sorted siblings, position of the next sibling to emit)
+    stack = [(sorted_by_label(nodes), 0)]
+    on_path = bytearray(len(vocabulary))
+    path = []
+    while stack:
+        siblings, position = stack[-1]
+        if position == len(siblings):
+            stack.pop()
+            parts.append('</ul>')
+            if path:
+                on_path[path.pop()] = 0
+                parts.append('</li>')
+            continue
+        stack[-1] = (siblings, position + 1)
+
+        node = siblings[position]
+        label = html.escape(vocabulary.label_of(node))
+        definition = html.escape(vocabulary.definitions[node])
+        example = html.escape(vocabulary.examples[node])
+
+        # Skip children already on the current path so cyclic broader links cannot loop forever
+        children = [child for child in vocabulary.children(node) if not on_path[child] and child != node]
+        if not children:
+            parts.append('<li>')
+        elif len(path) >= open_depth:
+            parts.append('<li class="branch collapsed"><span class="toggle"></span>')
+        else:
+            parts.append('<li class="branch"><span class="toggle"></span>')
+        parts.append(f'<span class="concept" data-idx="{node}" data-definition="{definition}" data-example="{example}">{label}</span>')
+
+        if children:
+            on_path[node] = 1
+            path.append(node)
+            parts.append('<ul>')
+            stack.append((sorted_by_label(children), 0))
+        else:
+            parts.append('</li>')
+
+    return ''.join(parts)
+
+
+def tokenize(text):
     """
-    Main function to generate the interactive HTML file.
+    Splits text into lowercase word tokens, matching the tokenizer used by the page's search box.
     """
-    with open('../catalogue_MOD.ttl', 'r', encoding='utf-8') as f:
-        ttl_content = f.read()
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def build_search_index(vocabulary):
+    """
+    Builds an inverted token index over concept labels, definitions and examples.
+
+    Tokens are sorted so the page can find every token starting with a query prefix by
+    binary search. Postings are stored CSR-style: the concepts containing tokens[k] are
+    postings[offsets[k]:offsets[k + 1]].
+    """
+    token_postings = {}
+    for i in range(len(vocabulary)):
+        text = ' '.join((vocabulary.label_of(i), vocabulary.definitions[i], vocabulary.examples[i]))
+        for token in set(tokenize(text)):
+            token_postings.setdefault(token, []).append(i)
+
+    tokens = sorted(token_postings)
+    offsets = [0]
+    postings = []
+    for token in tokens:
+        postings.extend(token_postings[token])
+        offsets.append(len(postings))
+
+    return {'tokens': tokens, 'offsets': offsets, 'postings': postings}
 
-    concepts_dict = parse_ttl_to_dict(ttl_content)
-    hierarchy = build_hierarchy(concepts_dict)
-    hierarchy_html = generate_html_recursive(hierarchy)
+
+def generate_hierarchy_page(vocabulary):
+    """
+    Generates the complete interactive HTML page, including the embedded search index.
+    """
+    hierarchy = build_hierarchy(vocabulary)
+    hierarchy_html = generate_html_tree(vocabulary, hierarchy)
+
+    # Escape '</' so the JSON cannot close the surrounding script element
+    search_index_json = json.dumps(build_search_index(vocabulary), ensure_ascii=False,
+                                   separators=(',', ':')).replace('</', '<\\/')
+    search_index_html = f'<script type="application/json" id="search-index">{search_index_json}</script>'
 
     header = """
     <!DOCTYPE html>
@@ -117,30 +131,62 @@ def main():
         <meta name="viewport" content="width=device-width, initial-scale=1.0">
         <title>SKOS Hierarchy</title>
         <style>
-            body {{
+            body {
                 font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
                 padding: 2em;
                 background-color: #f8f9fa;
                 color: #333;
-            }}
-            h1 {{
+            }
+            h1 {
                 color: #005a9c;
-            }}
-            ul {{
+            }
+            ul {
                 list-style-type: none;
                 padding-left: 20px;
-            }}
-            .concept {{
+            }
+            .concept {
                 cursor: pointer;
                 padding: 3px 6px;
                 border-radius: 5px;
                 transition: background-color 0.2s ease-in-out;
                 display: inline-block;
-            }}
-            .concept:hover {{
+            }
+            .concept:hover {
                 background-color: #dee2e6;
-            }}
-            #tooltip {{
+            }
+            .concept.match {
+                background-color: #ffe066;
+            }
+            .toggle {
+                cursor: pointer;
+                display: inline-block;
+                width: 1em;
+                color: #005a9c;
+            }
+            .toggle::before {
+                content: '\\25BE';
+            }
+            li.collapsed > .toggle::before {
+                content: '\\25B8';
+            }
+            li.collapsed > ul {
+                display: none;
+            }
+            #search-box {
+                margin-bottom: 1em;
+            }
+            #search-input {
+                width: 320px;
+                padding: 6px 10px;
+                border: 1px solid #adb5bd;
+                border-radius: 5px;
+                font-size: 1em;
+            }
+            #search-status {
+                margin-left: 0.8em;
+                color: #6c757d;
+            }
+            #tooltip {
                 position: absolute;
                 display: none;
                 padding: 12px;
@@ -152,91 +198,184 @@ def main():
                 max-width: 350px;
                 z-index: 1000;
                 box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-            }}
+            }
             /* Tree-like structure lines */
-            li {{
+            li {
                 position: relative;
-            }}
-            ul > li {{
+            }
+            ul > li {
                 margin-top: 5px;
-            }}
-            ul li::before, ul li::after {{
+            }
+            ul li::before, ul li::after {
                 content: '';
                 position: absolute;
                 left: -15px;
-            }}
-            ul li::before {{
+            }
+            ul li::before {
                 border-left: 1px solid #adb5bd;
                 height: 100%;
                 top: 0;
                 width: 1px;
-            }}
-            ul li:last-child::before {{
+            }
+            ul li:last-child::before {
                 height: 1.1em;
-            }}
-            ul li::after {{
+            }
+            ul li::after {
                 border-top: 1px solid #adb5bd;
                 height: 1px;
                 top: 1.1em;
                 width: 15px;
-            }}
+            }
         </style>
     </head>
     <body>
         <h1>Interactive SKOS Vocabulary</h1>
+        <div id="search-box">
+            <input type="search" id="search-input" placeholder="Search labels, definitions and examples" autocomplete="off">
+            <span id="search-status"></span>
+        </div>
         <div id="hierarchy-container">
-    "
+    """
     
     footer = """
         </div>
         <div id="tooltip"></div>
 
         <script>
-            document.addEventListener('DOMContentLoaded', function() {{
+            document.addEventListener('DOMContentLoaded', function() {
                 const concepts = document.querySelectorAll('.concept');
                 const tooltip = document.getElementById('tooltip');
 
-                if (!concepts.length) {{
+                if (!concepts.length) {
                     console.error("No concepts found. Check HTML generation.");
                     return;
-                }}
+                }
+
+                document.querySelectorAll('.toggle').forEach(toggle => {
+                    toggle.addEventListener('click', function(e) {
+                        this.parentElement.classList.toggle('collapsed');
+                        e.stopPropagation();
+                    });
+                });
+
+                // Search: the token index is built at generation time, so a keystroke only costs
+                // a binary search over the sorted tokens plus a walk up the matched nodes' ancestors.
+                const index = JSON.parse(document.getElementById('search-index').textContent);
+                const searchInput = document.getElementById('search-input');
+                const searchStatus = document.getElementById('search-status');
+                const container = document.getElementById('hierarchy-container');
+
+                // A concept with several broader concepts is rendered once under each of them
+                const elementsByConcept = [];
+                concepts.forEach(concept => {
+                    const idx = Number(concept.getAttribute('data-idx'));
+                    (elementsByConcept[idx] = elementsByConcept[idx] || []).push(concept);
+                });
 
-                concepts.forEach(concept => {{
-                    concept.addEventListener('mouseover', function(e) {{
+                function lowerBound(prefix) {
+                    let lo = 0, hi = index.tokens.length;
+                    while (lo < hi) {
+                        const mid = (lo + hi) >> 1;
+                        if (index.tokens[mid] < prefix) lo = mid + 1; else hi = mid;
+                    }
+                    return lo;
+                }
+
+                function conceptsForPrefix(prefix) {
+                    const found = new Set();
+                    for (let k = lowerBound(prefix); k < index.tokens.length && index.tokens[k].startsWith(prefix); k++) {
+                        for (let p = index.offsets[k]; p < index.offsets[k + 1]; p++) {
+                            found.add(index.postings[p]);
+                        }
+                    }
+                    return found;
+                }
+
+                function lookup(query) {
+                    const terms = query.toLowerCase().match(/[\\p{L}\\p{N}_]+/gu);
+                    if (!terms) return null;
+                    let result = conceptsForPrefix(terms[0]);
+                    for (let t = 1; t < terms.length && result.size; t++) {
+                        const next = conceptsForPrefix(terms[t]);
+                        result = new Set([...result].filter(idx => next.has(idx)));
+                    }
+                    return result;
+                }
+
+                let highlighted = [];
+                searchInput.addEventListener('input', function() {
+                    highlighted.forEach(element => element.classList.remove('match'));
+                    highlighted = [];
+
+                    const result = lookup(this.value);
+                    if (result === null) {
+                        searchStatus.textContent = '';
+                        return;
+                    }
+
+                    result.forEach(idx => {
+                        (elementsByConcept[idx] || []).forEach(element => {
+                            element.classList.add('match');
+                            highlighted.push(element);
+                            // Expand every collapsed list on the path from the match up to the root
+                            for (let node = element.parentElement; node && node !== container; node = node.parentElement) {
+                                if (node.classList.contains('collapsed')) node.classList.remove('collapsed');
+                            }
+                        });
+                    });
+
+                    searchStatus.textContent = result.size + (result.size === 1 ? ' match' : ' matches');
+                    if (highlighted.length) {
+                        highlighted[0].scrollIntoView({block: 'nearest'});
+                    }
+                });
+
+                concepts.forEach(concept => {
+                    concept.addEventListener('mouseover', function(e) {
                         const definition = this.getAttribute('data-definition');
-                        if (definition) {{
+                        if (definition) {
                             tooltip.innerHTML = definition;
                             tooltip.style.display = 'block';
-                        }}
-                    }});
+                        }
+                    });
 
-                    concept.addEventListener('mousemove', function(e) {{
+                    concept.addEventListener('mousemove', function(e) {
                         tooltip.style.left = (e.pageX + 20) + 'px';
                         tooltip.style.top = (e.pageY + 20) + 'px';
-                    }});
+                    });
 
-                    concept.addEventListener('mouseout', function() {{
+                    concept.addEventListener('mouseout', function() {
                         tooltip.style.display = 'none';
-                    }});
+                    });
 
-                    concept.addEventListener('click', function(e) {{
+                    concept.addEventListener('click', function(e) {
                         const example = this.getAttribute('data-example');
-                        if (example) {{
-                            alert('Example:\n' + example.replace(/&quot;/g, '"'));
-                        }}
+                        if (example) {
+                            alert('Example:\\n' + example.replace(/&quot;/g, '"'));
+                        }
                         e.stopPropagation();
-                    }});
-                }});
-            }});
+                    });
+                });
+            });
         </script>
     </body>
     </html>
     """
 
-    final_html = header + hierarchy_html + footer
-    
-    with open('../hierarchy.html', 'w', encoding='utf-8') as f:
-        f.write(final_html)
+    return header + hierarchy_html + search_index_html + footer
+
+
+def main():
+    """
+    Main function to generate the interactive HTML file.
+    """
+    vocabulary = load_vocabulary()
+    with stage('render', 'hierarchy page'):
+        final_html = generate_hierarchy_page(vocabulary)
+
+    with stage('write', 'hierarchy.html'):
+        with open(os.path.join(PROJECT_ROOT, 'hierarchy.html'), 'w', encoding='utf-8') as f:
+            f.write(final_html)
 
     print("Successfully generated hierarchy.html")
 
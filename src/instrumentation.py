@@ -0,0 +1,154 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# Set to 1 (or true/yes) to write a trace next to the working directory, or to a file or directory path
+TRACE_ENV_VAR = 'MOD_TRACE'
+
+# The trace being recorded, or None when instrumentation is off
+_trace = None
+
+# Returned by stage() when instrumentation is off, so a disabled stage costs one global lookup
+_DISABLED = contextlib.nullcontext()
+
+
+class Trace:
+    """
+    Collects one record per finished stage and writes them as JSON when the run ends.
+
+    Each record holds the stage kind (load, parse, clean, aggregate, render, write or
+    run), an optional label, its nesting depth, wall and CPU time in seconds, and the
+    peak traced memory above the amount allocated when the stage started.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.started = time.time()
+        self.start_counter = time.perf_counter()
+        self.records = []
+        # One [kind, label, wall start, cpu start, memory at start, highest peak of finished children] per open stage
+        self.open_stages = []
+
+    def enter(self, kind, label):
+        current, peak = tracemalloc.get_traced_memory()
+        if self.open_stages:
+            parent = self.open_stages[-1]
+            parent[5] = max(parent[5], peak)
+        tracemalloc.reset_peak()
+        self.open_stages.append([kind, label, time.perf_counter(), time.process_time(), current, 0])
+
+    def exit(self):
+        wall_end = time.perf_counter()
+        cpu_end = time.process_time()
+        kind, label, wall_start, cpu_start, start_memory, child_peak = self.open_stages.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+        if self.open_stages:
+            parent = self.open_stages[-1]
+            parent[5] = max(parent[5], peak)
+
+        self.records.append({
+            'stage': kind,
+            'label': label,
+            'depth': len(self.open_stages),
+            'start_s': round(wall_start - self.start_counter, 6),
+            'wall_s': round(wall_end - wall_start, 6),
+            'cpu_s': round(cpu_end - cpu_start, 6),
+            'peak_bytes': max(peak - start_memory, 0),
+        })
+
+    def to_dict(self):
+        return {
+            'script': os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else None,
+            'argv': sys.argv[1:],
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'total_wall_s': round(time.perf_counter() - self.start_counter, 6),
+            'peak_traced_bytes': tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None,
+            'stages': self.records,
+        }
+
+    def write(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Wrote trace to {self.path}", file=sys.stderr)
+
+
+def default_trace_path(directory='.'):
+    script = os.path.splitext(os.path.basename(sys.argv[0] if sys.argv and sys.argv[0] else 'python'))[0] or 'python'
+    timestamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f"trace_{script}_{timestamp}_{os.getpid()}.json")
+
+
+def enable(path=None):
+    """
+    Starts recording stages and memory, writing the trace to path when the interpreter exits.
+    A directory or no path at all gets a file named after the script and the start time.
+    """
+    global _trace
+    if _trace is not None:
+        return _trace
+    if path is None:
+        path = default_trace_path()
+    elif os.path.isdir(path):
+        path = default_trace_path(path)
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _trace = Trace(path)
+    atexit.register(_trace.write)
+    return _trace
+
+
+def is_enabled():
+    return _trace is not None
+
+
+@contextlib.contextmanager
+def _recorded_stage(kind, label):
+    _trace.enter(kind, label)
+    try:
+        yield
+    finally:
+        _trace.exit()
+
+
+def stage(kind, label=None):
+    """
+    Context manager that records one pipeline stage when instrumentation is enabled.
+    """
+    if _trace is None:
+        return _DISABLED
+    return _recorded_stage(kind, label)
+
+
+def timed_stage(kind, label=None):
+    """
+    Decorator that records every call of the function as a stage, labelled with the function name by default.
+    """
+    def decorator(func):
+        stage_label = label or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace is None:
+                return func(*args, **kwargs)
+            with _recorded_stage(kind, stage_label):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def enable_from_environment():
+    value = os.environ.get(TRACE_ENV_VAR, '').strip()
+    if not value or value.lower() in ('0', 'false', 'no'):
+        return
+    enable(None if value.lower() in ('1', 'true', 'yes') else value)
+
+
+enable_from_environment()
@@ -0,0 +1,172 @@
+import contextlib
+import os
+
+from instrumentation import stage, timed_stage
+from skos_vocabulary import Vocabulary
+
+# Paths are resolved from this file, so the modules work from any working directory
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRIPLES_CSV = os.path.join(PROJECT_ROOT, 'MoD_Triples.csv')
+GBV_CSV = os.path.join(PROJECT_ROOT, 'Instances_of_GBV_anonym.csv')
+VOCABULARY_TTL = os.path.join(PROJECT_ROOT, 'catalogue_MOD.ttl')
+IMAGES_DIR = os.path.join(PROJECT_ROOT, 'images')
+PREVIEWS_DIR = os.path.join(IMAGES_DIR, 'previews')
+ANNOTATIONS_DB = os.path.join(PROJECT_ROOT, 'annotations.sqlite')
+TRIPLES_AGGREGATES = os.path.join(PROJECT_ROOT, 'MoD_Triples.aggregates.json')
+TRIPLES_FEATURES = os.path.join(PROJECT_ROOT, 'MoD_Triples.features.npz')
+
+# Columns of MoD_Triples.csv that hold categorical annotations
+TRIPLE_COLUMNS = ['Mode of Demise', 'Murder', 'Victim', 'Perpetrator']
+
+# Column of pre-aggregated tables, such as those read from the annotation store, that holds how
+# many annotations each row (one distinct combination of values) stands for
+COUNT_COLUMN = 'count'
+
+# Values that all mean the annotation is missing
+MISSING_VALUES = ['---', '', 'unnamed', 'nan']
+
+# Different spellings and references that are merged into one character
+CHARACTER_ALIASES = {
+    'klytemnestra': 'clytemnestra',
+    'clytaemnestra': 'clytemnestra',
+    "agamemnon's wife": 'clytemnestra',
+}
+
+
+@timed_stage('load')
+def load_triples(path=TRIPLES_CSV):
+    """
+    Reads the raw MoD_Triples CSV. Raises FileNotFoundError if it is missing.
+    """
+    import pandas as pd
+
+    return pd.read_csv(path)
+
+
+@timed_stage('clean')
+def clean_triples(data_frame):
+    """
+    Returns a cleaned copy of the triples: stripped column names, lowercase values,
+    missing values replaced by 'unspecified' and character aliases merged.
+    """
+    df = data_frame.copy()
+
+    # Strip leading/trailing whitespace from column names
+    df.columns = df.columns.str.strip()
+
+    for col in TRIPLE_COLUMNS:
+        if col not in df.columns:
+            continue
+        # Empty cells become '' here; older pandas turned them into 'nan' strings with astype(str)
+        df[col] = df[col].fillna('').astype(str).str.strip().str.lower()
+        df[col] = df[col].replace(MISSING_VALUES, 'unspecified')
+
+    for col in ['Victim', 'Perpetrator']:
+        if col in df.columns:
+            df[col] = df[col].replace(CHARACTER_ALIASES)
+
+    return df
+
+
+@timed_stage('load')
+def load_gbv(path=GBV_CSV):
+    """
+    Reads the GBV instances CSV. Raises FileNotFoundError if it is missing.
+    """
+    import pandas as pd
+
+    return pd.read_csv(path)
+
+
+@timed_stage('clean')
+def clean_gbv(data_frame):
+    """
+    Returns a copy of the GBV instances with stripped column names.
+    """
+    df = data_frame.copy()
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def row_counts(data_frame):
+    """
+    Returns the number of annotations every row of a pre-aggregated table stands for,
+    or None if the table has one row per annotation.
+    """
+    if COUNT_COLUMN not in data_frame.columns:
+        return None
+    return data_frame[COUNT_COLUMN].to_numpy()
+
+
+def annotation_count(data_frame, mask=None):
+    """
+    Returns the number of annotations in a table, or in its rows where mask is True,
+    adding up the counts of a pre-aggregated table.
+    """
+    counts = row_counts(data_frame)
+    if mask is None:
+        return len(data_frame) if counts is None else int(counts.sum())
+    mask = mask.to_numpy() if hasattr(mask, 'to_numpy') else mask
+    return int(mask.sum()) if counts is None else int(counts[mask].sum())
+
+
+def value_counts(values, counts=None):
+    """
+    Returns the value counts of a Series like values.value_counts(), adding up counts
+    (aligned with values, e.g. row_counts() of its table) instead of counting rows if given.
+    """
+    if counts is None:
+        return values.value_counts()
+    import pandas as pd
+
+    totals = pd.Series(counts).groupby(values.to_numpy(), sort=False).sum()
+    totals = totals.sort_values(ascending=False, kind='stable')
+    return totals.rename_axis(values.name).rename('count')
+
+
+def load_vocabulary(path=VOCABULARY_TTL):
+    """
+    Reads and parses the SKOS vocabulary.
+    """
+    with stage('load', os.path.basename(path)):
+        with open(path, 'r', encoding='utf-8') as f:
+            ttl_content = f.read()
+    with stage('parse', 'Vocabulary.from_ttl'):
+        return Vocabulary.from_ttl(ttl_content)
+
+
+# Text stamped across every figure saved inside preview_charts(), None otherwise
+_preview_label = None
+
+
+@contextlib.contextmanager
+def preview_charts(label):
+    """
+    Stamps label on every figure written by save_figure while the context is active,
+    so charts rendered from a sample cannot be mistaken for the real ones.
+    """
+    global _preview_label
+    previous, _preview_label = _preview_label, label
+    try:
+        yield
+    finally:
+        _preview_label = previous
+
+
+def save_figure(fig, path):
+    """
+    Writes a matplotlib figure to disk and reports where it went.
+    """
+    # savefig also lays out and rasterizes the figure
+    with stage('write', os.path.basename(path)):
+        if _preview_label is None:
+            fig.savefig(path)
+        else:
+            # The stamp is removed again, as chart templates reuse their figure
+            stamp = fig.text(0.5, 0.5, _preview_label, ha='center', va='center', rotation=25,
+                             fontsize=22, fontweight='bold', color='#B22222', alpha=0.35)
+            try:
+                fig.savefig(path)
+            finally:
+                stamp.remove()
+    print(f"Saved {path}")
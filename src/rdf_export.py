@@ -0,0 +1,230 @@
+import argparse
+import os
+import time
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+from mod_data import PROJECT_ROOT, TRIPLES_CSV, TRIPLE_COLUMNS, clean_triples, load_vocabulary
+
+# IRIs minted for the events and characters, and for the concepts of catalogue_MOD.ttl,
+# whose ':' prefix is not bound to a namespace in the file itself
+DATA_BASE = 'http://example.org/mod/'
+VOCABULARY_BASE = 'http://example.org/mod/catalogue#'
+
+# Rows read, converted and written at a time, so memory does not grow with the corpus
+EXPORT_CHUNK_ROWS = 100_000
+
+# Output file extension of each format
+FORMAT_EXTENSIONS = {'nt': '.nt', 'ttl': '.ttl'}
+
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+RDFS = 'http://www.w3.org/2000/01/rdf-schema#'
+XSD_BOOLEAN = 'http://www.w3.org/2001/XMLSchema#boolean'
+
+
+def ontology(base):
+    return base + 'ontology#'
+
+
+def escape_literal(value):
+    """
+    Escapes a string for a double-quoted N-Triples or Turtle literal.
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def character_iri(name, base=DATA_BASE):
+    """
+    Mints the IRI of a cleaned character name, e.g. 'niobe's children' -> .../character/niobe%27s_children.
+    """
+    return f"{base}character/{quote(name.replace(' ', '_'), safe='')}"
+
+
+def concept_ids_by_label(vocabulary):
+    """
+    Maps the lowercased preferred label of every concept to its ID, the join used for modes of demise.
+    """
+    concept_ids = {}
+    for i in range(len(vocabulary)):
+        concept_ids.setdefault(vocabulary.label_of(i).strip().lower(), vocabulary.ids[i])
+    return concept_ids
+
+
+class RDFWriter:
+    """
+    Converts chunks of raw triples rows into N-Triples or Turtle text.
+
+    Every distinct value of a chunk is cleaned and turned into its RDF term once; the
+    statements of all rows are then assembled column by column with NumPy string arrays.
+    Characters are described (type and label) the first time they occur, so the only state
+    kept between chunks is the IRI of every character already written.
+    """
+
+    def __init__(self, fmt, concept_ids, base=DATA_BASE, vocabulary_base=VOCABULARY_BASE):
+        self.fmt = fmt
+        self.concept_ids = concept_ids
+        self.base = base
+        self.vocabulary_base = vocabulary_base
+        self.characters = {}
+        mod = ontology(base)
+        if fmt == 'ttl':
+            self.terms = {
+                'type': 'a', 'label': 'rdfs:label', 'event': 'mod:DeathEvent', 'character': 'mod:Character',
+                'Mode of Demise': 'mod:modeOfDemise', 'mode label': 'mod:modeLabel', 'Murder': 'mod:murder',
+                'Victim': 'mod:victim', 'Perpetrator': 'mod:perpetrator',
+            }
+        else:
+            self.terms = {
+                'type': f'<{RDF_TYPE}>', 'label': f'<{RDFS}label>', 'event': f'<{mod}DeathEvent>',
+                'character': f'<{mod}Character>', 'Mode of Demise': f'<{mod}modeOfDemise>',
+                'mode label': f'<{mod}modeLabel>', 'Murder': f'<{mod}murder>', 'Victim': f'<{mod}victim>',
+                'Perpetrator': f'<{mod}perpetrator>',
+            }
+
+    def header(self):
+        """
+        Returns the prefix declarations written before the first chunk (Turtle only).
+        """
+        if self.fmt != 'ttl':
+            return ''
+        return (f"@prefix rdfs: <{RDFS}> .\n"
+                f"@prefix mod: <{ontology(self.base)}> .\n"
+                f"@prefix cat: <{self.vocabulary_base}> .\n"
+                f"@prefix event: <{self.base}event/> .\n\n")
+
+    def object_terms(self, col, values):
+        """
+        Returns the predicate and object of every distinct cleaned value of a column, or ''
+        where the value is unspecified and no statement is written.
+        """
+        terms = np.full(len(values), '', dtype=object)
+        for k, value in enumerate(values):
+            if value == 'unspecified':
+                continue
+            if col == 'Mode of Demise':
+                concept_id = self.concept_ids.get(value)
+                if concept_id is None:
+                    terms[k] = f'{self.terms["mode label"]} "{escape_literal(value)}"'
+                elif self.fmt == 'ttl':
+                    terms[k] = f'{self.terms[col]} cat:{concept_id}'
+                else:
+                    terms[k] = f'{self.terms[col]} <{self.vocabulary_base}{concept_id}>'
+            elif col == 'Murder':
+                if value in ('yes', 'no'):
+                    flag = 'true' if value == 'yes' else 'false'
+                    terms[k] = f'{self.terms[col]} {flag}' if self.fmt == 'ttl' else f'{self.terms[col]} "{flag}"^^<{XSD_BOOLEAN}>'
+            else:
+                terms[k] = f'{self.terms[col]} {self.characters[value]}'
+        # The separators are added here, once per distinct value, instead of once per row
+        specified = terms != ''
+        if self.fmt == 'ttl':
+            terms[specified] = ' ;\n    ' + terms[specified]
+        else:
+            terms[specified] = terms[specified] + ' .\n'
+        return terms
+
+    def character_statements(self, names, raw_names):
+        """
+        Returns the type and label statements of the characters not written yet.
+        """
+        lines = []
+        for name, raw in zip(names, raw_names):
+            if name == 'unspecified' or name in self.characters:
+                continue
+            subject = f'<{character_iri(name, self.base)}>'
+            self.characters[name] = subject
+            label = f'"{escape_literal(str(raw).strip())}"'
+            if self.fmt == 'ttl':
+                lines.append(f'{subject} a {self.terms["character"]} ;\n    rdfs:label {label} .\n\n')
+            else:
+                lines.append(f'{subject} {self.terms["type"]} {self.terms["character"]} .\n'
+                             f'{subject} {self.terms["label"]} {label} .\n')
+        return ''.join(lines)
+
+    def convert(self, chunk, first_row):
+        """
+        Returns the RDF text of a chunk of raw rows, whose first row has number first_row.
+        """
+        raw_columns = {col.strip(): col for col in chunk.columns}
+        columns = [col for col in TRIPLE_COLUMNS if col in raw_columns]
+
+        parts = []
+        statements = []
+        for col in columns:
+            codes, uniques = pd.factorize(chunk[raw_columns[col]], use_na_sentinel=False)
+            cleaned = clean_triples(pd.DataFrame({col: uniques}))[col].to_numpy()
+            if col in ('Victim', 'Perpetrator'):
+                parts.append(self.character_statements(cleaned, uniques))
+            statements.append(self.object_terms(col, cleaned)[codes])
+
+        rows = np.arange(first_row, first_row + len(chunk)).astype(str).astype(object)
+        if self.fmt == 'ttl':
+            table = [('event:' + rows) + f' a {self.terms["event"]}']
+            table.extend(statements)
+            table.append(np.full(len(chunk), ' .\n\n', dtype=object))
+        else:
+            subjects = f'<{self.base}event/' + rows + '> '
+            table = [subjects + f'{self.terms["type"]} {self.terms["event"]} .\n']
+            for terms in statements:
+                specified = terms != ''
+                lines = np.full(len(chunk), '', dtype=object)
+                lines[specified] = subjects[specified] + terms[specified]
+                table.append(lines)
+        # Row-major order keeps the statements of each event together
+        parts.append(''.join(np.stack(table, axis=1).ravel()))
+        return ''.join(parts)
+
+
+def export_triples(csv_path, output, fmt='nt', vocabulary=None, base=DATA_BASE,
+                   vocabulary_base=VOCABULARY_BASE, chunksize=EXPORT_CHUNK_ROWS):
+    """
+    Streams the triples CSV to an N-Triples ('nt') or Turtle ('ttl') file, one chunk at a time.
+
+    Each row becomes a mod:DeathEvent linked to the vocabulary concept whose label matches its
+    mode of demise (or carrying the mode as a mod:modeLabel literal if none does) and to the
+    minted IRIs of its victim and perpetrator. Returns the number of events written.
+    """
+    concept_ids = concept_ids_by_label(vocabulary) if vocabulary is not None else {}
+    writer = RDFWriter(fmt, concept_ids, base, vocabulary_base)
+    events = 0
+    with open(output, 'w', encoding='utf-8') as f:
+        f.write(writer.header())
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str):
+            with stage('render', f'{fmt} chunk'):
+                text = writer.convert(chunk, events)
+            with stage('write', os.path.basename(output)):
+                f.write(text)
+            events += len(chunk)
+    return events
+
+
+def main(output=None, fmt='nt', csv_path=TRIPLES_CSV, base=DATA_BASE, vocabulary_base=VOCABULARY_BASE):
+    """
+    Exports the triples as linked data next to the CSV (MoD_Triples.nt or .ttl by default).
+    """
+    output = output or os.path.join(PROJECT_ROOT, 'MoD_Triples' + FORMAT_EXTENSIONS[fmt])
+    try:
+        vocabulary = load_vocabulary()
+        start = time.perf_counter()
+        events = export_triples(csv_path, output, fmt, vocabulary, base, vocabulary_base)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+    elapsed = time.perf_counter() - start
+    print(f"Exported {events} events in {elapsed:.2f}s ({events / max(elapsed, 1e-9):,.0f} events/s).")
+    print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the triples as RDF linked to the vocabulary concepts.")
+    parser.add_argument("--format", choices=sorted(FORMAT_EXTENSIONS), default="nt", help="N-Triples or Turtle.")
+    parser.add_argument("--output", help="The output file (default: MoD_Triples.nt or MoD_Triples.ttl).")
+    parser.add_argument("--csv", default=TRIPLES_CSV, help="The triples CSV to export.")
+    parser.add_argument("--base", default=DATA_BASE, help="Namespace of the minted event and character IRIs.")
+    parser.add_argument("--vocabulary-base", default=VOCABULARY_BASE, help="Namespace of the catalogue_MOD.ttl concepts.")
+    args = parser.parse_args()
+
+    main(args.output, args.format, args.csv, args.base, args.vocabulary_base)
@@ -0,0 +1,134 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import stage
+
+# Rows read from the CSV at a time while sampling, so memory stays bounded by the sample
+SAMPLE_CHUNK_ROWS = 100_000
+
+# Every stratum keeps one row, and up to this many while the sample size allows,
+# so rare perpetrators or focalizations still show up in previews
+STRATUM_MIN_ROWS = 5
+
+
+def sample_size(text):
+    """
+    Parses the N of --sample N, which must be a positive number of rows.
+    """
+    try:
+        size = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid sample size: {text!r}")
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"the sample size must be at least 1, not {size}")
+    return size
+
+
+def sample_mask(keys, strata, size, min_per_stratum=STRATUM_MIN_ROWS):
+    """
+    Marks the rows kept in the sample: the size rows with the smallest random keys, plus the
+    row with the smallest key of every stratum, plus the next min_per_stratum - 1 rows of
+    every stratum, of which at most size minus the number of strata. Every stratum is kept
+    even when there are more strata than size, so the sample can then hold more rows.
+
+    Because only the smallest keys are kept, applying this to the rows kept so far together
+    with the next chunk gives the same sample as applying it to all rows at once.
+
+    Args:
+        keys (numpy.ndarray): A uniform random key per row.
+        strata (numpy.ndarray): The stratum of every row, or None for a plain reservoir sample.
+        size (int): Number of rows in the uniform part of the sample.
+        min_per_stratum (int): Rows kept of every stratum.
+
+    Returns:
+        numpy.ndarray: A boolean mask of the kept rows.
+    """
+    order = np.argsort(keys, kind='stable')
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[order[:size]] = True
+    if strata is not None:
+        codes, uniques = pd.factorize(strata[order], use_na_sentinel=False)
+        # Rank of each row within its stratum, in key order
+        by_stratum = np.argsort(codes, kind='stable')
+        sorted_codes = codes[by_stratum]
+        starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+        ranks = np.empty(len(codes), dtype=np.int64)
+        ranks[by_stratum] = np.arange(len(codes)) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+        # One row of every stratum is reserved before the rest of the floor is capped
+        keep[order[ranks == 0]] = True
+        keep[order[(ranks > 0) & (ranks < min_per_stratum)][:max(size - len(uniques), 0)]] = True
+    return keep
+
+
+def sample_frame(data_frame, size, strata_column=None, seed=0):
+    """
+    Returns a sample of the rows of a DataFrame, in their original order, stratified on
+    strata_column if one is given.
+    """
+    rng = np.random.default_rng(seed)
+    strata = data_frame[strata_column].to_numpy() if strata_column else None
+    return data_frame[sample_mask(rng.random(len(data_frame)), strata, size)]
+
+
+def stratum_values(chunk, strata_column, clean=None):
+    """
+    Returns the stratum of every row of a raw chunk: its strata_column value after clean,
+    stripped and lowercased. Only the distinct values are cleaned, not every row.
+    """
+    raw_column = chunk.columns[chunk.columns.str.strip() == strata_column][0]
+    codes, uniques = pd.factorize(chunk[raw_column], use_na_sentinel=False)
+    values = pd.DataFrame({strata_column: uniques})
+    if clean is not None:
+        values = clean(values)
+    values = values[strata_column].astype(str).str.strip().str.lower().to_numpy()
+    return values[codes]
+
+
+def sample_csv(path, size, strata_column=None, clean=None, seed=0, chunksize=SAMPLE_CHUNK_ROWS):
+    """
+    Streams a CSV in chunks and keeps a reservoir sample of its rows, stratified on
+    strata_column if one is given, without holding the whole file in memory.
+
+    Strata are taken from the values after clean (e.g. clean_triples, so aliases of a
+    character are one stratum); the rows themselves are cleaned once, after sampling.
+
+    Returns:
+        tuple: (the cleaned sample in file order, the total number of rows).
+    """
+    rng = np.random.default_rng(seed)
+    kept = None
+    keys = np.empty(0)
+    strata = np.empty(0, dtype=object)
+    total = 0
+    with stage('load', f'sample {size} rows'):
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            chunk.index = pd.RangeIndex(total, total + len(chunk))
+            total += len(chunk)
+
+            candidates = chunk if kept is None else pd.concat([kept, chunk])
+            candidate_keys = np.concatenate([keys, rng.random(len(chunk))])
+            candidate_strata = None
+            if strata_column:
+                candidate_strata = np.concatenate([strata, stratum_values(chunk, strata_column, clean)])
+            mask = sample_mask(candidate_keys, candidate_strata, size)
+            kept, keys = candidates[mask], candidate_keys[mask]
+            if strata_column:
+                strata = candidate_strata[mask]
+
+    if kept is None:
+        kept = pd.read_csv(path)
+    kept = kept.reset_index(drop=True)
+    return (clean(kept) if clean is not None else kept), total
+
+
+def preview_label(sample_rows, total_rows, strata_column=None):
+    """
+    Returns the text stamped on preview charts, e.g.
+    'PREVIEW: 10,000 of 1,000,000 rows, stratified on Perpetrator'.
+    """
+    label = f"PREVIEW: {sample_rows:,} of {total_rows:,} rows"
+    if strata_column:
+        label += f", stratified on {strata_column}"
+    return label
@@ -0,0 +1,205 @@
+import re
+import sys
+from array import array
+from collections import namedtuple
+
+# One parsed concept block, before it is packed into a Vocabulary
+ConceptRecord = namedtuple('ConceptRecord', ['id', 'label', 'definition', 'example', 'broader', 'narrower'])
+
+
+def split_concept_blocks(ttl_content):
+    """
+    Yields (concept_id, block) pairs for every concept block in the TTL content.
+    """
+    # Split by empty lines, which separate the blocks for each concept
+    for block in re.split(r'\n\s*\n', ttl_content):
+        block = block.strip()
+        if not block:
+            continue
+
+        # Get the concept ID
+        id_match = re.match(r':(\w+)', block)
+        if not id_match:
+            continue
+        yield id_match.group(1), block
+
+
+def parse_concept_block(concept_id, block):
+    """
+    Extracts the label, definition, example and broader/narrower links from one concept block.
+    """
+    label_match = re.search(r'skos:prefLabel\s+"([^"]+)"', block)
+    def_match = re.search(r'skos:definition\s+"([^"]+)"', block, re.DOTALL)
+    ex_match = re.search(r'skos:example\s+"([^"]+)"', block, re.DOTALL)
+
+    return ConceptRecord(
+        id=concept_id,
+        label=label_match.group(1) if label_match else '',
+        definition=def_match.group(1) if def_match else '',
+        example=ex_match.group(1) if ex_match else '',
+        broader=tuple(re.findall(r'skos:broader\s+:(\w+)', block)),
+        narrower=tuple(re.findall(r'skos:narrower\s+:(\w+)', block)),
+    )
+
+
+def parse_ttl_records(ttl_content):
+    """
+    Parses TTL content into an ordered dictionary of concept ID -> ConceptRecord.
+    A concept defined twice keeps its first position and its last definition.
+    """
+    records = {}
+    for concept_id, block in split_concept_blocks(ttl_content):
+        records[concept_id] = parse_concept_block(concept_id, block)
+    return records
+
+
+class Vocabulary:
+    """
+    Compact, integer-indexed SKOS vocabulary.
+
+    Concepts are numbered 0..n-1 in file order. Labels, definitions and examples are
+    parallel lists, and the broader/narrower hierarchy is stored as two CSR-style
+    offset/index arrays: the parents of concept i are
+    parent_indices[parent_offsets[i]:parent_offsets[i + 1]], and likewise for children.
+    The hierarchy is taken from skos:broader, as in the original scripts.
+    """
+
+    __slots__ = ('ids', 'index', 'labels', 'definitions', 'examples',
+                 'parent_offsets', 'parent_indices', 'child_offsets', 'child_indices',
+                 'root_indices')
+
+    def __init__(self, ids, labels, definitions, examples,
+                 parent_offsets, parent_indices, child_offsets, child_indices, root_indices):
+        self.ids = ids
+        self.index = {concept_id: i for i, concept_id in enumerate(ids)}
+        self.labels = labels
+        self.definitions = definitions
+        self.examples = examples
+        self.parent_offsets = parent_offsets
+        self.parent_indices = parent_indices
+        self.child_offsets = child_offsets
+        self.child_indices = child_indices
+        self.root_indices = root_indices
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Packs an iterable of ConceptRecords into a Vocabulary.
+        """
+        records = list(records)
+        ids = [sys.intern(record.id) for record in records]
+        index = {concept_id: i for i, concept_id in enumerate(ids)}
+
+        parent_offsets = array('i', [0])
+        parent_indices = array('i')
+        root_indices = array('i')
+        for i, record in enumerate(records):
+            # Broader links to undefined concepts are dropped, but still keep the concept from being a root
+            if not record.broader:
+                root_indices.append(i)
+            for broader_id in record.broader:
+                parent = index.get(broader_id)
+                if parent is not None:
+                    parent_indices.append(parent)
+            parent_offsets.append(len(parent_indices))
+
+        # Invert the parent CSR with a counting sort so children stay in file order
+        n = len(ids)
+        child_offsets = array('i', [0]) * (n + 1)
+        for parent in parent_indices:
+            child_offsets[parent + 1] += 1
+        for i in range(n):
+            child_offsets[i + 1] += child_offsets[i]
+        child_indices = array('i', [0]) * len(parent_indices)
+        fill = array('i', child_offsets[:-1])
+        for child in range(n):
+            for k in range(parent_offsets[child], parent_offsets[child + 1]):
+                parent = parent_indices[k]
+                child_indices[fill[parent]] = child
+                fill[parent] += 1
+
+        return cls(ids,
+                   [record.label for record in records],
+                   [record.definition for record in records],
+                   [record.example for record in records],
+                   parent_offsets, parent_indices, child_offsets, child_indices, root_indices)
+
+    @classmethod
+    def from_ttl(cls, ttl_content):
+        """
+        Parses TTL content straight into a Vocabulary.
+        """
+        return cls.from_records(parse_ttl_records(ttl_content).values())
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, concept_id):
+        return concept_id in self.index
+
+    def index_of(self, concept_id):
+        """
+        Returns the integer index of a concept ID, raising KeyError if it is unknown.
+        """
+        return self.index[concept_id]
+
+    def label_of(self, i):
+        """
+        Returns the preferred label of concept i, falling back to its ID.
+        """
+        return self.labels[i] or self.ids[i]
+
+    def parents(self, i):
+        return self.parent_indices[self.parent_offsets[i]:self.parent_offsets[i + 1]]
+
+    def children(self, i):
+        return self.child_indices[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    def roots(self):
+        """
+        Returns the indices of all concepts without a skos:broader link.
+        """
+        return list(self.root_indices)
+
+    def descendants(self, i, include_self=True):
+        """
+        Returns the indices of all direct and indirect narrower concepts of i, in breadth-first order.
+        """
+        child_offsets, child_indices = self.child_offsets, self.child_indices
+        visited = bytearray(len(self.ids))
+        visited[i] = 1
+        order = [i]
+        head = 0
+        while head < len(order):
+            current = order[head]
+            head += 1
+            for k in range(child_offsets[current], child_offsets[current + 1]):
+                child = child_indices[k]
+                if not visited[child]:
+                    visited[child] = 1
+                    order.append(child)
+        return order if include_self else order[1:]
+
+    def count_descendants(self, i):
+        """
+        Counts all direct and indirect narrower concepts of i, excluding i itself.
+        """
+        return len(self.descendants(i)) - 1
+
+    def ancestors(self, i, include_self=True):
+        """
+        Returns the indices of all direct and indirect broader concepts of i.
+        """
+        parent_offsets, parent_indices = self.parent_offsets, self.parent_indices
+        visited = {i}
+        order = [i]
+        head = 0
+        while head < len(order):
+            current = order[head]
+            head += 1
+            for k in range(parent_offsets[current], parent_offsets[current + 1]):
+                parent = parent_indices[k]
+                if parent not in visited:
+                    visited.add(parent)
+                    order.append(parent)
+        return order if include_self else order[1:]
@@ -0,0 +1,152 @@
+import argparse
+import csv
+import os
+
+import numpy as np
+
+from mod_data import load_vocabulary
+
+# Shares of missing annotations and murder flags, taken from the real MoD_Triples.csv
+MISSING_MODE_SHARE = 0.29
+MISSING_VICTIM_SHARE = 0.07
+MISSING_PERPETRATOR_SHARE = 0.30
+MURDER_VALUES = ['yes', 'no', 'unspecified']
+MURDER_SHARES = [0.74, 0.12, 0.14]
+
+# Values and shares of the real Instances_of_GBV_anonym.csv, including its inconsistent spacing
+GBV_COLUMNS = {
+    'Focalization': (['Victim', 'Perpetrator', 'Outsider'], [0.44, 0.30, 0.26]),
+    'Level of Explicity': (['Low', 'High', 'Medium'], [0.45, 0.30, 0.25]),
+    'Rape/Non-Con Tag': (['yes', 'no', 'yes '], [0.90, 0.09, 0.01]),
+}
+
+# Rows are generated and written this many at a time, so memory stays flat for 10^7 rows
+CHUNK_SIZE = 100_000
+
+
+def zipf_probabilities(n, exponent=1.1):
+    """
+    Returns the probabilities of a finite Zipf distribution over n ranks.
+    """
+    weights = 1.0 / np.arange(1, n + 1, dtype=float) ** exponent
+    return weights / weights.sum()
+
+
+def generate_triples_csv(path, n_rows, n_characters=None, mode_labels=None, exponent=1.1, seed=0):
+    """
+    Writes a synthetic MoD_Triples CSV with Zipf-distributed victims, perpetrators and modes.
+
+    Args:
+        path (str): The output CSV path.
+        n_rows (int): Number of triples to write.
+        n_characters (int): Size of the character pool; defaults to a pool that grows with sqrt(n_rows).
+        mode_labels (list): Mode of demise labels to draw from; defaults to the real vocabulary's labels.
+        exponent (float): Zipf exponent of the character and mode distributions.
+        seed (int): Random seed.
+    """
+    rng = np.random.default_rng(seed)
+    if n_characters is None:
+        n_characters = max(50, int(20 * np.sqrt(n_rows)))
+    if mode_labels is None:
+        vocabulary = load_vocabulary()
+        mode_labels = [vocabulary.label_of(i).lower() for i in range(len(vocabulary))]
+
+    characters = np.array([f"Character {k}" for k in range(n_characters)], dtype=object)
+    modes = np.array(mode_labels, dtype=object)
+    character_probabilities = zipf_probabilities(n_characters, exponent)
+    mode_probabilities = zipf_probabilities(len(modes), exponent)
+    murder = np.array(MURDER_VALUES, dtype=object)
+
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Mode of Demise', 'Murder', 'Victim', 'Perpetrator'])
+        for start in range(0, n_rows, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, n_rows - start)
+            mode_column = modes[rng.choice(len(modes), size=size, p=mode_probabilities)]
+            victim_column = characters[rng.choice(n_characters, size=size, p=character_probabilities)]
+            perpetrator_column = characters[rng.choice(n_characters, size=size, p=character_probabilities)]
+            murder_column = murder[rng.choice(len(murder), size=size, p=MURDER_SHARES)]
+
+            mode_column[rng.random(size) < MISSING_MODE_SHARE] = 'unspecified'
+            victim_column[rng.random(size) < MISSING_VICTIM_SHARE] = '---'
+            perpetrator_column[rng.random(size) < MISSING_PERPETRATOR_SHARE] = '---'
+
+            writer.writerows(zip(mode_column, murder_column, victim_column, perpetrator_column))
+
+
+def generate_vocabulary_ttl(path, n_concepts, shape='wide', branching=50, chain_length=1000, seed=0):
+    """
+    Writes a synthetic SKOS vocabulary in the layout of catalogue_MOD.ttl.
+
+    Args:
+        path (str): The output TTL path.
+        n_concepts (int): Number of concepts, including the root ':modeOfDemise'.
+        shape (str): 'wide' builds a balanced tree with the given branching factor;
+            'deep' hangs chains of chain_length concepts below the root.
+        branching (int): Children per concept for the 'wide' shape.
+        chain_length (int): Length of each chain for the 'deep' shape.
+        seed (int): Random seed for the label words.
+    """
+    rng = np.random.default_rng(seed)
+    words = ['falling', 'burning', 'stabbing', 'curse', 'poison', 'drowning', 'divine', 'wrath',
+             'serpent', 'arrow', 'stone', 'storm', 'grief', 'sacrifice', 'petrification', 'beast']
+
+    def parent_of(i):
+        if shape == 'deep':
+            return 0 if i % chain_length == 1 or chain_length == 1 else i - 1
+        return (i - 1) // branching
+
+    def concept_id(i):
+        return 'modeOfDemise' if i == 0 else f"concept{i}"
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('@prefix skos: <http://www.w3.org/2004/02/skos/core#> .\n\n')
+        for start in range(0, n_concepts, CHUNK_SIZE):
+            word_indices = rng.integers(0, len(words), size=(min(CHUNK_SIZE, n_concepts - start), 3))
+            blocks = []
+            for offset, (a, b, c) in enumerate(word_indices):
+                i = start + offset
+                label = 'Mode of Demise' if i == 0 else f"{words[a].capitalize()} {words[b]} {i}"
+                block = (f':{concept_id(i)} a skos:Concept ;\n'
+                         f'    skos:prefLabel "{label}" ;\n'
+                         f'    skos:definition "The victim dies by {words[a]} and {words[b]}." ;\n'
+                         f'    skos:example "A hero met {words[c]} at the hands of a god."')
+                if i > 0:
+                    block += f' ;\n    skos:broader :{concept_id(parent_of(i))}'
+                blocks.append(block + ' .\n')
+            f.write('\n'.join(blocks) + '\n')
+
+
+def generate_gbv_csv(path, n_rows, seed=0):
+    """
+    Writes a synthetic Instances_of_GBV CSV with the category shares of the real file.
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(GBV_COLUMNS))
+        for start in range(0, n_rows, CHUNK_SIZE):
+            size = min(CHUNK_SIZE, n_rows - start)
+            columns = []
+            for values, shares in GBV_COLUMNS.values():
+                values = np.array(values, dtype=object)
+                columns.append(values[rng.choice(len(values), size=size, p=shares)])
+            writer.writerows(zip(*columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic datasets for benchmarking.")
+    parser.add_argument("kind", choices=["triples", "vocabulary", "gbv"], help="The dataset to generate.")
+    parser.add_argument("size", type=int, help="Number of rows (triples, gbv) or concepts (vocabulary).")
+    parser.add_argument("output", help="The output file.")
+    parser.add_argument("--shape", choices=["wide", "deep"], default="wide", help="Vocabulary shape.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    args = parser.parse_args()
+
+    if args.kind == "triples":
+        generate_triples_csv(args.output, args.size, seed=args.seed)
+    elif args.kind == "vocabulary":
+        generate_vocabulary_ttl(args.output, args.size, shape=args.shape, seed=args.seed)
+    else:
+        generate_gbv_csv(args.output, args.size, seed=args.seed)
+    print(f"Generated {os.path.basename(args.output)}")
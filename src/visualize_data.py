@@ -1,212 +1,488 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-import os # Import os module to handle file paths
+import argparse
+import contextlib
+import os
+import re
 
-# Load the dataset
-csv_file_path = '../MoD_Triples.csv'
-try:
-    df = pd.read_csv(csv_file_path)
-except FileNotFoundError:
-    print(f"Error: {csv_file_path} not found.")
-    exit()
-
-# --- Data Cleaning ---
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
 
-# Strip leading/trailing whitespace from column names
-df.columns = df.columns.str.strip()
+from aggregate_cache import cached_aggregate, cached_value_counts
+from bootstrap import BOOTSTRAP_REPLICATES, category_proportion_intervals
+from chart_templates import BarChartTemplate, get_template
+from instrumentation import stage
+from mod_data import (IMAGES_DIR, PREVIEWS_DIR, TRIPLES_CSV, load_triples, clean_triples, save_figure, preview_charts,
+                      row_counts, value_counts)
 
 # Columns to analyze
-columns_to_analyze = ['Mode of Demise', 'Victim', 'Perpetrator']
+COLUMNS_TO_ANALYZE = ['Mode of Demise', 'Victim', 'Perpetrator']
 
-# Clean and standardize data in the relevant columns
-for col in columns_to_analyze:
-    # Ensure column is string type before using .str accessor
-    df[col] = df[col].astype(str)
-    # Strip whitespace from data and convert to lowercase
-    df[col] = df[col].str.strip().str.lower()
-    # Replace various forms of 'missing' with a standard 'unspecified'
-    # Also handles 'nan' strings that can result from astype(str)
-    df[col] = df[col].replace(['---', '', 'unnamed', 'nan'], 'unspecified')
+# Drilldown charts as (entity column, target column): e.g. the victims of each perpetrator
+FACETS = [
+    ('Perpetrator', 'Victim'),
+    ('Perpetrator', 'Mode of Demise'),
+    ('Victim', 'Perpetrator'),
+    ('Victim', 'Mode of Demise'),
+]
 
+# How a target column is named in facet chart filenames
+FACET_TARGET_NAMES = {'Victim': 'victims', 'Perpetrator': 'perpetrators', 'Mode of Demise': 'mode_of_demise'}
 
-# Merge different spellings and references to Clytemnestra
-df['Victim'] = df['Victim'].replace(["klytemnestra", "clytaemnestra", "agamemnon's wife"], "clytemnestra")
-df['Perpetrator'] = df['Perpetrator'].replace(["klytemnestra", "clytaemnestra", "agamemnon's wife"], "clytemnestra")
+# Entities need at least this many rows to get their own facet charts
+FACET_MIN_COUNT = 5
 
+# Column whose values all keep some rows in --sample previews
+SAMPLE_STRATA = 'Perpetrator'
 
-# --- Visualization Functions ---
 
-def create_combined_stacked_barchart(data_frame, column_names):
-    """Creates a combined stacked barchart of 'unspecified' vs. 'other' for multiple columns."""
-    plt.figure(figsize=(9, 8)) # Adjusted for multiple bars
+# --- Aggregations ---
 
-    # Use two slightly different shades of dark blue to distinguish the 'unspecified' vs 'other'
-    dark_blue_unspecified = '#4682B4' # SteelBlue
-    dark_blue_other = '#191970'       # MidnightBlue
+def unspecified_percentages(data_frame, column_names):
+    """
+    Returns the percentage of 'unspecified' and of all other values in each column, indexed by column name.
+    """
+    weights = row_counts(data_frame)
+    return unspecified_shares({col_name: value_counts(data_frame[col_name], weights) for col_name in column_names})
 
-    x_positions = np.arange(len(column_names))
-    width = 0.5
 
-    all_unspecified_percentages = []
-    all_other_percentages = []
-    
-    for i, col_name in enumerate(column_names):
-        unspecified_count = data_frame[col_name].value_counts().get('unspecified', 0)
-        total_count = len(data_frame[col_name])
-        
+def unspecified_shares(column_counts):
+    """
+    Returns unspecified_percentages() from the value counts of each column, {column name: counts}.
+    """
+    rows = {}
+    for col_name, counts in column_counts.items():
+        total_count = counts.sum()
+        unspecified_count = counts.get('unspecified', 0)
+
         if total_count > 0:
             unspecified_percentage = (unspecified_count / total_count) * 100
-            other_percentage = 100 - unspecified_percentage
+            rows[col_name] = (unspecified_percentage, 100 - unspecified_percentage)
         else:
-            unspecified_percentage = 0
-            other_percentage = 0
-        
-        all_unspecified_percentages.append(unspecified_percentage)
-        all_other_percentages.append(other_percentage)
+            rows[col_name] = (0.0, 0.0)
+    return pd.DataFrame.from_dict(rows, orient='index', columns=['Unspecified', 'Other'])
 
-        # Plot bars with percentages
-        p1 = plt.bar(x_positions[i], unspecified_percentage, width, color=dark_blue_unspecified, label='Unspecified' if i == 0 else "")
-        p2 = plt.bar(x_positions[i], other_percentage, width, bottom=unspecified_percentage, color=dark_blue_other, label='All Others' if i == 0 else "")
 
-        # Add text labels as percentages
-        if unspecified_percentage > 0:
-            plt.text(x_positions[i], unspecified_percentage / 2,
-                     f"{unspecified_percentage:.1f}%", ha='center', va='center', color='white', fontsize=12, fontweight='bold')
-        if other_percentage > 0:
-            plt.text(x_positions[i], unspecified_percentage + other_percentage / 2,
-                     f"{other_percentage:.1f}%", ha='center', va='center', color='white', fontsize=12, fontweight='bold')
+def unspecified_intervals(data_frame, column_names, replicates=BOOTSTRAP_REPLICATES):
+    """
+    Returns the bootstrap confidence interval of the 'unspecified' percentage of each column,
+    indexed by column name, with the columns 'lower' and 'upper'.
+    """
+    rows = {}
+    counts = row_counts(data_frame)
+    for col_name in column_names:
+        intervals = category_proportion_intervals(data_frame[col_name] == 'unspecified', replicates, counts=counts)
+        unspecified = intervals.reindex([True], fill_value=0.0).iloc[0]
+        rows[col_name] = (unspecified['lower'] * 100, unspecified['upper'] * 100)
+    return pd.DataFrame.from_dict(rows, orient='index', columns=['lower', 'upper'])
 
-    plt.ylabel('Percentage of Occurrences (%)')
-    plt.title('Combined Categories: Unspecified vs. Other')
-    plt.xticks(x_positions, column_names, rotation=45, ha='right')
-    plt.legend()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
 
-    filename = f'../images/stacked_barchart_combined.png'
-    plt.savefig(filename)
-    plt.close()
-    print(f"Saved {filename}")
+def top_value_counts(data_frame, column_name, top_n=None):
+    """
+    Returns the value counts of a column, ordered by frequency and excluding 'unspecified'.
+    """
+    return top_counts(value_counts(data_frame[column_name], row_counts(data_frame)), top_n)
 
 
-def create_histogram(data_frame, column_name, top_n=None, title_suffix="", filename_prefix=""):
+def top_counts(counts, top_n=None):
     """
-    Creates a histogram of value counts for a column, ordered by frequency.
-    Can optionally show only the top N occurrences and excludes 'unspecified' instances.
-    Accepts title_suffix and filename_prefix for custom naming.
+    Returns top_value_counts() from the value counts of the whole column.
     """
-    plt.figure(figsize=(12, 8))
+    counts = counts.drop('unspecified', errors='ignore').sort_values(ascending=False)
+    if top_n:
+        counts = counts.head(top_n)
+    return counts
 
-    # Filter out 'unspecified' instances
-    filtered_df = data_frame[data_frame[column_name] != 'unspecified']
-    counts = filtered_df[column_name].value_counts().sort_values(ascending=False)
 
-    if counts.empty:
-        print(f"No non-unspecified data to plot for {filename_prefix}{column_name} histogram.")
-        plt.close()
-        return
+def victim_perpetrator_counts(data_frame, top_n=20):
+    """
+    Returns, for the top N characters, how often each occurs as 'Victim' and as 'Perpetrator'.
+    """
+    weights = row_counts(data_frame)
+    return character_role_counts(value_counts(data_frame['Victim'], weights),
+                                 value_counts(data_frame['Perpetrator'], weights), top_n)
 
+
+def character_role_counts(victim_counts, perpetrator_counts, top_n=20):
+    """
+    Returns victim_perpetrator_counts() from the value counts of the 'Victim' and 'Perpetrator' columns.
+    """
+    # Combine 'Victim' and 'Perpetrator' counts to find top characters
+    all_chars = pd.concat([victim_counts, perpetrator_counts]).groupby(level=0).sum()
+    top_chars = all_chars.drop('unspecified', errors='ignore').nlargest(top_n).index
+
+    return pd.DataFrame({
+        'Victim': victim_counts.reindex(top_chars, fill_value=0),
+        'Perpetrator': perpetrator_counts.reindex(top_chars, fill_value=0),
+    })
+
+
+def facet_counts(data_frame, facets=FACETS, min_count=FACET_MIN_COUNT, top_n=10, entities=None):
+    """
+    Counts the targets of every entity for each (entity column, target column) facet,
+    excluding 'unspecified' entities and targets.
+
+    Every column is encoded once, and the counts of all facets come from a single sort of
+    combined (facet, entity, target) codes, so the cost does not grow with the number of entities.
+    Returns {facet: {entity: counts of its top_n targets}}. Only entities with at least
+    min_count annotations are included, optionally restricted to entities={entity column: [values]}.
+    The rows of a pre-aggregated table count as many annotations as they stand for.
+    """
+    weights = row_counts(data_frame)
+    columns = sorted({col for facet in facets for col in facet})
+    codes = {}
+    categories = {}
+    for col in columns:
+        codes[col], categories[col] = pd.factorize(data_frame[col], sort=False)
+
+    max_entities = max([len(categories[entity_col]) for entity_col, _ in facets] + [1])
+    max_targets = max([len(categories[target_col]) for _, target_col in facets] + [1])
+
+    keys = [np.empty(0, dtype=np.int64)]
+    key_weights = [np.empty(0, dtype=np.int64)]
+    for k, (entity_col, target_col) in enumerate(facets):
+        entity_codes = codes[entity_col]
+        target_codes = codes[target_col]
+        entity_categories = categories[entity_col]
+
+        present = entity_codes >= 0
+        totals = np.bincount(entity_codes[present], None if weights is None else weights[present],
+                             minlength=len(entity_categories))
+        keep_entity = totals >= min_count
+        if entities is not None and entity_col in entities:
+            keep_entity &= entity_categories.isin(entities[entity_col])
+        keep_entity &= entity_categories != 'unspecified'
+
+        unspecified_target = categories[target_col].get_indexer(['unspecified'])[0]
+        mask = (entity_codes >= 0) & (target_codes >= 0) & (target_codes != unspecified_target)
+        mask[mask] = keep_entity[entity_codes[mask]]
+
+        keys.append((k * max_entities + entity_codes[mask].astype(np.int64)) * max_targets + target_codes[mask])
+        if weights is not None:
+            key_weights.append(weights[mask])
+
+    if weights is None:
+        unique_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+    else:
+        unique_keys, inverse = np.unique(np.concatenate(keys), return_inverse=True)
+        counts = np.bincount(inverse, np.concatenate(key_weights), minlength=len(unique_keys)).astype(np.int64)
+    groups = unique_keys // max_targets
+    targets = unique_keys % max_targets
+
+    # Keys are sorted, so each (facet, entity) group is one contiguous run
+    starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]]) if len(groups) else np.empty(0, dtype=int)
+    ends = np.r_[starts[1:], len(groups)]
+
+    result = {facet: {} for facet in facets}
+    for start, end in zip(starts, ends):
+        facet = facets[groups[start] // max_entities]
+        entity_col, target_col = facet
+        entity = categories[entity_col][groups[start] % max_entities]
+
+        order = np.argsort(-counts[start:end], kind='stable')[:top_n]
+        result[facet][entity] = pd.Series(counts[start:end][order],
+                                          index=categories[target_col][targets[start:end][order]],
+                                          name='count')
+    return result
+
+
+def histogram_names(column_name, top_n=None, title_suffix="", filename_prefix=""):
+    """
+    Returns the (title, filename) used for a histogram of a column.
+    """
     title_main = f'Histogram of "{column_name}"'
     filename_main = f'histogram_{column_name.replace(" ", "_").lower()}'
-    
+
     if top_n:
-        counts = counts.head(top_n)
         title_main += f' (Top {top_n})'
         filename_main += f'_top_{top_n}'
 
     title_main += ' (Excluding Unspecified)'
     filename_main += '_no_unspecified'
 
-    # Use teal color for all bars in the histogram
-    teal_color = '#008080' # Teal
-    counts.plot(kind='bar', color=teal_color)
+    return f"{title_main} {title_suffix}", f"{filename_prefix}{filename_main}.png"
 
-    plt.title(f"{title_main} {title_suffix}")
-    plt.ylabel('Number of Occurrences')
-    plt.xlabel(column_name)
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
 
-    filename = f"{filename_prefix}{filename_main}.png"
-    plt.savefig(filename)
-    plt.close()
-    print(f"Saved {filename}")
+def facet_histogram_names(entity_col, entity, target_col, top_n=10):
+    """
+    Returns the (title, filename) of the histogram of target_col values for one entity.
+    """
+    entity_slug = re.sub(r'\W+', '_', entity.lower()).strip('_')
+    filename_prefix = f"histogram_{FACET_TARGET_NAMES.get(target_col, target_col.lower().replace(' ', '_'))}_" \
+                      f"{entity_col.lower().replace(' ', '_')}_{entity_slug}_"
+    return histogram_names(target_col, top_n, f"when {entity_col} is {entity.title()}", filename_prefix)
+
 
+# --- Figures ---
 
-def create_zeus_histograms(data_frame):
+def plot_combined_stacked_barchart(percentages, intervals=None):
     """
-    Creates histograms for victims and modes of demise specifically when the perpetrator is 'zeus'.
+    Plots a combined stacked barchart of 'unspecified' vs. 'other' for multiple columns.
+    With intervals (as returned by unspecified_intervals), draws them as error bars on the boundary.
     """
-    zeus_df = data_frame[data_frame['Perpetrator'] == 'zeus'].copy()
+    fig = Figure(figsize=(9, 8)) # Adjusted for multiple bars
+    ax = fig.add_subplot()
 
-    if zeus_df.empty:
-        print("No data found for 'zeus' as a perpetrator. Skipping Zeus-specific histograms.")
-        return
+    # Use two slightly different shades of dark blue to distinguish the 'unspecified' vs 'other'
+    dark_blue_unspecified = '#4682B4' # SteelBlue
+    dark_blue_other = '#191970'       # MidnightBlue
+
+    x_positions = np.arange(len(percentages))
+    width = 0.5
+
+    for i, (unspecified_percentage, other_percentage) in enumerate(percentages.itertuples(index=False)):
+        # Plot bars with percentages
+        ax.bar(x_positions[i], unspecified_percentage, width, color=dark_blue_unspecified, label='Unspecified' if i == 0 else "")
+        ax.bar(x_positions[i], other_percentage, width, bottom=unspecified_percentage, color=dark_blue_other, label='All Others' if i == 0 else "")
+
+        # Add text labels as percentages
+        if unspecified_percentage > 0:
+            ax.text(x_positions[i], unspecified_percentage / 2,
+                    f"{unspecified_percentage:.1f}%", ha='center', va='center', color='white', fontsize=12, fontweight='bold')
+        if other_percentage > 0:
+            ax.text(x_positions[i], unspecified_percentage + other_percentage / 2,
+                    f"{other_percentage:.1f}%", ha='center', va='center', color='white', fontsize=12, fontweight='bold')
+
+    if intervals is not None:
+        unspecified = percentages['Unspecified'].to_numpy()
+        errors = [unspecified - intervals['lower'].to_numpy(), intervals['upper'].to_numpy() - unspecified]
+        ax.errorbar(x_positions, unspecified, yerr=errors, fmt='none', ecolor='black', elinewidth=1.5, capsize=8)
 
-    # Histogram for victims when perpetrator is Zeus
-    create_histogram(zeus_df.copy(), 'Victim', top_n=10, 
-                     title_suffix="when Perpetrator is Zeus", 
-                     filename_prefix="histogram_victims_perpetrator_zeus_")
+    ax.set_ylabel('Percentage of Occurrences (%)')
+    ax.set_title('Combined Categories: Unspecified vs. Other')
+    ax.set_xticks(x_positions, percentages.index, rotation=45, ha='right')
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
 
-    # Histogram for mode of demise when perpetrator is Zeus
-    create_histogram(zeus_df.copy(), 'Mode of Demise', top_n=10, 
-                     title_suffix="when Perpetrator is Zeus", 
-                     filename_prefix="histogram_mode_of_demise_perpetrator_zeus_")
 
-def create_victim_perpetrator_stacked_chart(data_frame, top_n=20):
+def new_histogram_template():
     """
-    Creates a stacked bar chart for the top N characters, showing their occurrences as 'Victim' vs. 'Perpetrator'.
+    Builds the reusable figure for value-count histograms.
+    """
+    # Use teal color for all bars in the histogram
+    teal_color = '#008080' # Teal
+    return BarChartTemplate(figsize=(12, 8), color=teal_color, ylabel='Number of Occurrences')
+
+
+def plot_histogram(counts, column_name, title):
+    """
+    Plots a bar chart of value counts, in the order given, on a new figure.
+    """
+    template = new_histogram_template()
+    template.update(counts.index, counts.values, title, xlabel=column_name)
+    return template.figure
+
+
+def plot_victim_perpetrator_stacked_chart(counts):
     """
-    # Combine 'Victim' and 'Perpetrator' columns to find top characters
-    all_chars = pd.concat([data_frame['Victim'], data_frame['Perpetrator']])
-    
-    # Filter out 'unspecified'
-    all_chars = all_chars[all_chars != 'unspecified']
-    
-    # Get top N characters
-    top_chars = all_chars.value_counts().nlargest(top_n).index
-
-    victim_counts = []
-    perpetrator_counts = []
-
-    for char in top_chars:
-        victim_count = data_frame[data_frame['Victim'] == char].shape[0]
-        perpetrator_count = data_frame[data_frame['Perpetrator'] == char].shape[0]
-        victim_counts.append(victim_count)
-        perpetrator_counts.append(perpetrator_count)
-
-    plt.figure(figsize=(15, 10))
-    
+    Plots a stacked bar chart of each character's occurrences as 'Victim' vs. 'Perpetrator'.
+    """
+    fig = Figure(figsize=(15, 10))
+    ax = fig.add_subplot()
+
     # Colors for the stacked bars
     victim_color = '#4682B4'  # SteelBlue
     perpetrator_color = '#191970' # MidnightBlue
 
     # Create stacked bar chart
-    plt.bar(top_chars, victim_counts, color=victim_color, label='Victim')
-    plt.bar(top_chars, perpetrator_counts, bottom=victim_counts, color=perpetrator_color, label='Perpetrator')
-
-    plt.ylabel('Number of Occurrences')
-    plt.xlabel('Character')
-    plt.title(f'Top {top_n} Characters: Occurrences as Victim vs. Perpetrator')
-    plt.xticks(rotation=45, ha='right')
-    plt.legend()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-
-    filename = 'victim_perpetrator_stacked_chart.png'
-    plt.savefig(filename)
-    plt.close()
-    print(f"Saved {filename}")
-
-# --- Generate Plots ---
-create_combined_stacked_barchart(df.copy(), columns_to_analyze)
-# Generate histograms for top 10 (excluding unspecified)
-for col in columns_to_analyze:
-    create_histogram(df.copy(), col, top_n=10)
-
-create_zeus_histograms(df.copy())
-create_victim_perpetrator_stacked_chart(df.copy())
-
-print("All visualizations have been generated.")
\ No newline at end of file
+    ax.bar(counts.index, counts['Victim'], color=victim_color, label='Victim')
+    ax.bar(counts.index, counts['Perpetrator'], bottom=counts['Victim'], color=perpetrator_color, label='Perpetrator')
+
+    ax.set_ylabel('Number of Occurrences')
+    ax.set_xlabel('Character')
+    ax.set_title(f'Top {len(counts)} Characters: Occurrences as Victim vs. Perpetrator')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    ax.legend()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+
+# --- Chart files ---
+
+def create_combined_stacked_barchart(data_frame, column_names, output_dir=IMAGES_DIR, confidence_intervals=False):
+    """
+    Creates a combined stacked barchart of 'unspecified' vs. 'other' for multiple columns,
+    optionally with bootstrap confidence intervals of the 'unspecified' share.
+    """
+    percentages = unspecified_shares({col: cached_value_counts(data_frame, col) for col in column_names})
+    intervals = None
+    if confidence_intervals:
+        intervals = cached_aggregate(data_frame, 'unspecified_intervals',
+                                     lambda df: unspecified_intervals(df, column_names), params=tuple(column_names))
+    with stage('render', 'stacked_barchart_combined'):
+        fig = plot_combined_stacked_barchart(percentages, intervals)
+    save_figure(fig, os.path.join(output_dir, 'stacked_barchart_combined.png'))
+
+
+def create_histogram(data_frame, column_name, top_n=None, title_suffix="", filename_prefix="", output_dir=IMAGES_DIR):
+    """
+    Creates a histogram of value counts for a column, ordered by frequency.
+    Can optionally show only the top N occurrences and excludes 'unspecified' instances.
+    Accepts title_suffix and filename_prefix for custom naming.
+    """
+    counts = top_counts(cached_value_counts(data_frame, column_name), top_n)
+
+    if counts.empty:
+        print(f"No non-unspecified data to plot for {filename_prefix}{column_name} histogram.")
+        return
+
+    title, filename = histogram_names(column_name, top_n, title_suffix, filename_prefix)
+    save_histogram(counts, column_name, title, os.path.join(output_dir, filename))
+
+
+def save_histogram(counts, column_name, title, path):
+    """
+    Renders value counts on the shared histogram figure and saves it to path.
+    """
+    # Every histogram reuses one figure and only updates its bars and texts
+    template = get_template('histogram', new_histogram_template)
+    with template.lock:
+        with stage('render', os.path.basename(path)):
+            template.update(counts.index, counts.values, title, xlabel=column_name)
+        save_figure(template.figure, path)
+
+
+def create_facet_histograms(data_frame, facets=FACETS, min_count=FACET_MIN_COUNT, top_n=10, entities=None,
+                            output_dir=os.path.join(IMAGES_DIR, 'facets')):
+    """
+    Creates a histogram per entity and facet, e.g. the victims and modes of demise of every
+    perpetrator with at least min_count rows. Returns the number of charts written.
+    """
+    entity_key = tuple(sorted((col, tuple(values)) for col, values in entities.items())) if entities else None
+    counts = cached_aggregate(data_frame, 'facet_counts',
+                              lambda df: facet_counts(df, facets, min_count, top_n, entities),
+                              params=(tuple(facets), min_count, top_n, entity_key))
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    # All facet charts are rendered in one batch on the shared histogram figure
+    written = 0
+    template = get_template('histogram', new_histogram_template)
+    with template.lock:
+        for (entity_col, target_col), per_entity in counts.items():
+            for entity, target_counts in per_entity.items():
+                title, filename = facet_histogram_names(entity_col, entity, target_col, top_n)
+                with stage('render', filename):
+                    template.update(target_counts.index, target_counts.values, title, xlabel=target_col)
+                save_figure(template.figure, os.path.join(output_dir, filename))
+                written += 1
+    return written
+
+
+def create_zeus_histograms(data_frame, output_dir=IMAGES_DIR):
+    """
+    Creates histograms for victims and modes of demise specifically when the perpetrator is 'zeus'.
+    """
+    # Counted per column on the rows of zeus, so both charts share one filtered subset
+    written = 0
+    for target_col in ['Victim', 'Mode of Demise']:
+        counts = top_counts(cached_value_counts(data_frame, target_col, {'Perpetrator': 'zeus'}), 10)
+        if counts.empty:
+            continue
+        title, filename = facet_histogram_names('Perpetrator', 'zeus', target_col, 10)
+        save_histogram(counts, target_col, title, os.path.join(output_dir, filename))
+        written += 1
+
+    if not written:
+        print("No data found for 'zeus' as a perpetrator. Skipping Zeus-specific histograms.")
+
+
+def create_victim_perpetrator_stacked_chart(data_frame, top_n=20, output_dir=IMAGES_DIR):
+    """
+    Creates a stacked bar chart for the top N characters, showing their occurrences as 'Victim' vs. 'Perpetrator'.
+    """
+    counts = character_role_counts(cached_value_counts(data_frame, 'Victim'),
+                                   cached_value_counts(data_frame, 'Perpetrator'), top_n)
+    with stage('render', 'victim_perpetrator_stacked_chart'):
+        fig = plot_victim_perpetrator_stacked_chart(counts)
+    save_figure(fig, os.path.join(output_dir, 'victim_perpetrator_stacked_chart.png'))
+
+
+def load_data(store=None):
+    """
+    Returns the cleaned triples, from the annotation database at store if one is given.
+    """
+    if store:
+        from annotation_store import load_store_triples
+        return load_store_triples(store)
+    return clean_triples(load_triples())
+
+
+def load_sample(size, store=None, strata_column=SAMPLE_STRATA):
+    """
+    Returns a sample of the cleaned triples, stratified on strata_column unless it is None,
+    and the number of rows it was drawn from. The CSV is streamed rather than loaded whole.
+    """
+    from sampling import sample_csv, sample_frame
+
+    if store:
+        from annotation_store import expand_counts
+
+        # Sampling picks individual annotations, so the stored counts are expanded here
+        df = expand_counts(load_data(store))
+        return sample_frame(df, size, strata_column), len(df)
+    return sample_csv(TRIPLES_CSV, size, strata_column, clean=clean_triples)
+
+
+def main(facets=False, min_count=FACET_MIN_COUNT, store=None, confidence_intervals=False, sample=None,
+         strata_column=SAMPLE_STRATA):
+    """
+    Main function to generate all visualizations of the triples.
+    With facets, also generates the drilldown charts of every entity with at least min_count rows.
+    With store, reads the triples from that annotation database instead of the CSV.
+    With confidence_intervals, adds bootstrap error bars to the 'unspecified' shares.
+    With sample, renders previews from a sample of that many rows (stratified on strata_column
+    unless it is None) into images/previews, each stamped as a preview.
+    """
+    try:
+        if sample:
+            df, total = load_sample(sample, store, strata_column)
+        else:
+            df = load_data(store)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    output_dir = IMAGES_DIR
+    preview = contextlib.nullcontext()
+    if sample:
+        from sampling import preview_label
+
+        output_dir = PREVIEWS_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        preview = preview_charts(preview_label(len(df), total, strata_column))
+
+    with preview:
+        create_combined_stacked_barchart(df, COLUMNS_TO_ANALYZE, output_dir, confidence_intervals)
+        # Generate histograms for top 10 (excluding unspecified)
+        for col in COLUMNS_TO_ANALYZE:
+            create_histogram(df, col, top_n=10, output_dir=output_dir)
+
+        create_zeus_histograms(df, output_dir)
+        create_victim_perpetrator_stacked_chart(df, output_dir=output_dir)
+
+        if facets:
+            create_facet_histograms(df, min_count=min_count, output_dir=os.path.join(output_dir, 'facets'))
+
+    print("All visualizations have been generated.")
+
+if __name__ == '__main__':
+    from sampling import sample_size
+
+    parser = argparse.ArgumentParser(description="Generate the charts of the mode of demise triples.")
+    parser.add_argument("--facets", action="store_true", help="Also generate per-victim and per-perpetrator drilldown charts.")
+    parser.add_argument("--min-count", type=int, default=FACET_MIN_COUNT, help="Minimum rows for an entity to get drilldown charts.")
+    parser.add_argument("--store", help="Read the triples from this annotation database instead of the CSV.")
+    parser.add_argument("--ci", action="store_true", help="Draw bootstrap confidence intervals of the 'unspecified' shares.")
+    parser.add_argument("--sample", type=sample_size, metavar="N",
+                        help=f"Render previews into images/previews from a sample of N rows, stratified on {SAMPLE_STRATA}; "
+                             "every stratum keeps a row, even beyond N.")
+    parser.add_argument("--reservoir", action="store_true", help="With --sample, draw a plain random sample instead.")
+    args = parser.parse_args()
+
+    main(facets=args.facets, min_count=args.min_count, store=args.store, confidence_intervals=args.ci,
+         sample=args.sample, strata_column=None if args.reservoir else SAMPLE_STRATA)
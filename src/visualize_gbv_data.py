@@ -1,8 +1,119 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import argparse
+import contextlib
 import os
 
-def create_histogram(data_frame, column_name, output_filename):
+from matplotlib.figure import Figure
+
+from aggregate_cache import cached_aggregate
+from bootstrap import category_proportion_intervals
+from contingency import EncodedTable
+from instrumentation import stage
+from mod_data import IMAGES_DIR, PREVIEWS_DIR, GBV_CSV, load_gbv, clean_gbv, save_figure, preview_charts, row_counts, value_counts
+
+# Column whose values all keep some rows in --sample previews
+SAMPLE_STRATA = 'Focalization'
+
+def category_counts(data_frame, column_name):
+    """
+    Returns the value counts of a column after stripping and lowercasing its values.
+
+    Args:
+        data_frame (pd.DataFrame): The input DataFrame.
+        column_name (str): The name of the column to count.
+    """
+    clean_column = data_frame[column_name].str.strip().str.lower()
+    return value_counts(clean_column, row_counts(data_frame))
+
+def category_intervals(data_frame, column_name):
+    """
+    Returns the bootstrap confidence interval of each category's share of a column, indexed like category_counts.
+
+    Args:
+        data_frame (pd.DataFrame): The input DataFrame.
+        column_name (str): The name of the column to count.
+    """
+    clean_column = data_frame[column_name].str.strip().str.lower()
+    return category_proportion_intervals(clean_column, counts=row_counts(data_frame))
+
+def stacked_counts(data_frame, index_col, stack_col, table=None):
+    """
+    Returns a table of occurrences with one row per index_col value and one column per stack_col value,
+    both in sorted order (so 'no' comes before 'yes').
+
+    Args:
+        data_frame (pd.DataFrame): The input DataFrame.
+        index_col (str): The column for the bar index (e.g., 'Level of Explicity').
+        stack_col (str): The column for the stacks (e.g., 'Rape/Non-Con Tag').
+        table (EncodedTable): The already encoded columns of data_frame, to avoid encoding them again.
+    """
+    if table is None:
+        table = EncodedTable.from_frame(data_frame, [index_col, stack_col])
+    return table.crosstab_frame(index_col, stack_col)
+
+def plot_histogram(counts, column_name, intervals=None):
+    """
+    Plots a bar chart of category counts, labelling each bar with its percentage.
+
+    Args:
+        counts (pd.Series): Value counts to plot.
+        column_name (str): The name of the counted column.
+        intervals (pd.DataFrame): Optional confidence intervals of the shares, as returned by
+            category_intervals, drawn as error bars.
+    """
+    total_count = counts.sum()
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    counts.plot(kind='bar', color='#191970', ax=ax)
+    ax.set_title(f'Histogram of {column_name}')
+    ax.set_xlabel(column_name)
+    ax.set_ylabel('Number of Occurrences')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
+    fig.tight_layout()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    for i, count in enumerate(counts):
+        percentage = (count / total_count) * 100
+        ax.text(i, count / 2, f'{percentage:.1f}%', ha='center', va='center', color='white', fontweight='bold', fontsize=12)
+
+    if intervals is not None:
+        # Intervals are of the shares, so they are scaled to counts like the bars
+        intervals = intervals.reindex(counts.index)
+        errors = [counts - intervals['lower'] * total_count, intervals['upper'] * total_count - counts]
+        ax.errorbar(range(len(counts)), counts, yerr=errors, fmt='none', ecolor='black', elinewidth=1.5, capsize=8)
+
+    return fig
+
+def plot_stacked_barchart(grouped_data, index_col, stack_col):
+    """
+    Plots a stacked bar chart from a table of occurrences.
+
+    Args:
+        grouped_data (pd.DataFrame): Counts with one row per bar and one column per stack.
+        index_col (str): The column for the bar index.
+        stack_col (str): The column for the stacks.
+    """
+    colors = ['#4682B4', '#191970']
+
+    fig = Figure(figsize=(10, 7))
+    ax = fig.add_subplot()
+    grouped_data.plot(kind='bar', stacked=True, color=colors, ax=ax)
+
+    ax.set_title(f'Stacked Bar Chart of {stack_col} by {index_col}')
+    ax.set_xlabel(index_col)
+    ax.set_ylabel('Number of Occurrences')
+    ax.tick_params(axis='x', labelrotation=0)
+    fig.tight_layout()
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+    for container in ax.containers:
+        ax.bar_label(container, label_type='center', color='white', fontweight='bold')
+
+    return fig
+
+def create_histogram(data_frame, column_name, output_filename, confidence_intervals=False):
     """
     Creates and saves a histogram for a given column in a DataFrame.
 
@@ -10,38 +121,29 @@ def create_histogram(data_frame, column_name, output_filename):
         data_frame (pd.DataFrame): The input DataFrame.
         column_name (str): The name of the column to create a histogram for.
         output_filename (str): The filename to save the histogram to.
+        confidence_intervals (bool): Whether to draw bootstrap confidence intervals of the shares.
     """
     if column_name not in data_frame.columns:
         print(f"Error: '{column_name}' column not found.")
         return
 
-    clean_column = data_frame[column_name].str.strip().str.lower()
-    counts = clean_column.value_counts()
+    counts = cached_aggregate(data_frame, 'category_counts', lambda df: category_counts(df, column_name),
+                              params=(column_name,))
 
     if counts.empty:
         print(f"No data to plot for {column_name} histogram.")
         return
 
-    total_count = counts.sum()
-
-    plt.figure(figsize=(10, 6))
-    ax = counts.plot(kind='bar', color='#191970')
-    plt.title(f'Histogram of {column_name}')
-    plt.xlabel(column_name)
-    plt.ylabel('Number of Occurrences')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-
-    for i, count in enumerate(counts):
-        percentage = (count / total_count) * 100
-        plt.text(i, count / 2, f'{percentage:.1f}%', ha='center', va='center', color='white', fontweight='bold', fontsize=12)
+    intervals = None
+    if confidence_intervals:
+        intervals = cached_aggregate(data_frame, 'category_intervals', lambda df: category_intervals(df, column_name),
+                                     params=(column_name,))
 
-    plt.savefig(output_filename)
-    plt.close()
-    print(f"Saved {output_filename}")
+    with stage('render', os.path.basename(output_filename)):
+        fig = plot_histogram(counts, column_name, intervals)
+    save_figure(fig, output_filename)
 
-def create_stacked_barchart(data_frame, index_col, stack_col, output_filename):
+def create_stacked_barchart(data_frame, index_col, stack_col, output_filename, table=None):
     """
     Creates and saves a stacked bar chart.
 
@@ -50,55 +152,82 @@ def create_stacked_barchart(data_frame, index_col, stack_col, output_filename):
         index_col (str): The column for the bar index (e.g., 'Level of Explicity').
         stack_col (str): The column for the stacks (e.g., 'Rape/Non-Con Tag').
         output_filename (str): The filename to save the chart to.
+        table (EncodedTable): The already encoded columns of data_frame, if any.
     """
     if index_col not in data_frame.columns or stack_col not in data_frame.columns:
         print(f"Error: One or more columns not found.")
         return
 
-    df_copy = data_frame.copy()
-    df_copy[index_col] = df_copy[index_col].str.strip().str.lower()
-    df_copy[stack_col] = df_copy[stack_col].str.strip().str.lower()
-
-    grouped_data = df_copy.groupby([index_col, stack_col]).size().unstack(fill_value=0)
-    
-    colors = ['#4682B4', '#191970'] 
-    
-    if 'yes' in grouped_data.columns and 'no' in grouped_data.columns:
-        grouped_data = grouped_data[['no', 'yes']]
-
-    ax = grouped_data.plot(kind='bar', stacked=True, figsize=(10, 7), color=colors)
-
-    plt.title(f'Stacked Bar Chart of {stack_col} by {index_col}')
-    plt.xlabel(index_col)
-    plt.ylabel('Number of Occurrences')
-    plt.xticks(rotation=0)
-    plt.tight_layout()
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    
-    for container in ax.containers:
-        ax.bar_label(container, label_type='center', color='white', fontweight='bold')
+    with stage('aggregate', f'stacked_counts {index_col} x {stack_col}'):
+        grouped_data = stacked_counts(data_frame, index_col, stack_col, table)
+    with stage('render', os.path.basename(output_filename)):
+        fig = plot_stacked_barchart(grouped_data, index_col, stack_col)
+    save_figure(fig, output_filename)
 
-    plt.savefig(output_filename)
-    plt.close()
-    print(f"Saved {output_filename}")
+def load_data(store=None):
+    """
+    Returns the GBV instances, from the annotation database at store if one is given.
+    """
+    if store:
+        from annotation_store import load_store_gbv
+        return load_store_gbv(store)
+    return clean_gbv(load_gbv())
 
-def main():
+def load_sample(size, store=None, strata_column=SAMPLE_STRATA):
     """
-    Main function to generate histograms for GBV data.
+    Returns a sample of the GBV instances, stratified on strata_column unless it is None,
+    and the number of rows it was drawn from. The CSV is streamed rather than loaded whole.
     """
-    file_path = '../Instances_of_GBV_anonym.csv'
+    from sampling import sample_csv, sample_frame
+
+    if store:
+        from annotation_store import expand_counts
+
+        # Sampling picks individual annotations, so the stored counts are expanded here
+        df = expand_counts(load_data(store))
+        return sample_frame(df, size, strata_column), len(df)
+    return sample_csv(GBV_CSV, size, strata_column, clean=clean_gbv)
 
+def main(store=None, confidence_intervals=False, sample=None, strata_column=SAMPLE_STRATA):
+    """
+    Main function to generate histograms for GBV data, read from the annotation database at store if one is given.
+    With confidence_intervals, the histograms get bootstrap error bars.
+    With sample, renders previews from a sample of that many rows (stratified on strata_column
+    unless it is None) into images/previews, each stamped as a preview.
+    """
     try:
-        df = pd.read_csv(file_path)
-    except FileNotFoundError:
-        print(f"Error: {file_path} not found.")
-        exit()
+        if sample:
+            df, total = load_sample(sample, store, strata_column)
+        else:
+            df = load_data(store)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    output_dir = IMAGES_DIR
+    preview = contextlib.nullcontext()
+    if sample:
+        from sampling import preview_label
 
-    df.columns = df.columns.str.strip()
+        output_dir = PREVIEWS_DIR
+        os.makedirs(output_dir, exist_ok=True)
+        preview = preview_charts(preview_label(len(df), total, strata_column))
 
-    create_histogram(df, 'Focalization', '../images/histogram_focalization.png')
-    create_histogram(df, 'Level of Explicity', '../images/histogram_level_of_explicity.png')
-    create_stacked_barchart(df, 'Level of Explicity', 'Rape/Non-Con Tag', '../images/stacked_barchart_explicity_tag.png')
+    with preview:
+        create_histogram(df, 'Focalization', os.path.join(output_dir, 'histogram_focalization.png'), confidence_intervals)
+        create_histogram(df, 'Level of Explicity', os.path.join(output_dir, 'histogram_level_of_explicity.png'), confidence_intervals)
+        create_stacked_barchart(df, 'Level of Explicity', 'Rape/Non-Con Tag', os.path.join(output_dir, 'stacked_barchart_explicity_tag.png'))
 
 if __name__ == '__main__':
-    main()
+    from sampling import sample_size
+
+    parser = argparse.ArgumentParser(description="Generate the charts of the GBV instances.")
+    parser.add_argument("--store", help="Read the GBV instances from this annotation database instead of the CSV.")
+    parser.add_argument("--ci", action="store_true", help="Draw bootstrap confidence intervals of the category shares.")
+    parser.add_argument("--sample", type=sample_size, metavar="N",
+                        help=f"Render previews into images/previews from a sample of N rows, stratified on {SAMPLE_STRATA}; "
+                             "every stratum keeps a row, even beyond N.")
+    parser.add_argument("--reservoir", action="store_true", help="With --sample, draw a plain random sample instead.")
+    args = parser.parse_args()
+
+    main(args.store, args.ci, args.sample, None if args.reservoir else SAMPLE_STRATA)
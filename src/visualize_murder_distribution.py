@@ -1,54 +1,66 @@
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
 
-# Load the dataset
-csv_file_path = '../MoD_Triples.csv'
-try:
-    df = pd.read_csv(csv_file_path)
-except FileNotFoundError:
-    print(f"Error: {csv_file_path} not found.")
-    exit()
+from matplotlib.figure import Figure
 
-# --- Data Cleaning ---
+from aggregate_cache import cached_value_counts
+from instrumentation import stage
+from mod_data import IMAGES_DIR, load_triples, clean_triples, save_figure, row_counts, value_counts
 
-# Strip leading/trailing whitespace from column names
-df.columns = df.columns.str.strip()
+# --- Aggregation ---
 
-# Clean and standardize data in the 'Murder' column
-df['Murder'] = df['Murder'].astype(str).str.strip().str.lower()
-df['Murder'].replace(['---', '', 'unnamed', 'nan'], 'unspecified', inplace=True)
+def murder_counts(data_frame):
+    """Returns the value counts of the cleaned 'Murder' column."""
+    return value_counts(data_frame['Murder'], row_counts(data_frame))
 
 # --- Visualization ---
 
-def create_murder_distribution_chart(data_frame):
-    """Creates a bar chart for the distribution of values in the 'Murder' column."""
-    plt.figure(figsize=(10, 6))
-    
-    counts = data_frame['Murder'].value_counts()
-    
+def plot_murder_distribution(counts):
+    """Plots a bar chart for the distribution of values in the 'Murder' column."""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+
     # Use a color palette
     colors = ['#4682B4', '#191970', '#008080']
-    
-    ax = counts.plot(kind='bar', color=colors)
-    
+
+    counts.plot(kind='bar', color=colors, ax=ax)
+
     # Add counts on top of the bars
     for p in ax.patches:
         ax.annotate(f'{int(p.get_height())}', (p.get_x() + p.get_width() / 2., p.get_height()),
                     ha='center', va='center', xytext=(0, 10), textcoords='offset points', fontsize=10)
-    
-    plt.title('Distribution of Murder (Yes/No/Unspecified)')
-    plt.ylabel('Number of Occurrences')
-    plt.xlabel('Murder')
-    plt.xticks(rotation=0)
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    
-    filename = '../images/murder_distribution.png'
-    plt.savefig(filename)
-    plt.close()
-    print(f"Saved {filename}")
-
-# --- Generate Plot ---
-create_murder_distribution_chart(df)
-
-print("Murder distribution visualization has been generated.")
+
+    ax.set_title('Distribution of Murder (Yes/No/Unspecified)')
+    ax.set_ylabel('Number of Occurrences')
+    ax.set_xlabel('Murder')
+    ax.tick_params(axis='x', labelrotation=0)
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    fig.tight_layout()
+    return fig
+
+def create_murder_distribution_chart(data_frame, output_dir=IMAGES_DIR):
+    """Creates a bar chart for the distribution of values in the 'Murder' column."""
+    counts = cached_value_counts(data_frame, 'Murder')
+    with stage('render', 'murder_distribution'):
+        fig = plot_murder_distribution(counts)
+    save_figure(fig, os.path.join(output_dir, 'murder_distribution.png'))
+
+def main(store=None):
+    """
+    Main function to generate the murder distribution chart.
+    """
+    try:
+        if store:
+            from annotation_store import load_store_triples
+            df = load_store_triples(store)
+        else:
+            df = clean_triples(load_triples())
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    create_murder_distribution_chart(df)
+
+    print("Murder distribution visualization has been generated.")
+
+if __name__ == '__main__':
+    main()
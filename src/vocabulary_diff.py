@@ -0,0 +1,283 @@
+import argparse
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from analyze_eurydice_deaths import format_markdown_table
+from instrumentation import stage, timed_stage
+from mod_data import TRIPLES_CSV, VOCABULARY_TTL, load_triples
+from skos_vocabulary import split_concept_blocks, parse_concept_block
+from watch_vocabulary import hash_block
+
+# Kinds of change, in the order they are reported
+CHANGE_KINDS = ['added', 'removed', 'renamed', 'relabelled', 'reparented', 'split', 'redefined']
+
+# Changes whose annotations can be rewritten to the new label without review
+RELABEL_KINDS = ['renamed', 'relabelled']
+
+# Row numbers listed per concept with --rows
+MAX_LISTED_ROWS = 20
+
+# One difference between two vocabulary versions; old and new are ConceptRecords, or None
+# for a concept that only exists in one version
+ConceptChange = namedtuple('ConceptChange', ['kind', 'old', 'new', 'target'])
+
+
+def normalize_label(label):
+    return label.strip().lower()
+
+
+def read_blocks(path):
+    """
+    Returns {concept ID: (content hash, block)} for every concept block of a TTL file.
+    """
+    with stage('load', os.path.basename(path)):
+        with open(path, 'r', encoding='utf-8') as f:
+            ttl_content = f.read()
+    with stage('parse', f'hash blocks {os.path.basename(path)}'):
+        return {concept_id: (hash_block(block), block) for concept_id, block in split_concept_blocks(ttl_content)}
+
+
+def nearest_kept_ancestor(record, old_record, old_ids, new_ids):
+    """
+    Returns the closest skos:broader ancestor of an old concept record that still exists in
+    the new version, or None. old_record(concept_id) returns the old record of an ancestor,
+    so only the blocks on the way up are parsed.
+    """
+    visited = {record.id}
+    queue = list(record.broader)
+    head = 0
+    while head < len(queue):
+        current = queue[head]
+        head += 1
+        if current in visited:
+            continue
+        visited.add(current)
+        if current in new_ids:
+            return current
+        if current in old_ids:
+            queue.extend(old_record(current).broader)
+    return None
+
+
+@timed_stage('aggregate')
+def diff_vocabularies(old_blocks, new_blocks):
+    """
+    Compares two vocabulary versions concept by concept.
+
+    Concepts whose block hash is unchanged are skipped without being parsed, so the cost is
+    one hash per block plus the parsing of the changed ones. A removed and an added concept
+    with the same label, or otherwise the same definition, count as one renamed concept.
+    A concept that gains new narrower concepts is reported as split, since its annotations
+    may now belong to one of them.
+
+    Args:
+        old_blocks (dict): {concept ID: (hash, block)} of the old version, from read_blocks.
+        new_blocks (dict): The same for the new version.
+
+    Returns:
+        list: The ConceptChanges, grouped by kind in CHANGE_KINDS order.
+    """
+    changed_ids = [concept_id for concept_id, (digest, _) in new_blocks.items()
+                   if concept_id in old_blocks and old_blocks[concept_id][0] != digest]
+    added_ids = [concept_id for concept_id in new_blocks if concept_id not in old_blocks]
+    removed_ids = [concept_id for concept_id in old_blocks if concept_id not in new_blocks]
+
+    old_records = {}
+
+    def old_record(concept_id):
+        if concept_id not in old_records:
+            old_records[concept_id] = parse_concept_block(concept_id, old_blocks[concept_id][1])
+        return old_records[concept_id]
+
+    def new_record(concept_id):
+        return parse_concept_block(concept_id, new_blocks[concept_id][1])
+
+    changes = {kind: [] for kind in CHANGE_KINDS}
+
+    # Pair removed and added concepts that only changed their ID
+    added = {concept_id: new_record(concept_id) for concept_id in added_ids}
+    removed = {concept_id: old_record(concept_id) for concept_id in removed_ids}
+    for key in ['label', 'definition']:
+        added_by_key = {}
+        for record in added.values():
+            if getattr(record, key):
+                added_by_key.setdefault(normalize_label(getattr(record, key)), []).append(record)
+        for concept_id, old in list(removed.items()):
+            candidates = added_by_key.get(normalize_label(getattr(old, key)), []) if getattr(old, key) else []
+            candidates = [record for record in candidates if record.id in added]
+            if len(candidates) == 1:
+                new = candidates[0]
+                changes['renamed'].append(ConceptChange('renamed', old, new, new.id))
+                del removed[concept_id], added[new.id]
+
+    for record in added.values():
+        changes['added'].append(ConceptChange('added', None, record, record.id))
+    for old in removed.values():
+        ancestor = nearest_kept_ancestor(old, old_record, old_blocks.keys(), new_blocks.keys())
+        changes['removed'].append(ConceptChange('removed', old, None, ancestor))
+
+    for concept_id in changed_ids:
+        old, new = old_record(concept_id), new_record(concept_id)
+        if old.label != new.label:
+            changes['relabelled'].append(ConceptChange('relabelled', old, new, concept_id))
+        if set(old.broader) != set(new.broader):
+            changes['reparented'].append(ConceptChange('reparented', old, new, concept_id))
+        if (old.definition, old.example) != (new.definition, new.example):
+            changes['redefined'].append(ConceptChange('redefined', old, new, concept_id))
+
+    # New concepts placed under an existing one split that concept's annotations
+    split = {}
+    for record in added.values():
+        for parent in record.broader:
+            if parent in old_blocks and parent in new_blocks:
+                split.setdefault(parent, []).append(record.id)
+    for parent, children in split.items():
+        changes['split'].append(ConceptChange('split', old_record(parent), new_record(parent), ', '.join(children)))
+
+    return [change for kind in CHANGE_KINDS for change in changes[kind]]
+
+
+@timed_stage('aggregate')
+def mode_row_index(modes):
+    """
+    Returns {normalized mode label: array of row positions}, built with one pass over the column,
+    so the rows of any number of changed concepts are found without rescanning the triples.
+    """
+    codes, labels = pd.factorize(modes.fillna('').astype(str).str.strip().str.lower())
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    return {label: order[bounds[k]:bounds[k + 1]] for k, label in enumerate(labels)}
+
+
+def change_label(change):
+    """
+    Returns the old label of a change, the one existing annotations use.
+    """
+    record = change.old if change.old is not None else change.new
+    return normalize_label(record.label or record.id)
+
+
+def affected_rows(change, index):
+    """
+    Returns the row positions whose mode of demise is the changed concept's old label.
+    Added concepts have no annotations yet.
+    """
+    if change.kind == 'added':
+        return np.empty(0, dtype=np.int64)
+    return index.get(change_label(change), np.empty(0, dtype=np.int64))
+
+
+def migration_mapping(changes, new_labels, merge_removed=False):
+    """
+    Returns {old normalized label: new label} for the renamed and relabelled concepts, and with
+    merge_removed also for the removed concepts, which move to their nearest kept ancestor.
+    """
+    mapping = {}
+    for change in changes:
+        if change.kind in RELABEL_KINDS and change.new.label and change_label(change) != normalize_label(change.new.label):
+            mapping[change_label(change)] = change.new.label
+        elif change.kind == 'removed' and merge_removed and change.target:
+            mapping[change_label(change)] = new_labels[change.target]
+    return mapping
+
+
+@timed_stage('write')
+def migrate_triples(data_frame, index, mapping):
+    """
+    Rewrites the 'Mode of Demise' of the rows using an old label, only touching those rows.
+    Values written in lowercase stay lowercase. Returns the number of rows rewritten.
+    """
+    column = data_frame.columns[data_frame.columns.str.strip() == 'Mode of Demise'][0]
+    values = data_frame[column].to_numpy(dtype=object, copy=True)
+    rewritten = 0
+    for old_label, new_label in mapping.items():
+        rows = index.get(old_label)
+        if rows is None:
+            continue
+        for row in rows:
+            values[row] = new_label.lower() if values[row] == values[row].lower() else new_label
+        rewritten += len(rows)
+    data_frame[column] = values
+    return rewritten
+
+
+def format_rows(rows):
+    """
+    Formats row positions as CSV line numbers (the header is line 1).
+    """
+    listed = ', '.join(str(row + 2) for row in rows[:MAX_LISTED_ROWS])
+    return listed + (f", ... ({len(rows) - MAX_LISTED_ROWS} more)" if len(rows) > MAX_LISTED_ROWS else "")
+
+
+def main(old_ttl, new_ttl=VOCABULARY_TTL, csv_path=TRIPLES_CSV, output=None, merge_removed=False, show_rows=False):
+    """
+    Prints the differences between two vocabulary versions and the triples each one affects.
+    With output, writes the triples with renamed and relabelled modes (and with merge_removed,
+    removed modes moved to their nearest kept ancestor) to that path.
+    """
+    try:
+        old_blocks = read_blocks(old_ttl)
+        new_blocks = read_blocks(new_ttl)
+        df = load_triples(csv_path)
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found.")
+        return
+
+    changes = diff_vocabularies(old_blocks, new_blocks)
+    if not changes:
+        print(f"{os.path.basename(old_ttl)} and {os.path.basename(new_ttl)} define the same concepts.")
+        return
+
+    index = mode_row_index(df[df.columns[df.columns.str.strip() == 'Mode of Demise'][0]])
+    counts = {kind: sum(change.kind == kind for change in changes) for kind in CHANGE_KINDS}
+    print(f"{os.path.basename(old_ttl)} -> {os.path.basename(new_ttl)}: "
+          + ", ".join(f"{count} {kind}" for kind, count in counts.items() if count))
+
+    rows = []
+    for change in changes:
+        old_label = change.old.label if change.old is not None else ''
+        new_label = change.new.label if change.new is not None else ''
+        concept = change.new.id if change.new is not None else change.old.id
+        if change.kind == 'renamed':
+            concept = f"{change.old.id} -> {change.new.id}"
+        elif change.kind == 'reparented':
+            new_label = f"under {', '.join(change.new.broader) or '(top)'}"
+            old_label = f"under {', '.join(change.old.broader) or '(top)'}"
+        elif change.kind == 'removed':
+            new_label = f"(nearest kept ancestor: {change.target})" if change.target else ''
+        elif change.kind == 'split':
+            new_label = f"(new narrower: {change.target})"
+        affected = affected_rows(change, index)
+        row = [change.kind, concept, old_label, new_label, len(affected)]
+        if show_rows:
+            row.append(format_rows(affected))
+        rows.append(row)
+    headers = ['Change', 'Concept', 'Old', 'New', 'Triples'] + (['Rows'] if show_rows else [])
+    print(format_markdown_table(headers, rows))
+
+    if output:
+        targets = {change.target for change in changes if change.kind == 'removed' and change.target}
+        new_labels = {concept_id: parse_concept_block(concept_id, new_blocks[concept_id][1]).label for concept_id in targets}
+        mapping = migration_mapping(changes, new_labels, merge_removed)
+        rewritten = migrate_triples(df, index, mapping)
+        with stage('write', os.path.basename(output)):
+            df.to_csv(output, index=False)
+        print(f"Rewrote {rewritten} triples ({len(mapping)} mode(s) of demise).")
+        print(f"Saved {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two vocabulary versions and migrate the triples they affect.")
+    parser.add_argument("old_ttl", help="The previous version of the vocabulary, e.g. from git show HEAD~1:catalogue_MOD.ttl.")
+    parser.add_argument("new_ttl", nargs="?", default=VOCABULARY_TTL, help="The revised vocabulary.")
+    parser.add_argument("--csv", default=TRIPLES_CSV, help="The triples to check.")
+    parser.add_argument("--rows", action="store_true", help="List the CSV line numbers of the affected triples.")
+    parser.add_argument("--output", help="Write the triples with renamed and relabelled modes of demise to this CSV.")
+    parser.add_argument("--merge-removed", action="store_true",
+                        help="With --output, also move the triples of removed modes to their nearest kept ancestor.")
+    args = parser.parse_args()
+
+    main(args.old_ttl, args.new_ttl, args.csv, args.output, args.merge_removed, args.rows)
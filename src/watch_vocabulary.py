@@ -0,0 +1,218 @@
+import argparse
+import hashlib
+import os
+import time
+
+from instrumentation import stage
+from mod_data import PROJECT_ROOT, VOCABULARY_TTL, IMAGES_DIR
+from skos_vocabulary import Vocabulary, split_concept_blocks, parse_concept_block
+from generate_interactive_hierarchy import generate_hierarchy_page
+
+# The sub-hierarchy images rendered by visualize_skos.py: (root concept, output filename without extension)
+DEFAULT_SKOS_TARGETS = [
+    ('naturalSupernaturalCauses', 'natural_causes'),
+    ('physicalViolence', 'physical_violence'),
+    ('indirectOrPsychologicalModes', 'psychological_modes'),
+]
+
+
+def hash_block(block):
+    """
+    Returns a short content hash for one concept block.
+    """
+    return hashlib.blake2b(block.encode('utf-8'), digest_size=16).digest()
+
+
+class VocabularyWatcher:
+    """
+    Keeps a parsed vocabulary in memory and regenerates its outputs when the TTL file changes.
+
+    Only concept blocks whose content hash changed are re-parsed. Edits that only touch
+    labels, definitions or examples are patched into the existing Vocabulary; edits that
+    change the hierarchy (or add, remove or reorder concepts) rebuild its CSR arrays.
+    """
+
+    def __init__(self, ttl_path, hierarchy_path, pyvis_path, skos_targets, images_dir):
+        self.ttl_path = ttl_path
+        self.hierarchy_path = hierarchy_path
+        self.pyvis_path = pyvis_path
+        self.skos_targets = skos_targets
+        self.images_dir = images_dir
+
+        self.block_hashes = {}
+        self.records = {}
+        self.vocabulary = None
+        # Concept IDs drawn in each sub-hierarchy image the last time it was rendered
+        self.skos_members = {}
+        self.last_stat = None
+
+    def has_changed(self):
+        """
+        Checks the TTL file's modification time and size.
+        """
+        try:
+            stat = os.stat(self.ttl_path)
+        except FileNotFoundError:
+            return False
+        current = (stat.st_mtime_ns, stat.st_size)
+        if current == self.last_stat:
+            return False
+        self.last_stat = current
+        return True
+
+    def reload(self):
+        """
+        Re-parses the changed concept blocks and patches the in-memory vocabulary.
+        Returns the sets of concept IDs whose text, label or hierarchy position changed.
+        """
+        with open(self.ttl_path, 'r', encoding='utf-8') as f:
+            ttl_content = f.read()
+
+        block_hashes = {}
+        records = {}
+        text_changed = set()
+        label_changed = set()
+        structure_changed = set()
+        for concept_id, block in split_concept_blocks(ttl_content):
+            digest = hash_block(block)
+            block_hashes[concept_id] = digest
+            old = self.records.get(concept_id)
+            if old is not None and self.block_hashes.get(concept_id) == digest:
+                records[concept_id] = old
+                continue
+
+            record = parse_concept_block(concept_id, block)
+            records[concept_id] = record
+            if old is None or old.broader != record.broader:
+                structure_changed.add(concept_id)
+            elif old != record:
+                text_changed.add(concept_id)
+                if old.label != record.label:
+                    label_changed.add(concept_id)
+
+        structure_changed.update(self.records.keys() - records.keys())
+        reordered = list(records) != list(self.records)
+
+        if self.vocabulary is None or structure_changed or reordered:
+            self.vocabulary = Vocabulary.from_records(records.values())
+        else:
+            vocabulary = self.vocabulary
+            for concept_id in text_changed:
+                i = vocabulary.index_of(concept_id)
+                record = records[concept_id]
+                vocabulary.labels[i] = record.label
+                vocabulary.definitions[i] = record.definition
+                vocabulary.examples[i] = record.example
+
+        self.block_hashes = block_hashes
+        self.records = records
+        return text_changed, label_changed, structure_changed
+
+    def write_hierarchy(self):
+        with stage('render', 'hierarchy page'):
+            page = generate_hierarchy_page(self.vocabulary)
+        with stage('write', os.path.basename(self.hierarchy_path)):
+            with open(self.hierarchy_path, 'w', encoding='utf-8') as f:
+                f.write(page)
+        return self.hierarchy_path
+
+    def write_pyvis(self):
+        from generate_pyvis_graph import create_pyvis_visualization
+
+        with stage('render', 'pyvis network'):
+            html = create_pyvis_visualization(self.vocabulary).generate_html()
+        with stage('write', os.path.basename(self.pyvis_path)):
+            with open(self.pyvis_path, 'w', encoding='utf-8') as f:
+                f.write(html)
+        return self.pyvis_path
+
+    def write_skos_image(self, root_id, output_filename, members):
+        from visualize_skos import generate_dot_graph
+
+        with stage('render', f'dot graph {root_id}'):
+            dot_graph = generate_dot_graph(self.vocabulary, [self.vocabulary.index_of(cid) for cid in members])
+        output_path = os.path.join(self.images_dir, output_filename)
+        with stage('write', f'{output_filename}.png'):
+            dot_graph.render(output_path, format='png', view=False, cleanup=True)
+        return f"{output_path}.png"
+
+    def stale_skos_targets(self, label_changed, structure_changed, first_run):
+        """
+        Yields the sub-hierarchy images whose drawn concepts, labels or edges changed.
+        """
+        touched = label_changed | structure_changed
+        for root_id, output_filename in self.skos_targets:
+            if root_id not in self.vocabulary:
+                print(f"Warning: root concept '{root_id}' not found, skipping {output_filename}.png")
+                continue
+            if not first_run and not touched:
+                continue
+            old_members = self.skos_members.get(output_filename, set())
+            vocabulary = self.vocabulary
+            members = {vocabulary.ids[i] for i in vocabulary.descendants(vocabulary.index_of(root_id))}
+            if first_run or touched & (old_members | members):
+                yield root_id, output_filename, members
+
+    def rebuild(self, first_run=False):
+        """
+        Reloads the vocabulary and regenerates only the outputs affected by the edit.
+        """
+        start = time.perf_counter()
+        with stage('parse', 'changed concept blocks'):
+            text_changed, label_changed, structure_changed = self.reload()
+        if not first_run and not (text_changed or structure_changed):
+            return
+
+        jobs = [self.write_hierarchy, self.write_pyvis]
+        for root_id, output_filename, members in self.stale_skos_targets(label_changed, structure_changed, first_run):
+            self.skos_members[output_filename] = members
+            jobs.append(lambda r=root_id, o=output_filename, m=members: self.write_skos_image(r, o, m))
+
+        written = []
+        for job in jobs:
+            try:
+                written.append(job())
+            except Exception as e:
+                print(f"An error occurred: {e}")
+
+        elapsed = time.perf_counter() - start
+        changed_count = len(text_changed | structure_changed)
+        print(f"Rebuilt {', '.join(os.path.basename(p) for p in written)} "
+              f"in {elapsed:.2f}s ({changed_count} concept(s) changed)")
+
+    def watch(self, interval):
+        """
+        Polls the TTL file and rebuilds on every change until interrupted.
+        """
+        self.has_changed()
+        self.rebuild(first_run=True)
+        print(f"Watching {self.ttl_path} (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(interval)
+                if self.has_changed():
+                    self.rebuild()
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+
+
+def parse_skos_target(value):
+    root_id, _, output_filename = value.partition(':')
+    if not root_id or not output_filename:
+        raise argparse.ArgumentTypeError("expected ROOT_CONCEPT:OUTPUT_FILENAME")
+    return root_id, output_filename
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Regenerate the vocabulary visualizations whenever catalogue_MOD.ttl changes.")
+    parser.add_argument("--ttl", default=VOCABULARY_TTL, help="The TTL file to watch.")
+    parser.add_argument("--interval", type=float, default=0.25, help="Polling interval in seconds.")
+    parser.add_argument("--skos", type=parse_skos_target, action="append",
+                        help="A sub-hierarchy image to keep up to date, as ROOT_CONCEPT:OUTPUT_FILENAME. May be repeated.")
+    args = parser.parse_args()
+
+    watcher = VocabularyWatcher(args.ttl,
+                                os.path.join(PROJECT_ROOT, 'hierarchy.html'),
+                                os.path.join(PROJECT_ROOT, 'pyvis_hierarchy.html'),
+                                args.skos or DEFAULT_SKOS_TARGETS, IMAGES_DIR)
+    watcher.watch(args.interval)